@@ -0,0 +1,18 @@
+"""Background jobs of the accounts app"""
+
+from accounts.services import AuthService
+from jobs.registry import job
+
+# Chunks purged per run, so one huge account doesn't hold a worker for long
+PURGE_CHUNKS_PER_RUN = 50
+
+
+@job(name="accounts.purge_deleted_user", queue="low")
+def purge_deleted_user(user_id: str, chunk_size: int = 1000) -> None:
+    """
+    Purge a deleted account, requeueing itself until the purge is complete.
+    """
+    if not AuthService.purge_deleted_user(
+        user_id, chunk_size=chunk_size, max_chunks=PURGE_CHUNKS_PER_RUN
+    ):
+        purge_deleted_user.enqueue(user_id=user_id, chunk_size=chunk_size)
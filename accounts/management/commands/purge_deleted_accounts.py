@@ -0,0 +1,48 @@
+"""Purge the data of deleted accounts"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import AccountDeletion
+from accounts.services import AuthService
+
+
+class Command(BaseCommand):
+    """
+    Delete the data of accounts deleted through `AuthService.delete_user`, in chunks.
+
+    Usage:
+        python manage.py purge_deleted_accounts [--chunk-size 1000] [--pause 0.1]
+
+    Pending deletions are processed oldest first. Every chunk is its own transaction, so
+    the command can be stopped at any point and resumes where it left off.
+    """
+
+    help = "Delete the data of deleted accounts in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between chunks, to leave room for other queries.",
+        )
+
+    def handle(self, *args, chunk_size: int, pause: float, **options):
+        pending = AccountDeletion.objects.filter(completed_at__isnull=True).order_by(
+            "date_created"
+        )
+
+        for deletion in list(pending):
+            while not AuthService.purge_deleted_user(
+                deletion.user_id, chunk_size=chunk_size, max_chunks=1
+            ):
+                if pause:
+                    time.sleep(pause)
+
+            deletion.refresh_from_db()
+            self.stdout.write(
+                f"Purged account {deletion.user_id} ({deletion.deleted_rows} rows)."
+            )
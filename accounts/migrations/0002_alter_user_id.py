@@ -0,0 +1,19 @@
+# Generated by Django 4.1.4 on 2026-10-19 18:23
+
+from django.db import migrations, models
+import taskmaster.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='id',
+            field=models.UUIDField(default=taskmaster.utils.generate_id, primary_key=True, serialize=False, unique=True),
+        ),
+    ]
@@ -103,3 +103,26 @@ class User(AbstractUser, BaseModel):
         Returns a string representation of the user object.
         """
         return self.email
+
+
+class AccountDeletion(BaseModel):
+    """
+    Progress of the background purge of a deleted account.
+
+    `AuthService.delete_user` only disables the user and records a deletion; the
+    `purge_deleted_accounts` command then deletes the user's rows in small chunks. The
+    record keeps the user's id rather than a foreign key, so it outlives the user row and
+    documents when the purge finished.
+
+    Attributes:
+        user_id (uuid.UUID): The id of the deleted user.
+        deleted_rows (int): Number of dependent rows (tasks, ...) purged so far.
+        completed_at (datetime): When the user row itself was deleted; None while pending.
+    """
+
+    user_id = models.UUIDField(unique=True)
+    deleted_rows = models.PositiveBigIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"Deletion of {self.user_id}"
@@ -1,13 +1,18 @@
 import uuid
+from typing import Optional
 
 from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 
+from accounts.models import AccountDeletion
 from accounts.serializers import (
     LoginSerializer,
     UserSerializer,
     UserUpdatePasswordSerializer,
 )
+from jobs.services import JobService
 from taskmaster.utils import (
     generate_user_tokens,
     get_object_or_error,
@@ -34,6 +39,7 @@ class AuthService:
         update_user: Updates user information based on the provided data.
         update_user_password: Updates the password for a user account.
         delete_user: Deletes a user account based on the user ID.
+        purge_deleted_user: Deletes the data of a deleted account in chunks.
 
     """
 
@@ -224,9 +230,73 @@ class AuthService:
         """
         Deletes a user account based on the user ID.
 
+        The account is disabled at once (inactive users can neither log in nor use their
+        tokens) and queued for purging. Its data is removed later, in chunks, by the
+        `accounts.purge_deleted_user` background job (see `purge_deleted_user`), so a user
+        with many tasks never means one huge transaction.
+
         Args:
             user_id (uuid.UUID): The ID of the user to be deleted.
 
         """
         user = get_object_or_error(User, id=user_id)
-        user.delete()
+
+        with transaction.atomic():
+            User.objects.filter(id=user.id).update(is_active=False)
+            AccountDeletion.objects.get_or_create(user_id=user.id)
+            JobService.enqueue("accounts.purge_deleted_user", {"user_id": str(user.id)})
+
+    @staticmethod
+    def purge_deleted_user(
+        user_id: uuid.UUID, chunk_size: int = 1000, max_chunks: Optional[int] = None
+    ) -> bool:
+        """
+        Deletes the data of a deleted account, `chunk_size` rows per transaction.
+
+        Every model referencing the user with `on_delete=CASCADE` (tasks, archived tasks,
+        counters, ...) is emptied chunk by chunk, and the user row is deleted last. Each
+        chunk is a short transaction that only reads primary keys, so memory use and lock
+        time don't grow with the number of rows. Progress is recorded on the user's
+        `AccountDeletion`, and an interrupted purge simply resumes on the next call.
+
+        Args:
+            user_id (uuid.UUID): The ID of the deleted user.
+            chunk_size (int, optional): Rows deleted per transaction.
+            max_chunks (int, optional): Stop after this many chunks. Defaults to no limit.
+
+        Returns:
+            bool: Whether the purge is complete.
+        """
+        deletion = AccountDeletion.objects.get(user_id=user_id)
+        if deletion.completed_at is not None:
+            return True
+
+        chunks = 0
+        for relation in User._meta.related_objects:
+            if relation.on_delete is not models.CASCADE or relation.many_to_many:
+                continue
+
+            model = relation.related_model
+            rows = model._base_manager.filter(**{relation.field.name: user_id})
+            while True:
+                if max_chunks is not None and chunks >= max_chunks:
+                    return False
+
+                with transaction.atomic():
+                    pks = list(rows.values_list("pk", flat=True)[:chunk_size])
+                    if not pks:
+                        break
+                    model._base_manager.filter(pk__in=pks).delete()
+                    AccountDeletion.objects.filter(pk=deletion.pk).update(
+                        deleted_rows=F("deleted_rows") + len(pks)
+                    )
+                chunks += 1
+
+        with transaction.atomic():
+            # Only rows of relations without CASCADE (if any) are left to collect
+            User.objects.filter(id=user_id).delete()
+            AccountDeletion.objects.filter(pk=deletion.pk).update(
+                completed_at=timezone.now()
+            )
+
+        return True
@@ -1,16 +1,63 @@
-"""Gunicorn production configuration"""
-import multiprocessing
+"""Gunicorn production configuration
 
-# bind
-bind = "0.0.0.0:8000"
+Serves `taskmaster.asgi:application`, both HTTP and websockets, on uvicorn workers:
 
-workers = multiprocessing.cpu_count() * 2 + 1
+    gunicorn --config gunicorn.conf.py taskmaster.asgi:application
+
+Send SIGHUP to the master for a graceful reload: new workers are started with the new
+code and configuration, and the old ones stop accepting connections and get
+`graceful_timeout` seconds to finish their requests. Their websocket clients are
+disconnected and reconnect to the new workers.
+
+With WEB_PRELOAD the master imports the application once and the workers are forked from
+it, which makes them start faster and share memory. The master keeps the code it loaded,
+so deploying new code then takes a restart.
+"""
+from taskmaster import env
+
+# bind: websocket clients of the former daphne server still connect to 8001
+bind = ["0.0.0.0:8000", "0.0.0.0:8001"]
+
+# Async workers serve many connections each, so one per core is enough
+workers = env.WEB_CONCURRENCY
+worker_class = "taskmaster.workers.AsgiWorker"
+graceful_timeout = env.WEB_GRACEFUL_TIMEOUT
+keepalive = 5
+preload_app = env.WEB_PRELOAD
+# Replace workers after some requests (staggered by the jitter) and past a memory limit
+max_requests = env.WEB_MAX_REQUESTS
+max_requests_jitter = env.WEB_MAX_REQUESTS // 10
 # reload_engine = "inotify"
-group = "user"
-user = "user"
-reload = True
+reload = env.WEB_RELOAD
 
 # logs
 loglevel = "debug"
 accesslog = "/tmp/gunicorn.access"
 errorlog = "/tmp/gunicorn.error"
+
+
+def pre_fork(server, worker):
+    """With a preloaded app, don't let workers inherit the master's DB connections."""
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from taskmaster.db import reset_after_fork
+
+        reset_after_fork()
+
+
+def post_worker_init(worker):
+    """Recycle the worker gracefully once its memory passes WEB_MEMORY_LIMIT."""
+    if env.WEB_MEMORY_LIMIT:
+        from taskmaster.memory import MiB, MemoryWatchdog
+
+        MemoryWatchdog(
+            limit=env.WEB_MEMORY_LIMIT * MiB,
+            interval=env.WEB_MEMORY_CHECK_INTERVAL,
+            trace_frames=env.WEB_TRACEMALLOC_FRAMES,
+        ).start()
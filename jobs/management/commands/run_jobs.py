@@ -0,0 +1,186 @@
+"""Run queued background jobs"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import uuid
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.services import JobService
+
+logger = logging.getLogger(__name__)
+
+
+def _setup_process() -> None:
+    """Initialize Django in a spawned worker process."""
+    import django
+
+    django.setup()
+
+
+class Command(BaseCommand):
+    """
+    Claim and run queued jobs until stopped.
+
+    Usage:
+        python manage.py run_jobs [--queues high,default,low] [--concurrency 4]
+                                  [--mode thread|process] [--burst]
+
+    Lanes are polled in the given order, so a job on an earlier lane always runs before
+    a job on a later one. Up to `--concurrency` jobs run at the same time on a thread or
+    process pool; with `--concurrency 0` they run one at a time in the worker itself.
+    Threads suit jobs waiting on the database or the network, processes suit CPU-bound
+    jobs (such as password hashing).
+
+    A claimed job is hidden from other workers for `--visibility-timeout` seconds, and
+    the worker renews that lease while the job runs. If the worker dies its jobs become
+    visible again once their lease expires and another worker retries them.
+
+    SIGTERM and SIGINT stop claiming new jobs; running jobs are finished first.
+    """
+
+    help = "Run queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queues",
+            default=",".join(settings.JOB_QUEUES),
+            help="Comma-separated lanes, highest priority first.",
+        )
+        parser.add_argument("--concurrency", type=int, default=settings.JOB_CONCURRENCY)
+        parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+        parser.add_argument(
+            "--visibility-timeout", type=float, default=settings.JOB_VISIBILITY_TIMEOUT
+        )
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument(
+            "--burst", action="store_true", help="Exit once every lane is empty."
+        )
+
+    def handle(
+        self,
+        *args,
+        queues: str,
+        concurrency: int,
+        mode: str,
+        visibility_timeout: float,
+        poll_interval: float,
+        burst: bool,
+        **options,
+    ):
+        self.running = True
+        self.queues = [queue.strip() for queue in queues.split(",") if queue.strip()]
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.visibility_timeout = visibility_timeout
+
+        previous_handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        logger.info(
+            "Worker %s running %s (%s x%d)",
+            self.worker_id,
+            self.queues,
+            mode,
+            concurrency,
+        )
+
+        try:
+            if concurrency:
+                processed = self.run_pool(concurrency, mode, poll_interval, burst)
+            else:
+                processed = self.run_inline(poll_interval, burst)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(f"{processed} jobs processed.")
+
+    def claim(self):
+        return JobService.claim(self.queues, self.worker_id, self.visibility_timeout)
+
+    def run_inline(self, poll_interval: float, burst: bool) -> int:
+        """Run jobs one at a time in the current thread."""
+        processed = 0
+
+        while self.running:
+            job = self.claim()
+            if job is None:
+                if burst:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            JobService.execute(job.id, self.worker_id)
+            processed += 1
+
+        return processed
+
+    def run_pool(
+        self, concurrency: int, mode: str, poll_interval: float, burst: bool
+    ) -> int:
+        """Keep up to `concurrency` jobs running on a pool and renew their leases."""
+        if mode == "process":
+            executor = ProcessPoolExecutor(
+                max_workers=concurrency,
+                # Forked children would share the parent's database connections
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_setup_process,
+            )
+        else:
+            executor = ThreadPoolExecutor(
+                max_workers=concurrency, thread_name_prefix="job"
+            )
+
+        in_flight = {}
+        processed = 0
+        renew_every = self.visibility_timeout / 3
+        next_renewal = time.monotonic() + renew_every
+
+        with executor:
+            while self.running or in_flight:
+                while self.running and len(in_flight) < concurrency:
+                    job = self.claim()
+                    if job is None:
+                        break
+                    future = executor.submit(JobService.execute, job.id, self.worker_id)
+                    in_flight[future] = job.id
+
+                if not in_flight:
+                    if burst:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(
+                    in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    job_id = in_flight.pop(future)
+                    processed += 1
+                    if future.exception() is not None:
+                        # The job's own errors are recorded by `execute`; this is the
+                        # pool failing (e.g. a killed process). The lease will expire.
+                        logger.error("Job #%s crashed: %r", job_id, future.exception())
+
+                if in_flight and time.monotonic() >= next_renewal:
+                    JobService.extend_leases(
+                        in_flight.values(), self.worker_id, self.visibility_timeout
+                    )
+                    next_renewal = time.monotonic() + renew_every
+
+        return processed
+
+    def stop(self, signum, frame) -> None:
+        self.running = False
@@ -0,0 +1,62 @@
+"""Background job models"""
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    A unit of deferred work in the database-backed job queue.
+
+    Workers (`python manage.py run_jobs`) claim queued jobs whose `run_at` has passed,
+    lane by lane. A claimed job is leased until `locked_until`; the worker keeps
+    extending the lease while the job runs, so the job only becomes visible to other
+    workers again if its worker dies (the visibility timeout).
+
+    Attributes:
+        STATUS (tuple): Possible job statuses.
+
+        id (int): Increasing job number, which orders jobs queued at the same time.
+        name (str): Name of the registered job function.
+        kwargs (dict): Keyword arguments of the job function.
+        queue (str): The lane the job is queued on.
+        status (str): "QUEUED", "RUNNING", "DONE" or "FAILED" (out of attempts).
+        attempts (int): Number of times the job was started.
+        max_attempts (int): Attempts before the job is marked failed.
+        run_at (datetime): Earliest time the job may (re)run.
+        locked_until (datetime): End of the lease of the worker running the job.
+        locked_by (str): Identifier of the worker running the job.
+        last_error (str): Traceback of the last failed attempt.
+        created_at (datetime): When the job was queued.
+        finished_at (datetime): When the job succeeded or ran out of attempts.
+    """
+
+    STATUS = (
+        ("QUEUED", "QUEUED"),
+        ("RUNNING", "RUNNING"),
+        ("DONE", "DONE"),
+        ("FAILED", "FAILED"),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    queue = models.CharField(max_length=50, default="default")
+    status = models.CharField(max_length=10, choices=STATUS, default="QUEUED")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["queue", "status", "run_at"], name="job_claim_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} #{self.id}"
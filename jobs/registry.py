@@ -0,0 +1,90 @@
+"""Registry of background job functions"""
+
+from typing import Callable, Dict, Optional
+
+JOBS: Dict[str, "JobFunction"] = {}
+
+
+class JobFunction:
+    """
+    A function registered as a background job.
+
+    Calling it runs the function directly; `enqueue` queues it for a worker instead.
+
+    Attributes:
+        name (str): Name the job is stored and looked up by.
+        func (Callable): The function run by the worker, with the job's keyword arguments.
+        queue (str): Default lane the job is queued on.
+        max_attempts (int): Attempts before the job is marked failed.
+    """
+
+    def __init__(self, func: Callable, name: str, queue: str, max_attempts: int):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, queue: Optional[str] = None, delay: float = 0, **kwargs):
+        """
+        Queue the job for a worker.
+
+        Args:
+            queue (str, optional): Lane to queue the job on. Defaults to the job's lane.
+            delay (float, optional): Seconds before the job may run.
+            **kwargs: JSON serializable keyword arguments of the job function.
+
+        Returns:
+            Job: The queued job.
+        """
+        from jobs.services import JobService
+
+        return JobService.enqueue(
+            self.name,
+            kwargs,
+            queue=queue or self.queue,
+            delay=delay,
+            max_attempts=self.max_attempts,
+        )
+
+
+def job(name: Optional[str] = None, queue: str = "default", max_attempts: int = 5):
+    """
+    Decorator registering a function as a background job.
+
+    Jobs are defined in a `jobs` module of an installed app, which is imported when the
+    app registry is ready. Job functions take JSON serializable keyword arguments and
+    should be idempotent: a job is retried when it raises, and may run again if its
+    worker dies mid-way.
+
+    Args:
+        name (str, optional): Name of the job. Defaults to the function's dotted path.
+        queue (str, optional): Default lane, e.g. "high", "default" or "low".
+        max_attempts (int, optional): Attempts before the job is marked failed.
+
+    Examples:
+        >>> @job(queue="low")
+        ... def send_digest(user_id):
+        ...     ...
+        >>> send_digest.enqueue(user_id=str(user.id))
+    """
+
+    def decorator(func: Callable) -> JobFunction:
+        job_name = name or f"{func.__module__}.{func.__name__}"
+        JOBS[job_name] = JobFunction(func, job_name, queue, max_attempts)
+        return JOBS[job_name]
+
+    return decorator
+
+
+def get_job(name: str) -> JobFunction:
+    """
+    Raises:
+        LookupError: If no job is registered under `name`.
+    """
+    try:
+        return JOBS[name]
+    except KeyError:
+        raise LookupError(f"No job registered as {name!r}") from None
@@ -0,0 +1,230 @@
+"""Job queue services"""
+
+import logging
+import random
+import traceback
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import get_job
+
+logger = logging.getLogger(__name__)
+
+
+class JobService:
+    """
+    Service class for the database-backed job queue.
+
+    Every query runs on the primary ("default") database: a replica may not hold a job
+    that was just queued or claimed.
+
+    Methods:
+        enqueue: Queues a registered job.
+        claim: Leases the next runnable job of the first non-empty lane.
+        execute: Runs a claimed job and records the outcome.
+        extend_leases: Pushes back the visibility timeout of running jobs.
+        retry_delay: Backoff before a failed job is retried.
+    """
+
+    @staticmethod
+    def enqueue(
+        name: str,
+        kwargs: Optional[dict] = None,
+        queue: Optional[str] = None,
+        delay: float = 0,
+        max_attempts: Optional[int] = None,
+    ) -> Job:
+        """
+        Queues a registered job.
+
+        Call it inside the transaction that makes the job necessary: the job is then
+        committed (or rolled back) together with that change.
+
+        Args:
+            name (str): Name of the registered job.
+            kwargs (dict, optional): JSON serializable keyword arguments of the job.
+            queue (str, optional): Lane to queue the job on. Defaults to the job's lane.
+            delay (float, optional): Seconds before the job may run.
+            max_attempts (int, optional): Defaults to the job's `max_attempts`.
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            LookupError: If no job is registered under `name`.
+        """
+        job_function = get_job(name)
+
+        return Job.objects.using("default").create(
+            name=name,
+            kwargs=kwargs or {},
+            queue=queue or job_function.queue,
+            max_attempts=max_attempts or job_function.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+    @staticmethod
+    def claim(
+        queues: Iterable[str], worker_id: str, visibility_timeout: float
+    ) -> Optional[Job]:
+        """
+        Leases the next runnable job, trying the lanes in the given order.
+
+        A job is runnable when it is queued and its `run_at` has passed, or when it is
+        running but its lease expired (its worker died). The candidate row is locked
+        with `SELECT ... FOR UPDATE SKIP LOCKED` where the database supports it, and the
+        lease is taken with a conditional update, so concurrent workers never run the
+        same job twice, on SQLite too.
+
+        A job whose lease expired on its last attempt is marked failed instead.
+
+        Args:
+            queues (Iterable[str]): Lanes, highest priority first.
+            worker_id (str): Identifier of the claiming worker.
+            visibility_timeout (float): Seconds the job stays invisible to other workers.
+
+        Returns:
+            Job: The claimed job, or None when every lane is empty.
+        """
+        for queue in queues:
+            while True:
+                now = timezone.now()
+                with transaction.atomic(using="default"):
+                    if connections["default"].vendor == "sqlite":
+                        # SQLite has no row locks, so FOR UPDATE below is a no-op
+                        # there. This write matches no row (ids start at 1) and only
+                        # takes the database write lock before reading: a transaction
+                        # that read first fails at once, without waiting, when it has
+                        # to write while another connection is writing. Other
+                        # backends lock the candidate row with SKIP LOCKED instead.
+                        Job.objects.using("default").filter(id=0).update(queue=queue)
+                    job = (
+                        Job.objects.using("default")
+                        .select_for_update(skip_locked=True)
+                        .filter(queue=queue)
+                        .filter(
+                            Q(status="QUEUED", run_at__lte=now)
+                            | Q(status="RUNNING", locked_until__lt=now)
+                        )
+                        .order_by("run_at", "id")
+                        .first()
+                    )
+                    if job is None:
+                        break
+
+                    unchanged = Job.objects.using("default").filter(
+                        id=job.id, status=job.status, attempts=job.attempts
+                    )
+                    if job.attempts >= job.max_attempts:
+                        unchanged.update(
+                            status="FAILED",
+                            locked_until=None,
+                            last_error="Visibility timeout expired on the last attempt",
+                            finished_at=now,
+                        )
+                        continue
+
+                    claimed = unchanged.update(
+                        status="RUNNING",
+                        attempts=F("attempts") + 1,
+                        locked_by=worker_id,
+                        locked_until=now + timedelta(seconds=visibility_timeout),
+                    )
+
+                if claimed:
+                    job.refresh_from_db(using="default")
+                    return job
+
+        return None
+
+    @staticmethod
+    def execute(job_id: int, worker_id: str) -> str:
+        """
+        Runs a claimed job and records the outcome.
+
+        A job that raises is queued again after `retry_delay`, or marked failed once it
+        used up its attempts; the traceback is kept in `last_error`. A job whose lease
+        the worker lost is not run, and the outcome is only recorded while the worker
+        still holds the lease.
+
+        Args:
+            job_id (int): The ID of a job claimed by `worker_id`.
+            worker_id (str): Identifier of the worker running the job.
+
+        Returns:
+            str: The job's new status.
+        """
+        close_old_connections()
+        try:
+            job = Job.objects.using("default").get(id=job_id)
+            leased = Job.objects.using("default").filter(
+                id=job.id, status="RUNNING", locked_by=worker_id
+            )
+            if not leased.filter(locked_until__gt=timezone.now()).exists():
+                logger.warning("Job %s is no longer leased by %s", job, worker_id)
+                return job.status
+
+            try:
+                get_job(job.name)(**job.kwargs)
+            except Exception:
+                logger.exception("Job %s failed (attempt %d)", job, job.attempts)
+                if job.attempts >= job.max_attempts:
+                    status, changes = "FAILED", {"finished_at": timezone.now()}
+                else:
+                    status, changes = "QUEUED", {
+                        "run_at": timezone.now()
+                        + timedelta(seconds=JobService.retry_delay(job.attempts))
+                    }
+                leased.update(
+                    status=status,
+                    locked_until=None,
+                    last_error=traceback.format_exc(),
+                    **changes,
+                )
+                return status
+
+            leased.update(status="DONE", locked_until=None, finished_at=timezone.now())
+            return "DONE"
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def extend_leases(
+        job_ids: Iterable[int], worker_id: str, visibility_timeout: float
+    ) -> int:
+        """
+        Pushes back the visibility timeout of jobs the worker is still running.
+
+        Returns:
+            int: The number of leases extended.
+        """
+        return (
+            Job.objects.using("default")
+            .filter(id__in=list(job_ids), status="RUNNING", locked_by=worker_id)
+            .update(locked_until=timezone.now() + timedelta(seconds=visibility_timeout))
+        )
+
+    @staticmethod
+    def retry_delay(attempts: int) -> float:
+        """
+        Exponential backoff with jitter.
+
+        Args:
+            attempts (int): Attempts made so far.
+
+        Returns:
+            float: Seconds before the next attempt, between half and all of
+                `JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1)`, capped at
+                `JOB_RETRY_MAX_DELAY`.
+        """
+        delay = min(
+            settings.JOB_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0),
+            settings.JOB_RETRY_MAX_DELAY,
+        )
+        return delay * random.uniform(0.5, 1.0)
@@ -3,4 +3,4 @@
 set -e
 
 python manage.py migrate
-gunicorn --log-file /logs/gunicorn.log --config gunicorn.conf.py taskmaster.wsgi:application
+gunicorn --log-file /logs/gunicorn.log --config gunicorn.conf.py taskmaster.asgi:application
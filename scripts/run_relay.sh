@@ -0,0 +1,5 @@
+#!/bin/sh
+
+set -e
+
+python manage.py relay_task_events
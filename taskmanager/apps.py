@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+from taskmaster.slow_queries import install_query_timer
 
 
 class TaskmanagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'taskmanager'
+
+    def ready(self):
+        # Time every query, so slow ones are logged with their plan
+        connection_created.connect(install_query_timer)
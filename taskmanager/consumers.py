@@ -1,21 +1,272 @@
 """Task Manager Websocket APIs"""
 
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Callable, Optional
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.http import Http404
+from rest_framework import exceptions, status
 
 from accounts.services import User as UserModel
+from taskmanager.models import Task
+from taskmanager.serializers import TaskSerializer
+from taskmanager.services import TaskService
+from taskmaster.db import pooled_sync_to_async
+from taskmaster.profiling import current_profile, start_profile, write_profile
+from taskmaster.utils import parse_fields
+
+logger = logging.getLogger(__name__)
+
+# Task operations run on the shared async database pool
+create_task = pooled_sync_to_async(TaskService.create_task)
+get_task = pooled_sync_to_async(TaskService.get_task)
+list_tasks_after = pooled_sync_to_async(TaskService.list_tasks_after)
+update_task = pooled_sync_to_async(TaskService.update_task)
+delete_task = pooled_sync_to_async(TaskService.delete_task)
+
+MAX_PAGE_SIZE = 100
+TASK_ACTIONS = frozenset({"task_create", "task_update", "task_delete"})
+
+# Close codes of connections evicted by the server, after HTTP 408 and 429
+CLOSE_IDLE = 4408
+CLOSE_SLOW = 4429
+
+
+class ConnectionStats:
+    """
+    Counters describing the websocket connections of this process.
+
+    Consumers only update them from the event loop thread, so they need no lock.
+
+    Attributes:
+        open (int): Connections currently open.
+        opened (int): Connections accepted since the last reset.
+        evicted (dict): Connections closed by the server, by reason ("idle" or "slow").
+        queued_frames (int): Frames waiting in the send queues of every connection.
+        queued_bytes (int): Bytes waiting in the send queues of every connection.
+        max_queued_bytes (int): Largest send queue of a single connection, in bytes.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self.queued_frames = 0
+        self.queued_bytes = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset the cumulative counters; open connections and their queues are kept."""
+        self.opened = 0
+        self.evicted = {"idle": 0, "slow": 0}
+        self.max_queued_bytes = 0
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: A copy of the counters, including the average queued bytes per
+                open connection.
+        """
+        return {
+            "open": self.open,
+            "opened": self.opened,
+            "evicted": dict(self.evicted),
+            "queued_frames": self.queued_frames,
+            "queued_bytes": self.queued_bytes,
+            "max_queued_bytes": self.max_queued_bytes,
+            "queued_bytes_per_connection": (
+                self.queued_bytes / self.open if self.open else 0.0
+            ),
+        }
+
+
+connection_stats = ConnectionStats()
+
+
+def _task_id(data: dict) -> uuid.UUID:
+    """
+    Raises:
+        ValidationError: If `task_id` is missing or not a valid id.
+    """
+    try:
+        return uuid.UUID(str(data["task_id"]))
+    except (KeyError, ValueError):
+        raise exceptions.ValidationError(
+            detail={"task_id": "A valid task id is required."}
+        )
+
+
+def _version(data: dict) -> Optional[int]:
+    """
+    Raises:
+        ValidationError: If `version` is given but not a number.
+    """
+    version = data.get("version")
+    if version is None:
+        return None
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        raise exceptions.ValidationError(detail={"version": "Must be a number."})
+
+
+def _fields(data: dict):
+    """The sparse fieldset of a command, as a comma-separated string or a list."""
+    fields = data.get("fields")
+    if isinstance(fields, list):
+        fields = ",".join(map(str, fields))
+    return parse_fields(fields, TaskSerializer.READ_FIELDS)
+
+
+def _filter_values(data: dict, name: str, allowed=None) -> Optional[frozenset]:
+    """
+    Raises:
+        ValidationError: If the filter is not a list of allowed values.
+    """
+    values = data.get(name)
+    if values is None:
+        return None
+    if not isinstance(values, list):
+        raise exceptions.ValidationError(detail={name: "Must be a list."})
+
+    if allowed is None:
+        try:
+            return frozenset(str(uuid.UUID(str(value))) for value in values)
+        except ValueError:
+            raise exceptions.ValidationError(detail={name: "Must be a list of task ids."})
+
+    unknown = set(values) - allowed
+    if unknown:
+        raise exceptions.ValidationError(
+            detail={name: f"Unknown values: {sorted(map(str, unknown))}."}
+        )
+    return frozenset(values)
+
+
+def compile_event_filter(
+    statuses: Optional[frozenset] = None,
+    task_ids: Optional[frozenset] = None,
+    actions: Optional[frozenset] = None,
+) -> Optional[Callable[[dict], bool]]:
+    """
+    Build the predicate deciding which task events a subscription receives.
+
+    Only the given criteria are checked, and the sets are built once per subscription,
+    so evaluating an event costs a few set lookups. An update that moves a task out of
+    a subscribed status still matches (through its `previous_status`), so clients can
+    drop the task from their view.
+
+    Args:
+        statuses (frozenset, optional): Task statuses of interest.
+        task_ids (frozenset, optional): Task ids (as strings) of interest.
+        actions (frozenset, optional): Event actions, such as "task_update".
+
+    Returns:
+        Callable: The predicate, or None when every event matches.
+    """
+    checks = []
+    if statuses is not None:
+        checks.append(
+            lambda event: event.get("status_task") in statuses
+            or event.get("previous_status") in statuses
+        )
+    if task_ids is not None:
+        checks.append(lambda event: event.get("id") in task_ids)
+    if actions is not None:
+        checks.append(lambda event: event.get("action") in actions)
+
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda event: all(check(event) for check in checks)
 
 
 class AsyncTaskNotificationConsumer(AsyncJsonWebsocketConsumer):
     """
     WebSocket consumer to handle task notifications asynchronously.
+
+    Besides receiving notifications, clients can manage their tasks over the socket by
+    sending commands:
+
+        {"id": "1", "command": "update", "data": {"task_id": "...", "title": "..."}}
+
+    Commands: `get` (task_id, fields), `list` (after, page_size, fields), `create`
+    (title, description), `update` (task_id, title, description, status_task, version)
+    and `delete` (task_id, version). Each command is answered with a frame carrying the
+    same `id`:
+
+        {"id": "1", "status": 200, "data": {...}}
+        {"id": "1", "status": 404, "error": "Task not found"}
+
+    Clients may connect with `?connection_id=<id>` (up to 64 characters) and send the
+    same id in the `X-Connection-Id` header of their REST mutations: notifications of
+    changes made by a connection, over REST or its own commands, are not sent back to it.
+
+    The `subscribe` command (statuses, task_ids, actions) restricts the notifications
+    sent to the connection to the matching events, and `unsubscribe` lifts it.
+
+    Commands run concurrently, so responses may arrive in any order. At most
+    `settings.WS_MAX_IN_FLIGHT` commands of a connection run at the same time; further
+    commands are answered with a 429 until one finishes.
+
+    Outgoing frames go through a send queue drained by a background task, so a client
+    that reads slowly never blocks the consumer. A connection whose queue grows past
+    `settings.WS_SEND_QUEUE_SIZE` frames or `settings.WS_SEND_QUEUE_BYTES` bytes is
+    closed with code 4429. The same task sends `{"type": "ping"}` to clients quiet for
+    `settings.WS_PING_INTERVAL` seconds, and closes connections that sent nothing for
+    `settings.WS_IDLE_TIMEOUT` seconds with code 4408; clients answer with
+    `{"type": "pong"}` (any frame counts).
+
+    Connections opened with `?profile=<token>` (see `taskmaster.profiling`), or sampled
+    at `settings.PROFILING_SAMPLE_RATE`, are profiled: the consumer's tasks and the
+    database calls they make are sampled for up to `settings.PROFILING_MAX_SECONDS`,
+    and the profile is written when the connection closes.
     """
 
+    # Command name: (handler, status of a successful response)
+    COMMANDS = {
+        "get": ("command_get", status.HTTP_200_OK),
+        "list": ("command_list", status.HTTP_200_OK),
+        "create": ("command_create", status.HTTP_201_CREATED),
+        "update": ("command_update", status.HTTP_200_OK),
+        "delete": ("command_delete", status.HTTP_200_OK),
+        "subscribe": ("command_subscribe", status.HTTP_200_OK),
+        "unsubscribe": ("command_unsubscribe", status.HTTP_200_OK),
+    }
+
     async def connect(self):
         """
         Handles the WebSocket connection event.
         Adds the current WebSocket connection to a group and accepts the connection.
         If an error occurs, sends an error response.
         """
+        self.in_flight = set()
+        # Send queue of encoded frames, drained by the `pump` task once accepted
+        self.outbox = deque()
+        self.outbox_bytes = 0
+        self.outbox_ready = asyncio.Event()
+        self.pump = None
+        self.closing = False
+        self.last_received = time.monotonic()
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        connection_id = (query.get("connection_id") or [""])[0][:64]
+        # Identifies the changes this connection makes, so they are not echoed back
+        self.connection_id = connection_id or self.channel_name
+        # Predicate of the client's subscription; None forwards every event
+        self.event_filter = None
+        self.profile = start_profile(
+            f"ws {self.scope.get('path', '')}", (query.get("profile") or [""])[0]
+        )
+        if self.profile is not None:
+            self.profile.add_task(asyncio.current_task())
+            # Inherited by the command tasks and the database calls they make
+            current_profile.set(self.profile)
+
         try:
             # Define a group name for WebSocket communication
             self.user = self.scope.get("user")
@@ -27,9 +278,13 @@ class AsyncTaskNotificationConsumer(AsyncJsonWebsocketConsumer):
 
             # Accept the WebSocket connection
             await self.accept()
+            self.pump = asyncio.ensure_future(self.pump_frames())
+            if self.profile is not None:
+                self.profile.add_task(self.pump)
+            connection_stats.open += 1
+            connection_stats.opened += 1
         except AttributeError:
-            # TODO: Log the exception (optional)
-            # print(f"Error during WebSocket connection: {e}")
+            logger.exception("Error during WebSocket connection")
 
             # Send an error message to the client and close the connection
             await self.send_json(
@@ -45,18 +300,264 @@ class AsyncTaskNotificationConsumer(AsyncJsonWebsocketConsumer):
         Args:
             code (int): The disconnection code.
         """
+        # Commands still running have nobody left to answer to
+        for task in self.in_flight:
+            task.cancel()
+
+        if self.pump is not None:
+            self.pump.cancel()
+            self.clear_outbox()
+            connection_stats.open -= 1
+
         # Remove the current channel from the group when the WebSocket connection is closed
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+        if self.profile is not None:
+            self.profile.stop()
+            write_profile(self.profile)
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        self.last_received = time.monotonic()
+        await super().receive(text_data=text_data, bytes_data=bytes_data, **kwargs)
+
+    async def send_json(self, content, close=False):
+        """Queue a frame for the `pump` task; frames sent before accepting go out now."""
+        if self.pump is None or close:
+            await super().send_json(content, close=close)
+            return
+        await self.enqueue(await self.encode_json(content))
+
+    async def enqueue(self, frame: str) -> None:
+        """
+        Add a frame to the send queue, evicting the connection when the queue is full.
+
+        A frame is always accepted into an empty queue, whatever its size.
+        """
+        if self.closing:
+            return
+        if self.outbox and (
+            len(self.outbox) >= settings.WS_SEND_QUEUE_SIZE
+            or self.outbox_bytes + len(frame) > settings.WS_SEND_QUEUE_BYTES
+        ):
+            await self.evict(CLOSE_SLOW, "slow")
+            return
+
+        self.outbox.append(frame)
+        self.outbox_bytes += len(frame)
+        connection_stats.queued_frames += 1
+        connection_stats.queued_bytes += len(frame)
+        connection_stats.max_queued_bytes = max(
+            connection_stats.max_queued_bytes, self.outbox_bytes
+        )
+        self.outbox_ready.set()
+
+    def clear_outbox(self) -> None:
+        connection_stats.queued_frames -= len(self.outbox)
+        connection_stats.queued_bytes -= self.outbox_bytes
+        self.outbox.clear()
+        self.outbox_bytes = 0
+
+    async def pump_frames(self) -> None:
+        """Send queued frames in order, pinging quiet clients and evicting idle ones."""
+        interval = settings.WS_PING_INTERVAL
+        next_check = time.monotonic() + interval
+
+        while not self.closing:
+            now = time.monotonic()
+            if now >= next_check:
+                idle = now - self.last_received
+                if idle >= settings.WS_IDLE_TIMEOUT:
+                    await self.evict(CLOSE_IDLE, "idle")
+                    return
+                if idle >= interval:
+                    await self.send_json({"type": "ping"})
+                next_check = now + interval
+                continue
+
+            if not self.outbox:
+                self.outbox_ready.clear()
+                try:
+                    await asyncio.wait_for(self.outbox_ready.wait(), next_check - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            frame = self.outbox.popleft()
+            self.outbox_bytes -= len(frame)
+            connection_stats.queued_frames -= 1
+            connection_stats.queued_bytes -= len(frame)
+            await self.send(text_data=frame)
+
+    async def evict(self, code: int, reason: str) -> None:
+        """Drop the send queue and close the connection on the server's initiative."""
+        if self.closing:
+            return
+        self.closing = True
+        connection_stats.evicted[reason] += 1
+        logger.info("Closing %s websocket of user %s", reason, self.user.id)
+
+        if self.pump is not asyncio.current_task():
+            self.pump.cancel()
+        self.clear_outbox()
+        await self.close(code=code)
+
+    async def receive_json(self, content, **kwargs):
+        """
+        Handles a command sent by the client.
+
+        The command runs in the background so the consumer keeps reading frames (and
+        delivering notifications) meanwhile.
+
+        Args:
+            content: The decoded JSON frame.
+        """
+        if not isinstance(content, dict):
+            await self.send_json(
+                {"status": status.HTTP_400_BAD_REQUEST, "error": "Expected an object."}
+            )
+            return
+
+        # Heartbeats: any frame already counted as activity
+        if content.get("type") == "pong":
+            return
+        if content.get("type") == "ping":
+            await self.send_json({"type": "pong"})
+            return
+
+        request_id = content.get("id")
+        command = self.COMMANDS.get(content.get("command"))
+        if command is None:
+            await self.send_json(
+                {
+                    "id": request_id,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "error": f"Unknown command. Must be one of {list(self.COMMANDS)}.",
+                }
+            )
+            return
+
+        if len(self.in_flight) >= settings.WS_MAX_IN_FLIGHT:
+            await self.send_json(
+                {
+                    "id": request_id,
+                    "status": status.HTTP_429_TOO_MANY_REQUESTS,
+                    "error": "Too many commands in flight.",
+                }
+            )
+            return
+
+        handler, success_status = command
+        data = content.get("data")
+        task = asyncio.ensure_future(
+            self.run_command(
+                request_id,
+                getattr(self, handler),
+                data if isinstance(data, dict) else {},
+                success_status,
+            )
+        )
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+        if self.profile is not None:
+            self.profile.add_task(task)
+
+    async def run_command(
+        self, request_id, handler, data: dict, success_status: int
+    ) -> None:
+        """Run a command handler and answer with its result or error."""
+        try:
+            response = {"status": success_status, "data": await handler(data)}
+        except exceptions.APIException as error:
+            response = {"status": error.status_code, "error": error.detail}
+        except Http404:
+            response = {"status": status.HTTP_404_NOT_FOUND, "error": "Not found."}
+        except Exception:
+            logger.exception("Websocket command failed for user %s", self.user.id)
+            response = {
+                "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "error": "A server error occurred.",
+            }
+
+        await self.send_json({"id": request_id, **response})
+
+    async def command_get(self, data: dict):
+        return await get_task(self.user.id, _task_id(data), fields=_fields(data))
+
+    async def command_list(self, data: dict):
+        try:
+            page_size = min(int(data.get("page_size") or 10), MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            raise exceptions.ValidationError(detail={"page_size": "Must be a number."})
+
+        return await list_tasks_after(
+            self.user.id,
+            after=data.get("after"),
+            page_size=max(page_size, 1),
+            fields=_fields(data),
+        )
+
+    async def command_create(self, data: dict):
+        return await create_task(
+            self.user.id,
+            title=data.get("title"),
+            description=data.get("description", ""),
+            origin=self.connection_id,
+        )
+
+    async def command_update(self, data: dict):
+        return await update_task(
+            self.user.id,
+            _task_id(data),
+            title=data.get("title"),
+            description=data.get("description"),
+            status_task=data.get("status_task"),
+            version=_version(data),
+            origin=self.connection_id,
+        )
+
+    async def command_delete(self, data: dict):
+        return await delete_task(
+            self.user.id,
+            _task_id(data),
+            version=_version(data),
+            origin=self.connection_id,
+        )
+
+    async def command_subscribe(self, data: dict):
+        subscription = {
+            "statuses": _filter_values(data, "statuses", Task.STATUS_VALUES),
+            "task_ids": _filter_values(data, "task_ids"),
+            "actions": _filter_values(data, "actions", TASK_ACTIONS),
+        }
+        self.event_filter = compile_event_filter(**subscription)
+        return {
+            name: sorted(values)
+            for name, values in subscription.items()
+            if values is not None
+        }
+
+    async def command_unsubscribe(self, data: dict):
+        self.event_filter = None
+        return {}
 
     async def send_task(self, event: dict):
         """
         Sends a task notification message to the WebSocket client.
 
+        Events caused by this connection, or not matching the client's subscription, are
+        dropped before being serialized.
+
         Args:
             event (dict): The event dictionary containing the message to be sent.
         """
         # Retrieve the message from the event dictionary
         message = event["message"]
 
+        if event.get("origin") == self.connection_id:
+            return
+        if self.event_filter is not None and not self.event_filter(message):
+            return
+
         # Send the message to the WebSocket client as JSON
         await self.send_json(content=message)
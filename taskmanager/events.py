@@ -1,13 +1,28 @@
+import logging
+from datetime import datetime, timedelta
+from functools import partial
 from typing import Optional
 
+from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 
+from taskmanager.models import TaskEvent
 
-async def send_task(group_name: str, data: Optional[dict] = None) -> None:
+logger = logging.getLogger(__name__)
+
+
+async def send_task(
+    group_name: str, data: Optional[dict] = None, origin: str = ""
+) -> None:
     """
     Send Task Notification
 
-    This function is called from within the Task Create Service and is responsible for sending task notifications
+    This function is called by the outbox relay (`relay_events`) and is responsible for sending task notifications
     to a specified group via WebSocket. It calls the `send_task` method within the `AsyncTaskNotificationConsumer`.
 
     Required parameters:
@@ -15,6 +30,7 @@ async def send_task(group_name: str, data: Optional[dict] = None) -> None:
 
     Optional parameters:
     data: dict (optional) - A dictionary containing task details.
+    origin: str (optional) - The client connection that made the change; it is not sent the event.
     """
     channel_layer = get_channel_layer()
 
@@ -26,5 +42,166 @@ async def send_task(group_name: str, data: Optional[dict] = None) -> None:
         {
             "type": "send_task",
             "message": data,
+            "origin": origin,
         },
     )
+
+
+def enqueue_task_event(
+    group_name: str, data: dict, origin: Optional[str] = None
+) -> None:
+    """
+    Write a task notification to the transactional outbox.
+
+    Must be called inside the transaction that changes the task: the event is then
+    committed (or rolled back) together with the change, and published afterwards by
+    `relay_events`. Without a shared channel layer
+    (`settings.TASK_EVENTS_PUBLISH_ON_COMMIT`), the relay can't reach this process's
+    websocket clients, so the event is published here once the transaction commits.
+
+    Args:
+        group_name (str): The name of the group to send the message to.
+        data (dict): The message for websocket clients.
+        origin (str, optional): Id of the client connection that made the change. That
+            connection already knows about the change and is skipped.
+    """
+    event = TaskEvent.objects.create(
+        group_name=group_name, payload=data, origin=origin or ""
+    )
+    if settings.TASK_EVENTS_PUBLISH_ON_COMMIT:
+        transaction.on_commit(partial(publish_event, event), using="default")
+
+
+def publish_event(event: TaskEvent) -> None:
+    """
+    Publish a committed event from the process that wrote it and mark it delivered.
+
+    A failed publish is logged and leaves the event pending for `relay_events`.
+    """
+    try:
+        async_to_sync(_publish)([event])
+    except Exception:
+        logger.exception("Publishing %s failed", event)
+        return
+
+    TaskEvent.objects.using("default").filter(
+        id=event.id, delivered_at__isnull=True
+    ).update(delivered_at=timezone.now())
+
+
+async def _publish(events) -> None:
+    for event in events:
+        await send_task(
+            group_name=event.group_name, data=event.payload, origin=event.origin
+        )
+
+
+def relay_events(batch_size: int = 100, claim_timeout: float = 30) -> dict:
+    """
+    Publish the oldest pending outbox events and mark them delivered.
+
+    The batch is claimed for `claim_timeout` seconds in a short transaction, selecting
+    it with `SELECT ... FOR UPDATE SKIP LOCKED` (on Postgres), and published after that
+    transaction commits, without holding row locks. If publishing fails the claim is
+    released and the events are retried by the next call; if the relay dies, they are
+    retried once the claim expires. Delivery is therefore at least once. Everything
+    runs on the primary database, which is the only one guaranteed to hold
+    just-committed events.
+
+    Events of a group are published in the order they were written: a group with a
+    claimed batch in flight is skipped until that batch is delivered or its claim
+    expires. This relies on a single relay; two relays claiming at the same moment could
+    still publish events of one group out of order.
+
+    Args:
+        batch_size (int, optional): Maximum number of events published.
+        claim_timeout (float, optional): Seconds other relays leave a claimed batch
+            alone.
+
+    Returns:
+        dict: `relayed` (number of events), and `max_lag`/`avg_lag`, the seconds
+            between writing and publishing the events.
+
+    Raises:
+        ImproperlyConfigured: Without a shared channel layer
+            (`settings.TASK_EVENTS_PUBLISH_ON_COMMIT`). Events are then published by
+            the processes writing them, and a relay would mark them delivered after
+            publishing them to its own layer, which no websocket listens to.
+    """
+    if settings.TASK_EVENTS_PUBLISH_ON_COMMIT:
+        raise ImproperlyConfigured(
+            "Relaying task events requires a shared channel layer (REDIS_URL)."
+        )
+
+    now = timezone.now()
+    pending = TaskEvent.objects.using("default").filter(delivered_at__isnull=True)
+    in_flight = pending.filter(claimed_until__gte=now).values("group_name")
+    with transaction.atomic(using="default"):
+        events = list(
+            pending.select_for_update(skip_locked=True)
+            .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+            .exclude(group_name__in=in_flight)
+            .order_by("id")[:batch_size]
+        )
+        if not events:
+            return {"relayed": 0, "max_lag": 0.0, "avg_lag": 0.0}
+
+        claimed = TaskEvent.objects.using("default").filter(
+            id__in=[event.id for event in events]
+        )
+        claimed.update(claimed_until=now + timedelta(seconds=claim_timeout))
+
+    try:
+        async_to_sync(_publish)(events)
+    except Exception:
+        claimed.update(claimed_until=None)
+        raise
+
+    delivered_at = timezone.now()
+    claimed.update(delivered_at=delivered_at, claimed_until=None)
+
+    lags = [(delivered_at - event.created_at).total_seconds() for event in events]
+    stats = {
+        "relayed": len(events),
+        "max_lag": max(lags),
+        "avg_lag": sum(lags) / len(lags),
+    }
+    logger.info(
+        "Relayed %d task events (lag avg %.3fs, max %.3fs)",
+        stats["relayed"],
+        stats["avg_lag"],
+        stats["max_lag"],
+    )
+    return stats
+
+
+def pending_events() -> dict:
+    """
+    Returns:
+        dict: `pending`, the number of undelivered events, and `oldest_age`, the age in
+            seconds of the oldest one (0 when there are none).
+    """
+    pending = TaskEvent.objects.using("default").filter(delivered_at__isnull=True)
+    oldest = pending.order_by("id").values_list("created_at", flat=True).first()
+    return {
+        "pending": pending.count(),
+        "oldest_age": (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+def prune_events(delivered_before: datetime, batch_size: int = 1000) -> int:
+    """
+    Delete events delivered before `delivered_before`, in batches.
+
+    Returns:
+        int: The number of events deleted.
+    """
+    delivered = TaskEvent.objects.using("default").filter(
+        delivered_at__lt=delivered_before
+    )
+    deleted = 0
+    while True:
+        ids = list(delivered.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += TaskEvent.objects.using("default").filter(id__in=ids).delete()[0]
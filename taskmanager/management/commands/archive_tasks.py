@@ -0,0 +1,56 @@
+"""Move old completed tasks to the archive table"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from taskmanager.models import Task
+from taskmanager.services import TaskService
+
+
+class Command(BaseCommand):
+    """
+    Move DONE tasks that have not been updated for a number of days to the archive.
+
+    Usage:
+        python manage.py archive_tasks [--days 90] [--batch-size 1000] [--dry-run]
+
+    Tasks are moved in batches, each in its own short transaction, so the command can be
+    interrupted and re-run at any time. Run it periodically (e.g. daily from cron).
+    """
+
+    help = "Move old DONE tasks to the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.TASK_ARCHIVE_AFTER_DAYS,
+            help="Archive tasks not updated for this many days.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count the tasks to archive."
+        )
+
+    def handle(self, *args, days: int, batch_size: int, dry_run: bool, **options):
+        older_than = timezone.now() - timedelta(days=days)
+
+        if dry_run:
+            count = Task.objects.filter(
+                status_task="DONE", last_updated__lt=older_than
+            ).count()
+            self.stdout.write(f"{count} tasks would be archived.")
+            return
+
+        total = 0
+        while True:
+            archived = TaskService.archive_tasks(older_than, batch_size=batch_size)
+            if not archived:
+                break
+            total += archived
+            self.stdout.write(f"Archived {total} tasks...")
+
+        self.stdout.write(f"{total} tasks archived.")
@@ -0,0 +1,390 @@
+"""Benchmarks for the production server deployments"""
+
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from taskmaster.utils import generate_user_tokens
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _raise_open_files_limit() -> None:
+    """Allow as many open sockets as the hard limit permits; servers inherit it."""
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _process_tree_rss(pid: int):
+    """
+    Total RSS of a process and its descendants in bytes, from `/proc`.
+
+    Returns None where `/proc` is not available.
+    """
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total, pending = 0, [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/statm") as statm:
+                total += int(statm.read().split()[1]) * page_size
+            for task in Path(f"/proc/{current}/task").iterdir():
+                pending += map(int, (task / "children").read_text().split())
+    except (OSError, ValueError):
+        return None
+    return total
+
+
+def _percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    """
+    Read an HTTP/1.1 response.
+
+    Returns:
+        tuple: The status code and whether the server closes the connection.
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in header_lines:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+
+    return int(status_line.split()[1]), headers.get("connection") == "close"
+
+
+class Command(BaseCommand):
+    """
+    Compare the production server deployments under load.
+
+    Usage:
+        python manage.py benchmark_server --workers 4 --duration 10 --concurrency 64
+                                          --connections 5000
+
+    Deployments:
+        asgi:  gunicorn configured by `gunicorn.conf.py`, serving
+               `taskmaster.asgi:application` (HTTP and websockets) on `--workers`
+               uvicorn workers.
+        split: The former deployment: gunicorn sync workers (2 x `--workers` + 1)
+               serving `taskmaster.wsgi:application`, and a single daphne process
+               serving websockets.
+
+    Each deployment is started on free local ports against the configured database
+    (migrations must be applied), then measured:
+        HTTP: `--concurrency` keep-alive clients request the first task page of a
+              benchmark user for `--duration` seconds. Reports throughput and latency.
+        websockets: Up to `--connections` authenticated sockets are opened,
+              `--batch-size` at a time, and kept open. Reports how many the server held,
+              the RSS its processes gained per socket and the round trip of an
+              application-level ping sent on every socket.
+
+    The load generator runs in this process: give it spare cores, or lower the load,
+    so it doesn't become the bottleneck.
+    """
+
+    help = "Compare the throughput and websocket capacity of the server deployments."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--deployments",
+            default="asgi,split",
+            help="Comma-separated deployments to measure: asgi, split.",
+        )
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--connections", type=int, default=5000)
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, deployments: str, **options):
+        try:
+            import websockets  # noqa: F401
+        except ImportError:
+            raise CommandError("The websockets package is required by this benchmark.")
+
+        _raise_open_files_limit()
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark_user", defaults={"email": "benchmark_user@example.com"}
+        )
+        token = generate_user_tokens(user)["access"]
+
+        for deployment in deployments.split(","):
+            deployment = deployment.strip()
+            if deployment not in ("asgi", "split"):
+                raise CommandError(f"Unknown deployment: {deployment}")
+
+            self.stdout.write(f"== {deployment}")
+            with getattr(self, f"start_{deployment}")(options["workers"]) as servers:
+                self.run_deployment(servers, token, **options)
+
+    def server_command(self, *args) -> list:
+        """A gunicorn command line using `gunicorn.conf.py` with quiet logs."""
+        return [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--config",
+            str(Path(settings.BASE_DIR) / "gunicorn.conf.py"),
+            "--access-logfile",
+            os.devnull,
+            "--error-logfile",
+            "-",
+            "--log-level",
+            "warning",
+            *args,
+        ]
+
+    @contextmanager
+    def start_asgi(self, workers: int):
+        port = _free_port()
+        with self.serve(
+            self.server_command(
+                "--bind",
+                f"127.0.0.1:{port}",
+                "--workers",
+                str(workers),
+                "taskmaster.asgi:application",
+            )
+        ) as process:
+            yield {"http": port, "websocket": port, "processes": [process]}
+
+    @contextmanager
+    def start_split(self, workers: int):
+        http_port, websocket_port = _free_port(), _free_port()
+        gunicorn = self.server_command(
+            "--bind",
+            f"127.0.0.1:{http_port}",
+            "--workers",
+            str(workers * 2 + 1),
+            "--worker-class",
+            "sync",
+            "taskmaster.wsgi:application",
+        )
+        daphne = [
+            sys.executable,
+            "-m",
+            "daphne",
+            "-b",
+            "127.0.0.1",
+            "-p",
+            str(websocket_port),
+            "taskmaster.asgi:application",
+        ]
+        with self.serve(gunicorn) as http, self.serve(daphne) as websocket:
+            yield {
+                "http": http_port,
+                "websocket": websocket_port,
+                "processes": [http, websocket],
+            }
+
+    @contextmanager
+    def serve(self, command: list):
+        """Run a server until the block exits, then stop it gracefully."""
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(
+                command, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=log
+            )
+            try:
+                yield process
+            except Exception:
+                log.seek(0)
+                self.stderr.write(log.read().decode(errors="replace")[-2000:])
+                raise
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    def run_deployment(self, servers: dict, token: str, **options):
+        asyncio.run(self.wait_ready(servers, token))
+        http = asyncio.run(self.load_http(servers["http"], token, **options))
+        websocket = asyncio.run(self.load_websockets(servers, token, **options))
+
+        latencies = http["latencies"]
+        self.stdout.write(
+            f"http requests:        {len(latencies)} ({http['errors']} errors)"
+        )
+        self.stdout.write(
+            f"http throughput:      {len(latencies) / options['duration']:.1f} req/s"
+        )
+        self.stdout.write(
+            f"http latency p50/p99: {_percentile(latencies, 0.5) * 1000:.1f}ms / "
+            f"{_percentile(latencies, 0.99) * 1000:.1f}ms"
+        )
+        self.stdout.write(
+            f"sockets held:         {websocket['held']} of {options['connections']} "
+            f"({websocket['connect_time']:.1f}s)"
+        )
+        if websocket["rss_per_socket"] is not None:
+            self.stdout.write(
+                f"server RSS per socket: {websocket['rss_per_socket'] / 1024:.1f} KiB"
+            )
+        pings = websocket["pings"]
+        if pings:
+            self.stdout.write(
+                f"ping p50/p99:         {statistics.median(pings) * 1000:.1f}ms / "
+                f"{_percentile(pings, 0.99) * 1000:.1f}ms"
+            )
+
+    async def request(self, port: int, token: str, reader=None, writer=None):
+        """Send one task list request, opening a connection when none is given."""
+        if writer is None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            (
+                "GET /api/v1/tasks/ HTTP/1.1\r\n"
+                "Host: localhost\r\n"
+                f"Authorization: Bearer {token}\r\n"
+                "\r\n"
+            ).encode()
+        )
+        status_code, closing = await _read_response(reader)
+        if closing:
+            writer.close()
+            reader = writer = None
+        return status_code, reader, writer
+
+    async def wait_ready(self, servers: dict, token: str, timeout: float = 60) -> None:
+        """Wait until every server answers, raising if one exited."""
+        deadline = time.monotonic() + timeout
+        for port in {servers["http"], servers["websocket"]}:
+            while True:
+                if any(process.poll() is not None for process in servers["processes"]):
+                    raise CommandError("A server exited during startup.")
+                try:
+                    _, _, writer = await self.request(port, token)
+                    if writer is not None:
+                        writer.close()
+                    break
+                except (OSError, asyncio.IncompleteReadError):
+                    if time.monotonic() > deadline:
+                        raise CommandError(f"No server answered on port {port}.")
+                    await asyncio.sleep(0.2)
+
+    async def load_http(
+        self, port: int, token: str, duration: float, concurrency: int, **options
+    ):
+        latencies, errors = [], 0
+        deadline = time.monotonic() + duration
+
+        async def client():
+            nonlocal errors
+            reader = writer = None
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    status_code, reader, writer = await self.request(
+                        port, token, reader, writer
+                    )
+                except (OSError, asyncio.IncompleteReadError):
+                    errors += 1
+                    reader = writer = None
+                    continue
+                if status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+            if writer is not None:
+                writer.close()
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return {"latencies": latencies, "errors": errors}
+
+    async def load_websockets(
+        self, servers: dict, token: str, connections: int, batch_size: int, **options
+    ):
+        import websockets
+
+        uri = f"ws://127.0.0.1:{servers['websocket']}/ws/tasks/"
+        processes = servers["processes"]
+        websocket_process = processes[-1]
+        baseline = _process_tree_rss(websocket_process.pid)
+
+        async def open_socket():
+            try:
+                return await websockets.connect(
+                    uri,
+                    extra_headers={"authorization": token},
+                    open_timeout=60,
+                    # Measure the server, not protocol-level keepalives
+                    ping_interval=None,
+                )
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException):
+                return None
+
+        sockets = []
+        started = time.perf_counter()
+        for offset in range(0, connections, batch_size):
+            batch = await asyncio.gather(
+                *(open_socket() for _ in range(min(batch_size, connections - offset)))
+            )
+            sockets += [sock for sock in batch if sock is not None]
+        connect_time = time.perf_counter() - started
+
+        held = _process_tree_rss(websocket_process.pid)
+        rss_per_socket = (
+            (held - baseline) / len(sockets) if sockets and held and baseline else None
+        )
+
+        async def ping(sock):
+            try:
+                started = time.perf_counter()
+                await sock.send('{"type": "ping"}')
+                await asyncio.wait_for(sock.recv(), timeout=60)
+                return time.perf_counter() - started
+            except (asyncio.TimeoutError, websockets.WebSocketException):
+                return None
+
+        pings = []
+        for offset in range(0, len(sockets), batch_size):
+            pings += await asyncio.gather(
+                *(ping(sock) for sock in sockets[offset : offset + batch_size])
+            )
+        for offset in range(0, len(sockets), batch_size):
+            await asyncio.gather(
+                *(sock.close() for sock in sockets[offset : offset + batch_size])
+            )
+
+        return {
+            "held": len(sockets),
+            "connect_time": connect_time,
+            "rss_per_socket": rss_per_socket,
+            "pings": [rtt for rtt in pings if rtt is not None],
+        }
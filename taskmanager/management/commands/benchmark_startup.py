@@ -0,0 +1,207 @@
+"""Benchmarks for the application's cold start"""
+
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from taskmanager.management.commands.benchmark_server import _free_port
+
+# Run in a fresh interpreter: times the import of the ASGI application and two requests
+FIRST_REQUEST_SCRIPT = """
+import asyncio, json, sys, time
+
+started = time.time()
+from taskmaster.asgi import application
+imported = time.time()
+
+
+async def request(path):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]["status"]
+
+
+status = asyncio.run(request(sys.argv[1]))
+first = time.time()
+asyncio.run(request(sys.argv[1]))
+second = time.time()
+print(json.dumps({"started": started, "imported": imported, "first": first,
+                  "second": second, "status": status}))
+"""
+
+
+def _median(runs: list, key: str) -> float:
+    return statistics.median(run[key] for run in runs)
+
+
+class Command(BaseCommand):
+    """
+    Measure how fast a fresh process serves its first request.
+
+    Usage:
+        python manage.py benchmark_startup [--runs 5] [--top 15] [--server --workers 2]
+
+    Reports:
+        imports: `python -X importtime` of `taskmaster.asgi` in a fresh interpreter,
+              with the time spent in each top-level package (its own modules only).
+        first request: Medians over `--runs` fresh interpreters of the interpreter
+              start, the import of `taskmaster.asgi`, the first request to `--path`
+              through the ASGI application and a second, warm, request.
+        server (`--server`): Time from starting gunicorn with `gunicorn.conf.py` and
+              `--workers` workers to its first response, without and with WEB_PRELOAD.
+
+    Everything runs with the current environment, so set ENVIRONMENT=PROD (and the
+    production database settings) to measure the production startup path.
+    """
+
+    help = "Report the import time breakdown and time to first request."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument("--path", default="/api/v1/tasks/")
+        parser.add_argument("--server", action="store_true")
+        parser.add_argument("--workers", type=int, default=2)
+
+    def handle(self, *args, runs: int, top: int, path: str, server: bool, **options):
+        self.report_imports(top)
+        self.report_first_request(runs, path)
+        if server:
+            self.report_server(options["workers"], path)
+
+    def run_python(self, *args, env=None) -> subprocess.CompletedProcess:
+        result = subprocess.run(
+            [sys.executable, *args],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        return result
+
+    def report_imports(self, top: int) -> None:
+        result = self.run_python("-X", "importtime", "-c", "import taskmaster.asgi")
+
+        packages = Counter()
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            own, _, name = line[len("import time:") :].split("|")
+            if own.strip().isdigit():
+                packages[name.strip().split(".")[0]] += int(own)
+
+        total = sum(packages.values())
+        self.stdout.write(f"import taskmaster.asgi: {total / 1000:.1f}ms")
+        for package, microseconds in packages.most_common(top):
+            share = microseconds / total
+            self.stdout.write(
+                f"  {package:<28} {microseconds / 1000:>8.1f}ms  {share:>6.1%}"
+            )
+
+    def report_first_request(self, runs: int, path: str) -> None:
+        timings = []
+        for _ in range(runs):
+            spawned = time.time()
+            result = self.run_python("-c", FIRST_REQUEST_SCRIPT, path)
+            timing = json.loads(result.stdout.strip().splitlines()[-1])
+            timings.append(
+                {
+                    "interpreter": timing["started"] - spawned,
+                    "import": timing["imported"] - timing["started"],
+                    "first": timing["first"] - timing["imported"],
+                    "second": timing["second"] - timing["first"],
+                    "total": timing["first"] - spawned,
+                    "status": timing["status"],
+                }
+            )
+
+        self.stdout.write(f"first request to {path} (median of {runs}):")
+        for key, label in (
+            ("interpreter", "interpreter start"),
+            ("import", "import application"),
+            ("first", "first request"),
+            ("second", "second request"),
+            ("total", "time to first response"),
+        ):
+            self.stdout.write(f"  {label:<24} {_median(timings, key) * 1000:>8.1f}ms")
+        self.stdout.write(f"  {'status':<24} {timings[-1]['status']:>8}")
+
+    def report_server(self, workers: int, path: str) -> None:
+        self.stdout.write(f"gunicorn with {workers} workers, until the first response:")
+        for preload in ("false", "true"):
+            port = _free_port()
+            env = {**os.environ, "WEB_PRELOAD": preload}
+            spawned = time.monotonic()
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "gunicorn",
+                    "--config",
+                    str(Path(settings.BASE_DIR) / "gunicorn.conf.py"),
+                    "--bind",
+                    f"127.0.0.1:{port}",
+                    "--workers",
+                    str(workers),
+                    "--access-logfile",
+                    os.devnull,
+                    "--error-logfile",
+                    os.devnull,
+                    "taskmaster.asgi:application",
+                ],
+                cwd=settings.BASE_DIR,
+                env=env,
+            )
+            try:
+                elapsed = self.wait_first_response(port, path, process, spawned)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            self.stdout.write(f"  WEB_PRELOAD={preload:<5} {elapsed * 1000:>14.1f}ms")
+
+    def wait_first_response(self, port, path, process, spawned, timeout: float = 60):
+        while time.monotonic() - spawned < timeout:
+            if process.poll() is not None:
+                raise CommandError("gunicorn exited during startup.")
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            try:
+                connection.request("GET", path)
+                connection.getresponse().read()
+                return time.monotonic() - spawned
+            except OSError:
+                time.sleep(0.01)
+            finally:
+                connection.close()
+        raise CommandError(f"No response from gunicorn within {timeout}s.")
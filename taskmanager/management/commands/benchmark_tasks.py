@@ -0,0 +1,525 @@
+"""Benchmarks for the task manager data layer"""
+
+import asyncio
+import gc
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+from asgiref.sync import async_to_sync
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from taskmanager.consumers import AsyncTaskNotificationConsumer, connection_stats
+from taskmanager.events import send_task
+from taskmanager.models import Task
+from taskmanager.serializers import TaskSerializer
+from taskmaster import env
+from taskmaster.db import pool_stats, pooled_sync_to_async
+from taskmaster.handlers import PooledASGIHandler
+from taskmaster.middlewares import ENCODERS, CompressionMiddleware
+from taskmaster.utils import generate_user_tokens, get_rss, uuid7
+
+PRIMARY_KEY_GENERATORS = {4: uuid.uuid4, 7: uuid7}
+STATUS_INDEX = "benchmark_task_user_status"
+WORDS = (
+    "review update deploy backend frontend meeting notes draft report client invoice "
+    "proposal design sprint release fix bug test migrate database schedule call team "
+    "budget roadmap feedback follow up prepare write send check plan weekly project"
+).split()
+
+
+@pooled_sync_to_async
+def _ping_database():
+    """Run a trivial query on a pooled connection."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def _server_connections() -> int:
+    """Number of connections the Postgres server holds for the current database."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()"
+        )
+        return cursor.fetchone()[0]
+
+
+def _table_sizes(table: str):
+    """
+    Return the on-disk size of a table and of its indexes in bytes.
+
+    Uses `pg_relation_size`/`pg_indexes_size` on Postgres and the `dbstat` virtual table
+    on SQLite. Returns (None, None) when the backend cannot report sizes.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT pg_relation_size(%s), pg_indexes_size(%s)", [table, table]
+            )
+            return cursor.fetchone()
+
+        if connection.vendor == "sqlite":
+            try:
+                cursor.execute(
+                    "SELECT s.name, sum(s.pgsize) FROM dbstat s "
+                    "JOIN sqlite_master m ON m.name = s.name "
+                    "WHERE m.tbl_name = %s GROUP BY s.name",
+                    [table],
+                )
+            except OperationalError:
+                # SQLite was compiled without SQLITE_ENABLE_DBSTAT_VTAB
+                return None, None
+            sizes = dict(cursor.fetchall())
+            table_size = sizes.pop(table, 0)
+            return table_size, sum(sizes.values())
+
+    return None, None
+
+
+def _compact(table: str) -> None:
+    """Rebuild a table and its indexes so size measurements start from scratch."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"VACUUM FULL {connection.ops.quote_name(table)}")
+        elif connection.vendor == "sqlite":
+            cursor.execute("VACUUM")
+
+
+def _is_partitioned(table: str) -> bool:
+    """Whether the table is a partitioned table (Postgres only)."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass)",
+            [table],
+        )
+        return cursor.fetchone()[0]
+
+
+def _analyze(table: str) -> None:
+    """Refresh planner statistics after a bulk load."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+
+
+def _task_list_body(page_size: int) -> bytes:
+    """Render a page of the task list as `ListTasksAPI` would, without the database."""
+    statuses = list(dict(Task.TASK_STATUS))
+    now = timezone.now()
+    tasks = [
+        Task(
+            id=uuid7(),
+            title=" ".join(random.choices(WORDS, k=random.randint(2, 8))).capitalize(),
+            description=" ".join(random.choices(WORDS, k=random.randint(0, 80))),
+            status_task=random.choice(statuses),
+            date_created=now,
+            last_updated=now,
+        )
+        for _ in range(page_size)
+    ]
+    return JSONRenderer().render(
+        {
+            "count": page_size,
+            "previous": None,
+            "next": None,
+            "results": TaskSerializer(tasks, many=True).data,
+        }
+    )
+
+
+def _format_size(size) -> str:
+    return "n/a" if size is None else f"{size / 1024 / 1024:.1f} MiB"
+
+
+class Command(BaseCommand):
+    """
+    Run a benchmark scenario against the configured database.
+
+    Usage:
+        python manage.py benchmark_tasks pool --requests 5000 --concurrency 200
+
+    Scenarios:
+        pool: Fire concurrent async queries through `pooled_sync_to_async` and report
+              throughput, pool wait times and (on Postgres) server-side connections.
+        handler: Serve `--requests` task list requests, `--concurrency` at a time, with
+              Django's ASGI handler and then with `PooledASGIHandler`, keeping
+              connections for `DB_CONN_MAX_AGE` seconds as in production. Reports the
+              database connections each opened, their throughput and (on Postgres) the
+              server-side connections left open.
+        pk:   Insert `--rows` tasks with UUIDv4 and then UUIDv7 primary keys and report
+              insert throughput plus table and index size for each.
+              Run it against an otherwise empty task table.
+        status: Insert `--rows` tasks spread over every status, index them on
+              (user, status) and report bytes per row, table and index size and the
+              latency of a per-status count. Run it before and after a change to the
+              status column to compare its footprint.
+        partition: Grow the task table to `--rows` in `--steps` steps spread over
+              `--users` users and, after each step, report the latency of the first page
+              and a per-status count for a user who owns a fixed 100 tasks. With partitioning (DB_TASK_PARTITIONS)
+              per-user latency should stay flat as the table grows.
+        compression: Render task list pages of `--page-sizes` tasks and, for every
+              available encoding, report the bytes saved by `CompressionMiddleware` and
+              the latency it adds (averaged over `--samples` runs).
+        websockets: Hold `--connections` simulated sockets of `--users` users open on
+              the notification consumer, in process, and report the RSS they add per
+              connection, then the time to fan one event out to every socket. The
+              simulated client side (`WebsocketCommunicator`) is included in the figure.
+              The in-memory channel layer scans every channel on each message, so run
+              it with REDIS_URL set for representative fan-out times.
+    """
+
+    help = "Run a benchmark scenario against the configured database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenario",
+            choices=[
+                "pool",
+                "handler",
+                "pk",
+                "status",
+                "partition",
+                "compression",
+                "websockets",
+            ],
+        )
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--steps", type=int, default=5)
+        parser.add_argument("--samples", type=int, default=200)
+        parser.add_argument("--page-sizes", default="10,100,1000")
+        parser.add_argument("--connections", type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        getattr(self, f"run_{options['scenario']}")(**options)
+
+    def run_pool(self, requests: int, concurrency: int, **options):
+        """Load test the shared async connection pool."""
+        pool_stats.reset()
+        open_connections = 0
+
+        async def worker(count: int):
+            for _ in range(count):
+                await _ping_database()
+
+        async def load():
+            per_worker, remainder = divmod(requests, concurrency)
+            await asyncio.gather(
+                *(
+                    worker(per_worker + (1 if index < remainder else 0))
+                    for index in range(concurrency)
+                )
+            )
+
+        started = time.perf_counter()
+        async_to_sync(load)()
+        elapsed = time.perf_counter() - started
+
+        if connection.vendor == "postgresql":
+            open_connections = _server_connections()
+
+        stats = pool_stats.snapshot()
+        self.stdout.write(f"requests:           {requests}")
+        self.stdout.write(f"concurrency:        {concurrency}")
+        self.stdout.write(f"elapsed:            {elapsed:.3f}s")
+        self.stdout.write(f"throughput:         {requests / elapsed:.1f} req/s")
+        self.stdout.write(f"pool size:          {stats['size']}")
+        self.stdout.write(f"avg pool wait:      {stats['avg_wait'] * 1000:.3f}ms")
+        self.stdout.write(f"max pool wait:      {stats['max_wait'] * 1000:.3f}ms")
+        if open_connections:
+            self.stdout.write(f"server connections: {open_connections}")
+
+    def run_handler(self, requests: int, concurrency: int, **options):
+        """Count the connections opened by HTTP requests under each ASGI handler."""
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark_user", defaults={"email": "benchmark_user@example.com"}
+        )
+        token = generate_user_tokens(user)["access"]
+        headers = [(b"authorization", f"Bearer {token}".encode())]
+        opened = 0
+
+        def on_connection_created(sender, connection, **kwargs):
+            nonlocal opened
+            if connection.alias == "default":
+                opened += 1
+
+        async def client(application, count: int):
+            for _ in range(count):
+                communicator = HttpCommunicator(
+                    application, "GET", "/api/v1/tasks/", headers=headers
+                )
+                await communicator.get_response(timeout=60)
+
+        async def load(application):
+            per_client, remainder = divmod(requests, concurrency)
+            await asyncio.gather(
+                *(
+                    client(application, per_client + (1 if index < remainder else 0))
+                    for index in range(concurrency)
+                )
+            )
+
+        max_age = connection.settings_dict["CONN_MAX_AGE"]
+        connection.settings_dict["CONN_MAX_AGE"] = env.DB_CONN_MAX_AGE
+        connection_created.connect(on_connection_created)
+        try:
+            for name, application in (
+                ("django", ASGIHandler()),
+                ("pooled", PooledASGIHandler()),
+            ):
+                opened = 0
+                started = time.perf_counter()
+                async_to_sync(load)(application)
+                elapsed = time.perf_counter() - started
+
+                self.stdout.write(f"== {name}")
+                self.stdout.write(f"requests:           {requests}")
+                self.stdout.write(f"throughput:         {requests / elapsed:.1f} req/s")
+                self.stdout.write(f"connections opened: {opened}")
+                if connection.vendor == "postgresql":
+                    self.stdout.write(f"server connections: {_server_connections()}")
+                if isinstance(application, PooledASGIHandler):
+                    application.shutdown()
+        finally:
+            connection_created.disconnect(on_connection_created)
+            connection.settings_dict["CONN_MAX_AGE"] = max_age
+
+    def run_pk(self, rows: int, batch_size: int, **options):
+        """Compare insert throughput and index size of UUIDv4 and UUIDv7 keys."""
+        table = Task._meta.db_table
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark_user", defaults={"email": "benchmark_user@example.com"}
+        )
+
+        for version, generate in PRIMARY_KEY_GENERATORS.items():
+            Task.objects.filter(user=user).delete()
+            _compact(table)
+
+            started = time.perf_counter()
+            for offset in range(0, rows, batch_size):
+                Task.objects.bulk_create(
+                    Task(id=generate(), user=user, title=f"Task {index}")
+                    for index in range(offset, min(offset + batch_size, rows))
+                )
+            elapsed = time.perf_counter() - started
+
+            table_size, index_size = _table_sizes(table)
+            self.stdout.write(f"uuid{version}:")
+            self.stdout.write(f"  rows:        {rows}")
+            self.stdout.write(f"  elapsed:     {elapsed:.3f}s")
+            self.stdout.write(f"  throughput:  {rows / elapsed:.1f} rows/s")
+            self.stdout.write(f"  table size:  {_format_size(table_size)}")
+            self.stdout.write(f"  index size:  {_format_size(index_size)}")
+
+        Task.objects.filter(user=user).delete()
+        user.delete()
+
+    def run_status(self, rows: int, batch_size: int, **options):
+        """Measure the row width and index size taken by the task status column."""
+        table = Task._meta.db_table
+        column = Task._meta.get_field("status_task")
+        statuses = list(dict(Task.TASK_STATUS))
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark_user", defaults={"email": "benchmark_user@example.com"}
+        )
+        Task.objects.filter(user=user).delete()
+
+        for offset in range(0, rows, batch_size):
+            Task.objects.bulk_create(
+                Task(user=user, title=f"Task {index}", status_task=statuses[index % 3])
+                for index in range(offset, min(offset + batch_size, rows))
+            )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX {STATUS_INDEX} ON {connection.ops.quote_name(table)} "
+                f"(user_id, {connection.ops.quote_name(column.column)})"
+            )
+        _compact(table)
+        table_size, index_size = _table_sizes(table)
+
+        started = time.perf_counter()
+        for status_task in statuses:
+            Task.objects.filter(user=user, status_task=status_task).count()
+        elapsed = time.perf_counter() - started
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX {STATUS_INDEX}")
+
+        self.stdout.write(f"status column:   {column.db_type(connection)}")
+        self.stdout.write(f"rows:            {rows}")
+        if table_size is not None:
+            self.stdout.write(f"bytes per row:   {table_size / rows:.1f}")
+        self.stdout.write(f"table size:      {_format_size(table_size)}")
+        self.stdout.write(f"index size:      {_format_size(index_size)}")
+        self.stdout.write(f"count by status: {elapsed / len(statuses) * 1000:.3f}ms")
+
+        Task.objects.filter(user=user).delete()
+        user.delete()
+
+    def run_partition(
+        self, rows: int, batch_size: int, users: int, steps: int, samples: int, **options
+    ):
+        """Measure per-user query latency while the task table grows."""
+        table = Task._meta.db_table
+        User = get_user_model()
+        statuses = list(dict(Task.TASK_STATUS))
+        User.objects.bulk_create(
+            User(username=f"benchmark_user_{index}", email=f"benchmark_{index}@example.com")
+            for index in range(users)
+        )
+        user_ids = list(
+            User.objects.filter(username__startswith="benchmark_user_").values_list(
+                "id", flat=True
+            )
+        )
+        # The probed user owns a fixed number of tasks; the table grows around them
+        probe, user_ids = user_ids[0], user_ids[1:]
+        Task.objects.bulk_create(
+            Task(user_id=probe, title=f"Probe {index}", status_task=statuses[index % 3])
+            for index in range(100)
+        )
+
+        self.stdout.write(f"partitioned: {_is_partitioned(table)}")
+        self.stdout.write(f"{'rows':>12}  {'first page':>12}  {'count':>12}")
+
+        inserted = 0
+        for step in range(1, steps + 1):
+            target = rows * step // steps
+            while inserted < target:
+                size = min(batch_size, target - inserted)
+                Task.objects.bulk_create(
+                    Task(
+                        user_id=user_ids[index % len(user_ids)],
+                        title=f"Task {index}",
+                        status_task=statuses[index % 3],
+                    )
+                    for index in range(inserted, inserted + size)
+                )
+                inserted += size
+            _analyze(table)
+
+            started = time.perf_counter()
+            for _ in range(samples):
+                list(Task.objects.filter(user_id=probe).order_by("id")[:10])
+            page_latency = (time.perf_counter() - started) / samples
+
+            started = time.perf_counter()
+            for _ in range(samples):
+                Task.objects.filter(user_id=probe, status_task="DONE").count()
+            count_latency = (time.perf_counter() - started) / samples
+
+            self.stdout.write(
+                f"{inserted:>12}  {page_latency * 1000:>10.3f}ms  {count_latency * 1000:>10.3f}ms"
+            )
+
+        Task.objects.filter(user_id__in=[probe, *user_ids]).delete()
+        User.objects.filter(id__in=[probe, *user_ids]).delete()
+
+    def run_compression(self, page_sizes: str, samples: int, **options):
+        """Measure bytes saved and latency added by response compression."""
+        random.seed(0)
+        request_factory = RequestFactory()
+
+        self.stdout.write(
+            f"{'tasks':>6}  {'encoding':>8}  {'bytes':>10}  {'saved':>7}  {'latency':>10}"
+        )
+        for page_size in [int(size) for size in page_sizes.split(",")]:
+            body = _task_list_body(page_size)
+            self.stdout.write(f"{page_size:>6}  {'identity':>8}  {len(body):>10}")
+
+            for encoding in ENCODERS:
+                middleware = CompressionMiddleware(
+                    lambda request: HttpResponse(body, content_type="application/json")
+                )
+                request = request_factory.get("/", HTTP_ACCEPT_ENCODING=encoding)
+                # Rendering the response is measured separately and subtracted
+                started = time.perf_counter()
+                for _ in range(samples):
+                    HttpResponse(body, content_type="application/json")
+                baseline = time.perf_counter() - started
+
+                started = time.perf_counter()
+                for _ in range(samples):
+                    response = middleware(request)
+                latency = (time.perf_counter() - started - baseline) / samples
+
+                size = len(response.content)
+                self.stdout.write(
+                    f"{page_size:>6}  {response.get('Content-Encoding', 'none'):>8}  "
+                    f"{size:>10}  {1 - size / len(body):>6.1%}  {latency * 1000:>8.3f}ms"
+                )
+
+    def run_websockets(self, connections: int, users: int, **options):
+        """Measure the memory held per open websocket and the cost of a fan-out."""
+        users = [SimpleNamespace(id=uuid.uuid4()) for _ in range(min(users, connections))]
+        batch_size = 1000
+
+        async def soak():
+            communicators = []
+            gc.collect()
+            baseline = get_rss()
+
+            started = time.perf_counter()
+            for offset in range(0, connections, batch_size):
+                batch = []
+                for index in range(offset, min(offset + batch_size, connections)):
+                    communicator = WebsocketCommunicator(
+                        AsyncTaskNotificationConsumer.as_asgi(), "/ws/tasks/"
+                    )
+                    communicator.scope["user"] = users[index % len(users)]
+                    batch.append(communicator)
+                await asyncio.gather(
+                    *(communicator.connect(timeout=60) for communicator in batch)
+                )
+                communicators += batch
+            connect_time = time.perf_counter() - started
+
+            gc.collect()
+            held = get_rss() - baseline
+            stats = connection_stats.snapshot()
+
+            started = time.perf_counter()
+            for user in users:
+                await send_task(f"user_{user.id}_task_stream", {"action": "benchmark"})
+            await asyncio.gather(
+                *(
+                    communicator.receive_json_from(timeout=60)
+                    for communicator in communicators
+                )
+            )
+            fan_out_time = time.perf_counter() - started
+
+            for offset in range(0, len(communicators), batch_size):
+                await asyncio.gather(
+                    *(
+                        communicator.disconnect()
+                        for communicator in communicators[offset : offset + batch_size]
+                    )
+                )
+            return connect_time, held, stats, fan_out_time
+
+        connect_time, held, stats, fan_out_time = async_to_sync(soak)()
+
+        self.stdout.write(f"connections:        {connections}")
+        self.stdout.write(f"users:              {len(users)}")
+        self.stdout.write(f"connect time:       {connect_time:.3f}s")
+        self.stdout.write(f"RSS held:           {_format_size(held)}")
+        self.stdout.write(f"RSS per connection: {held / connections / 1024:.1f} KiB")
+        self.stdout.write(f"open (accounted):   {stats['open']}")
+        self.stdout.write(f"fan-out to all:     {fan_out_time * 1000:.1f}ms")
@@ -0,0 +1,28 @@
+"""Issue tokens asking for requests to be profiled"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from taskmaster.profiling import make_profiling_token
+
+
+class Command(BaseCommand):
+    """
+    Print a signed token that makes the server profile the requests carrying it.
+
+    Usage:
+        python manage.py profiling_token
+
+    Send the token in the `X-Profile` header of HTTP requests, or as the `profile` query
+    parameter of a websocket URL. It is signed with `SECRET_KEY`, so it works on every
+    server of the deployment, for `settings.PROFILING_TOKEN_MAX_AGE` seconds.
+    """
+
+    help = "Print a signed token that turns on profiling for the requests carrying it."
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_profiling_token())
+        self.stderr.write(
+            f"Valid for {settings.PROFILING_TOKEN_MAX_AGE} seconds. Profiles are "
+            f"written to {settings.PROFILING_DIR}."
+        )
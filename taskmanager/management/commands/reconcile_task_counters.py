@@ -0,0 +1,77 @@
+"""Recompute per-user task counters"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from taskmanager.models import ArchivedTask, Task, TaskCounter
+
+
+class Command(BaseCommand):
+    """
+    Recompute every user's task counters from the task and archive tables and repair drift.
+
+    Usage:
+        python manage.py reconcile_task_counters [--user <user_id>] [--dry-run]
+
+    Each user is reconciled in its own transaction with their counter row locked, so
+    concurrent task writes wait for (rather than race with) the repair.
+    """
+
+    help = "Recompute per-user task counters from the task table and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", dest="user_id", help="Only reconcile this user.")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report drift without fixing it."
+        )
+
+    def handle(self, *args, user_id=None, dry_run=False, **options):
+        users = get_user_model().objects.order_by("pk").values_list("pk", flat=True)
+        if user_id:
+            users = users.filter(pk=user_id)
+
+        checked = repaired = 0
+        for pk in users.iterator():
+            checked += 1
+            if self.reconcile_user(pk, dry_run):
+                repaired += 1
+
+        action = "drifted" if dry_run else "repaired"
+        self.stdout.write(f"{checked} users checked, {repaired} {action}.")
+
+    def reconcile_user(self, user_id, dry_run: bool) -> bool:
+        """
+        Bring one user's counters in line with their tasks.
+
+        Returns:
+            bool: Whether the counters had drifted.
+        """
+        with transaction.atomic():
+            counter, _ = TaskCounter.objects.select_for_update().get_or_create(
+                user_id=user_id
+            )
+            actual = {field: 0 for field in TaskCounter.COUNTER_FIELDS.values()}
+            rows = (
+                Task.objects.filter(user_id=user_id)
+                .values_list("status_task")
+                .annotate(total=Count("id"))
+                .order_by()
+            )
+            for status_task, total in rows:
+                actual[TaskCounter.STATUS_FIELDS[status_task]] = total
+            actual["archived_count"] = ArchivedTask.objects.filter(user_id=user_id).count()
+
+            drifted = {
+                field: value
+                for field, value in actual.items()
+                if getattr(counter, field) != value
+            }
+            if not drifted:
+                return False
+
+            self.stdout.write(f"User {user_id}: {drifted}")
+            if not dry_run:
+                TaskCounter.objects.filter(pk=counter.pk).update(**drifted)
+            return True
@@ -0,0 +1,105 @@
+"""Publish task events from the transactional outbox"""
+
+import logging
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from taskmanager import events
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Relay pending task events to the channel layer until stopped.
+
+    Usage:
+        python manage.py relay_task_events [--batch-size 100] [--interval 0.2] [--once]
+
+    Events are published in batches, oldest first. When the outbox is empty the relay
+    sleeps `--interval` seconds. Every `--stats-interval` seconds it logs the backlog and
+    prunes events delivered more than `settings.TASK_EVENT_RETENTION_HOURS` ago. SIGTERM
+    and SIGINT stop the relay after the current batch.
+
+    The channel layer must be shared with the websocket servers (see `REDIS_URL`);
+    without it the processes writing events publish them themselves, and the relay
+    refuses to start. Run a single relay, so the events of a group stay in order.
+    """
+
+    help = "Publish task events from the transactional outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--interval", type=float, default=0.2)
+        parser.add_argument("--stats-interval", type=float, default=60.0)
+        parser.add_argument(
+            "--once", action="store_true", help="Drain the outbox once and exit."
+        )
+
+    def handle(
+        self,
+        *args,
+        batch_size: int,
+        interval: float,
+        stats_interval: float,
+        once: bool,
+        **options,
+    ):
+        if settings.TASK_EVENTS_PUBLISH_ON_COMMIT:
+            raise CommandError(
+                "No shared channel layer (REDIS_URL): the processes writing task "
+                "events publish them, and relayed events would reach no websocket."
+            )
+
+        self.running = True
+        previous_handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        relayed = 0
+        next_stats = time.monotonic() + stats_interval
+
+        try:
+            while self.running:
+                close_old_connections()
+                stats = events.relay_events(batch_size=batch_size)
+                relayed += stats["relayed"]
+
+                if time.monotonic() >= next_stats:
+                    self.maintain()
+                    next_stats = time.monotonic() + stats_interval
+
+                if not stats["relayed"]:
+                    if once:
+                        break
+                    time.sleep(interval)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(f"{relayed} events relayed.")
+
+    def maintain(self) -> None:
+        """Log the outbox backlog and prune old delivered events."""
+        backlog = events.pending_events()
+        logger.info(
+            "Task event backlog: %d pending, oldest %.3fs old",
+            backlog["pending"],
+            backlog["oldest_age"],
+        )
+
+        pruned = events.prune_events(
+            timezone.now() - timedelta(hours=settings.TASK_EVENT_RETENTION_HOURS)
+        )
+        if pruned:
+            logger.info("Pruned %d delivered task events", pruned)
+
+    def stop(self, signum, frame) -> None:
+        self.running = False
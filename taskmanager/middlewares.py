@@ -1,32 +1,34 @@
 import uuid
 
 import jwt
-from channels.db import database_sync_to_async
 
 from accounts.services import User
 from taskmaster import env
+from taskmaster.db import pooled_sync_to_async
 
 
-@database_sync_to_async
+@pooled_sync_to_async
 def get_user(user_id: uuid.UUID):
     """
     Asynchronously retrieves a user object from the database by its ID.
 
-    This function is decorated with `database_sync_to_async` to allow it to be used
-    within synchronous code, such as Django Channels consumers, without blocking the event loop.
+    This function is decorated with `pooled_sync_to_async` so it can be awaited from
+    Django Channels without blocking the event loop, while sharing the bounded pool of
+    database connections used by async code.
 
     Args:
         user_id (uuid.UUID): The UUID of the user to retrieve.
 
     Returns:
-        User or None: The user object if found, or None if no user with the specified ID exists.
+        User or None: The user object if found, or None if no active user with the specified
+            ID exists. Deleted accounts are inactive until they are purged.
 
     Raises:
         None.
     """
     try:
         # Attempt to retrieve the user object from the database by its ID
-        return User.objects.get(id=user_id)
+        return User.objects.get(id=user_id, is_active=True)
     except User.DoesNotExist:
         # If no user with the specified ID is found, return None
         return None
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.4 on 2026-10-19 18:23
+
+from django.db import migrations, models
+import taskmaster.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0004_alter_task_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='id',
+            field=models.UUIDField(default=taskmaster.utils.generate_id, primary_key=True, serialize=False, unique=True),
+        ),
+    ]
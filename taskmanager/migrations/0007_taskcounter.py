@@ -0,0 +1,53 @@
+# Generated by Django 4.1.4 on 2026-10-19 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import taskmaster.utils
+
+
+def backfill_task_counters(apps, schema_editor):
+    """Create the counters of every user that already owns tasks."""
+    Task = apps.get_model("taskmanager", "Task")
+    TaskCounter = apps.get_model("taskmanager", "TaskCounter")
+    status_fields = {"TO DO": "todo_count", "IN PROGRESS": "in_progress_count", "DONE": "done_count"}
+
+    counters = {}
+    rows = (
+        Task.objects.filter(user__isnull=False)
+        .values_list("user_id", "status_task")
+        .annotate(total=models.Count("id"))
+        .order_by()
+    )
+    for user_id, status_task, total in rows:
+        counter = counters.setdefault(user_id, TaskCounter(user_id=user_id))
+        setattr(counter, status_fields[status_task], total)
+
+    TaskCounter.objects.bulk_create(counters.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('taskmanager', '0006_task_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('id', models.UUIDField(default=taskmaster.utils.generate_id, primary_key=True, serialize=False, unique=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('todo_count', models.IntegerField(default=0)),
+                ('in_progress_count', models.IntegerField(default=0)),
+                ('done_count', models.IntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='task_counter', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(backfill_task_counters, migrations.RunPython.noop),
+    ]
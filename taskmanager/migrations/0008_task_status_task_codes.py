@@ -0,0 +1,49 @@
+# Generated by Django 4.1.4 on 2026-10-19 19:02
+
+from django.db import migrations, models
+
+import taskmaster.utils
+
+STATUS_CODES = {"TO DO": 1, "IN PROGRESS": 2, "DONE": 3}
+
+
+def encode_statuses(apps, schema_editor):
+    Task = apps.get_model("taskmanager", "Task")
+    for status_task, code in STATUS_CODES.items():
+        Task.objects.filter(status_task=status_task).update(status_code=code)
+
+
+def decode_statuses(apps, schema_editor):
+    Task = apps.get_model("taskmanager", "Task")
+    for status_task, code in STATUS_CODES.items():
+        Task.objects.filter(status_code=code).update(status_task=status_task)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0007_taskcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunPython(encode_statuses, decode_statuses),
+        migrations.RemoveField(
+            model_name='task',
+            name='status_task',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='status_code',
+            new_name='status_task',
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='status_task',
+            field=taskmaster.utils.CodedChoiceField(blank=True, codes={'TO DO': 1, 'IN PROGRESS': 2, 'DONE': 3}, default='TO DO'),
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 4.1.4 on 2026-10-19 19:40
+
+from django.conf import settings
+from django.db import migrations
+
+TABLE = "taskmanager_task"
+STAGING_TABLE = "taskmanager_task_staging"
+# Postgres's default name for the primary key of the table created by 0001
+PRIMARY_KEY = "taskmanager_task_pkey"
+USER_INDEX = "taskmanager_task_user_id_id_idx"
+
+
+def is_partitioned(cursor) -> bool:
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass)",
+        [TABLE],
+    )
+    return cursor.fetchone()[0]
+
+
+def rebuild_task_table(schema_editor, user_table: str, partitions: int) -> None:
+    """
+    Recreate the task table (hash partitioned on user_id when `partitions` > 0) and
+    move every row into it.
+
+    A partitioned table's primary key must contain the partition key, so it becomes
+    (id, user_id) and user_id is made NOT NULL. Every task query is scoped by user_id,
+    which lets Postgres prune the scan to a single partition. Without partitions the
+    table is keyed on id again and user_id is nullable, as the model declares.
+
+    The copy runs in the migration's transaction, which holds an ACCESS EXCLUSIVE lock
+    on the task table until it commits: requests using tasks wait for the whole copy.
+    On a large table, run it in a maintenance window with the application stopped.
+    """
+    quote = schema_editor.quote_name
+    statements = [
+        f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(STAGING_TABLE)}",
+        # Frees the names of the primary key and index for the new table. Renaming the
+        # index of a constraint renames the constraint as well.
+        f"ALTER INDEX IF EXISTS {quote(PRIMARY_KEY)} RENAME TO "
+        f"{quote(f'{STAGING_TABLE}_pkey')}",
+        f"ALTER INDEX IF EXISTS {quote(USER_INDEX)} RENAME TO "
+        f"{quote(f'{STAGING_TABLE}_user_id_id_idx')}",
+        f"CREATE TABLE {quote(TABLE)} (LIKE {quote(STAGING_TABLE)} "
+        "INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)"
+        + (" PARTITION BY HASH (user_id)" if partitions else ""),
+    ]
+
+    if partitions:
+        statements += [
+            f"ALTER TABLE {quote(TABLE)} ALTER COLUMN user_id SET NOT NULL",
+            f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(PRIMARY_KEY)} "
+            "PRIMARY KEY (id, user_id)",
+        ]
+        statements += [
+            f"CREATE TABLE {quote(f'{TABLE}_p{remainder}')} PARTITION OF {quote(TABLE)} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            for remainder in range(partitions)
+        ]
+    else:
+        statements += [
+            f"ALTER TABLE {quote(TABLE)} ALTER COLUMN user_id DROP NOT NULL",
+            f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(PRIMARY_KEY)} "
+            "PRIMARY KEY (id)",
+        ]
+
+    statements += [
+        # Serves both the per-user filters and keyset pagination ordered by id
+        f"CREATE INDEX {quote(USER_INDEX)} ON {quote(TABLE)} (user_id, id)",
+        f"INSERT INTO {quote(TABLE)} SELECT * FROM {quote(STAGING_TABLE)}",
+        f"DROP TABLE {quote(STAGING_TABLE)}",
+        f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(f'{TABLE}_user_id_fk')} "
+        f"FOREIGN KEY (user_id) REFERENCES {quote(user_table)} (id) "
+        "DEFERRABLE INITIALLY DEFERRED",
+    ]
+
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def partition_task_table(apps, schema_editor):
+    partitions = settings.TASK_PARTITIONS
+    if schema_editor.connection.vendor != "postgresql" or not partitions:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            return
+        cursor.execute(f"SELECT count(*) FROM {TABLE} WHERE user_id IS NULL")
+        if cursor.fetchone()[0]:
+            raise RuntimeError(
+                "Tasks without a user cannot be partitioned by user. "
+                "Assign or delete them before migrating."
+            )
+
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    rebuild_task_table(schema_editor, user_table, partitions)
+
+
+def unpartition_task_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return
+
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    rebuild_task_table(schema_editor, user_table, partitions=0)
+
+
+class Migration(migrations.Migration):
+    """
+    Maintenance-window migration when TASK_PARTITIONS is set on Postgres: it copies the
+    whole task table while holding an exclusive lock on it (see `rebuild_task_table`).
+    """
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('taskmanager', '0008_task_status_task_codes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_task_table, unpartition_task_table),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.4 on 2026-10-19 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import taskmaster.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('taskmanager', '0009_partition_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskcounter',
+            name='archived_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('status_task', taskmaster.utils.CodedChoiceField(codes={'DONE': 3, 'IN PROGRESS': 2, 'TO DO': 1}, default='DONE')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('date_created', models.DateTimeField()),
+                ('last_updated', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_tasks', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0011_taskevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskevent',
+            name='origin',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-19 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0012_taskevent_origin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskevent',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
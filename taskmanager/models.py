@@ -1,10 +1,12 @@
 """Task manager models"""
 
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 
-from taskmaster.utils import BaseModel
+from taskmaster.utils import BaseModel, CodedChoiceField
 
 
 class Task(BaseModel):
@@ -16,6 +18,9 @@ class Task(BaseModel):
 
     Attributes:
         TASK_STATUS (tuple): A tuple of possible task status choices.
+        STATUS_CODES (dict): Maps each status to the small integer stored in the database,
+            its position in `TASK_STATUS` counting from 1.
+        STATUS_VALUES (frozenset): The valid statuses, for constant-time validation.
 
         user (User): Task Owner. This is field is a foreign reference to the User model.
         title (str): The title of the task. This field is required and has a maximum length of 100 characters.
@@ -25,6 +30,9 @@ class Task(BaseModel):
                 - "TO DO": The task is yet to be started.
                 - "IN PROGRESS": The task is currently being worked on.
                 - "DONE": The task has been completed.
+            Stored as a 2-byte integer code (see `STATUS_CODES`) rather than a string.
+        version (int): Incremented on every update. Exposed as the task's ETag and used for
+            optimistic concurrency control (compare-and-swap updates).
 
     Meta:
         Inherits from BaseModel which includes:
@@ -35,20 +43,199 @@ class Task(BaseModel):
     """
 
     TASK_STATUS = (("TO DO", "TO DO"), ("IN PROGRESS", "IN PROGRESS"), ("DONE", "DONE"))
+    # Codes follow the order of TASK_STATUS: add new statuses at the end, never reorder
+    STATUS_CODES = {status: code for code, (status, _) in enumerate(TASK_STATUS, 1)}
+    STATUS_VALUES = frozenset(STATUS_CODES)
 
     user = models.ForeignKey(
         get_user_model(), related_name="users", on_delete=models.CASCADE, null=True
     )
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True)
-    status_task = models.CharField(
-        max_length=20, choices=TASK_STATUS, blank=True, default="TO DO"
-    )
+    status_task = CodedChoiceField(codes=STATUS_CODES, blank=True, default="TO DO")
+    version = models.PositiveIntegerField(default=1)
 
     def save(self, *args, **kwargs):
-        if self.status_task not in dict(self.TASK_STATUS):
+        if self.status_task not in self.STATUS_VALUES:
             raise ValidationError(f"{self.status_task} is not a valid status.")
-        super().save(*args, **kwargs)
+
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        # New tasks are counted in the same transaction that inserts them
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            TaskCounter.adjust(self.user_id, {self.status_task: 1})
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            deleted = super().delete(*args, **kwargs)
+            TaskCounter.adjust(self.user_id, {self.status_task: -1})
+        return deleted
 
     def __str__(self) -> str:
         return self.title
+
+
+class TaskCounter(BaseModel):
+    """
+    Per-user number of tasks in each status.
+
+    The counters are kept up to date in the same transaction as every task create,
+    status change and delete, so a user's task summary is a single primary key lookup
+    instead of a COUNT over all of their tasks. `Task.save()` and `Task.delete()` count
+    creates and deletes; queryset `update()`, `delete()` and `bulk_create()` bypass them
+    and must call `adjust` themselves. The `reconcile_task_counters` management command
+    recomputes the counters from the task and archive tables to repair any drift.
+
+    Attributes:
+        STATUS_FIELDS (dict): Maps each task status to the field counting it.
+        ARCHIVED (str): Key passed to `adjust` for archived tasks.
+
+        user (User): The owner of the counted tasks.
+        todo_count (int): Number of "TO DO" tasks.
+        in_progress_count (int): Number of "IN PROGRESS" tasks.
+        done_count (int): Number of "DONE" tasks still in the task table.
+        archived_count (int): Number of tasks moved to the archive (all of them "DONE").
+    """
+
+    STATUS_FIELDS = {
+        "TO DO": "todo_count",
+        "IN PROGRESS": "in_progress_count",
+        "DONE": "done_count",
+    }
+    ARCHIVED = "archived"
+    COUNTER_FIELDS = {**STATUS_FIELDS, ARCHIVED: "archived_count"}
+
+    user = models.OneToOneField(
+        get_user_model(), related_name="task_counter", on_delete=models.CASCADE
+    )
+    todo_count = models.IntegerField(default=0)
+    in_progress_count = models.IntegerField(default=0)
+    done_count = models.IntegerField(default=0)
+    archived_count = models.IntegerField(default=0)
+
+    @classmethod
+    def adjust(cls, user_id, changes: dict) -> None:
+        """
+        Add the given deltas to a user's task counters.
+
+        Must run in the transaction that changes the tasks, so counters and tasks commit
+        (or roll back) together.
+
+        Args:
+            user_id (uuid.UUID): Task owner
+            changes (dict): Maps task statuses (or `ARCHIVED`) to the number to add
+                (negative to subtract).
+        """
+        updates = {
+            cls.COUNTER_FIELDS[key]: F(cls.COUNTER_FIELDS[key]) + delta
+            for key, delta in changes.items()
+            if delta
+        }
+        if user_id is None or not updates:
+            return
+
+        if not cls.objects.filter(user_id=user_id).update(**updates):
+            # First task of the user: create the counters, then apply the change
+            cls.objects.get_or_create(user_id=user_id)
+            cls.objects.filter(user_id=user_id).update(**updates)
+
+    def as_summary(self) -> dict:
+        """
+        Return the counters keyed by task status, plus the archived tasks and the total.
+
+        Archived tasks are counted as "DONE" as well.
+        """
+        summary = {
+            status: getattr(self, field) for status, field in self.STATUS_FIELDS.items()
+        }
+        summary["DONE"] += self.archived_count
+        summary[self.ARCHIVED] = self.archived_count
+        summary["total"] = self.todo_count + self.in_progress_count + summary["DONE"]
+        return summary
+
+    def __str__(self) -> str:
+        return f"Task counters for {self.user_id}"
+
+
+class ArchivedTask(models.Model):
+    """
+    A completed task moved out of the task table by the `archive_tasks` command.
+
+    Old "DONE" tasks are rarely read, so keeping them here keeps the task table and its
+    indexes small for the queries every request runs. Rows keep the id, timestamps and
+    version they had as a task. Updating an archived task through `TaskService` moves it
+    back to the task table first.
+
+    Attributes:
+        id (uuid.UUID): The id the task had in the task table.
+        user (User): Task Owner.
+        title (str): The title of the task.
+        description (str): A detailed description of the task.
+        status_task (str): The status of the task when it was archived ("DONE").
+        version (int): The version of the task when it was archived.
+        date_created (datetime): When the task was created.
+        last_updated (datetime): When the task was last updated before being archived.
+        archived_at (datetime): When the task was archived.
+    """
+
+    id = models.UUIDField(primary_key=True)
+    user = models.ForeignKey(
+        get_user_model(), related_name="archived_tasks", on_delete=models.CASCADE
+    )
+    title = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    status_task = CodedChoiceField(codes=Task.STATUS_CODES, default="DONE")
+    version = models.PositiveIntegerField(default=1)
+    # Copied from the task, so unlike `BaseModel` these are not set automatically
+    date_created = models.DateTimeField()
+    last_updated = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return self.title
+
+
+class TaskEvent(models.Model):
+    """
+    A task notification waiting in the transactional outbox.
+
+    `TaskService` writes an event in the same transaction as the task change it
+    describes, so an event exists if and only if the change was committed. The
+    `relay_task_events` command publishes pending events to the channel layer in id
+    order and marks them delivered; delivered events are pruned after a while.
+
+    Attributes:
+        id (int): Increasing sequence number, which is also the delivery order.
+        group_name (str): The channel layer group to publish the event to.
+        payload (dict): The message sent to websocket clients.
+        origin (str): Id of the client connection that made the change, which is not
+            sent its own event. Empty when unknown.
+        created_at (datetime): When the event was written.
+        delivered_at (datetime): When the relay published it; None while pending.
+        claimed_until (datetime): Until when a relay publishing the event keeps other
+            relays from taking it; None when no relay holds it.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    group_name = models.CharField(max_length=255)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    origin = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only pending events are scanned by the relay
+            models.Index(
+                fields=["id"],
+                condition=Q(delivered_at__isnull=True),
+                name="taskevent_pending_idx",
+            ),
+            models.Index(fields=["delivered_at"], name="taskevent_delivered_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Event {self.id} for {self.group_name}"
@@ -18,8 +18,30 @@ class TaskSerializer(serializers.ModelSerializer):
         status_task (str): The status of the task. Choices are "TO DO", "IN PROGRESS", and "DONE".
         date_created (datetime): The timestamp when the task was created.
         last_updated (datetime): The timestamp when the task was last updated.
+        version (int): The task version, incremented on every update.
+
+    Pass `fields` to only output some of the fields (a sparse fieldset), e.g.
+    `TaskSerializer(task, fields=["id", "title"])`.
     """
 
+    # Fields a sparse fieldset may select (`user` is write-only)
+    READ_FIELDS = [
+        "id",
+        "title",
+        "description",
+        "status_task",
+        "date_created",
+        "last_updated",
+        "version",
+    ]
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Task
         fields = [
@@ -30,8 +52,11 @@ class TaskSerializer(serializers.ModelSerializer):
             "status_task",
             "date_created",
             "last_updated",
+            "version",
         ]
-        read_only_fields = ["id", "date_created", "last_updated"]
+        read_only_fields = ["id", "date_created", "last_updated", "version"]
+        # The owner is set on create but never returned
+        extra_kwargs = {"user": {"write_only": True}}
 
     def validate_status_task(self, value):
         """
@@ -46,14 +71,8 @@ class TaskSerializer(serializers.ModelSerializer):
         Raises:
             serializers.ValidationError: If the value is not one of the allowed choices.
         """
-        allowed_statuses = [choice[0] for choice in Task.TASK_STATUS]
-        if value not in allowed_statuses:
+        if value not in Task.STATUS_VALUES:
             raise serializers.ValidationError(
-                f"Invalid status: {value}. Must be one of {allowed_statuses}."
+                f"Invalid status: {value}. Must be one of {list(Task.STATUS_CODES)}."
             )
         return value
-
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        del data["user"]
-        return data
@@ -1,14 +1,30 @@
 """Task Manager Services"""
 
+import hashlib
 import uuid
-from typing import Optional
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Tuple
 
-from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils.http import quote_etag
+from django.utils import timezone
+from rest_framework import exceptions
 
 from taskmanager import events
-from taskmanager.models import Task
+from taskmanager.models import ArchivedTask, Task, TaskCounter
 from taskmanager.serializers import TaskSerializer
-from taskmaster.utils import get_object_or_error, paginate_queryset, remove_none_values
+from taskmaster.exceptions import PreconditionFailed
+from taskmaster.utils import (
+    delete_object_or_error,
+    get_object_or_error,
+    paginate_keyset,
+    paginate_queryset,
+    parse_keyset_after,
+    remove_none_values,
+    update_object_or_error,
+)
 
 
 class TaskService:
@@ -22,13 +38,34 @@ class TaskService:
         create_task: Creates a new task with the provided data.
         get_task: Retrieves a task based on the task ID.
         list_tasks: Retrieves a paginated list of all tasks.
+        list_tasks_after: Retrieves a page of tasks after a cursor, without links.
         update_task: Updates task information based on the provided data.
         delete_task: Deletes a task based on the task ID.
+        get_task_summary: Retrieves the number of tasks in each status.
+        archive_tasks: Moves a batch of old completed tasks to the archive.
+
+    Archived tasks are still found by `get_task`, `update_task` (which restores them to the
+    task table) and `delete_task`, and are listed with `include_archived`.
     """
 
+    # Columns copied between the task and archive tables
+    ARCHIVE_FIELDS = [
+        "id",
+        "user_id",
+        "title",
+        "description",
+        "status_task",
+        "version",
+        "date_created",
+        "last_updated",
+    ]
+
     @staticmethod
     def create_task(
-        user_id: uuid.UUID, title: str, description: Optional[str] = ""
+        user_id: uuid.UUID,
+        title: str,
+        description: Optional[str] = "",
+        origin: Optional[str] = None,
     ) -> dict:
         """
         Creates a new task with the provided data.
@@ -37,6 +74,8 @@ class TaskService:
             user_id (uuid.UUID): Task owner
             title (str): The title of the task.
             description (str, optional): The description of the task.
+            origin (str, optional): Id of the client connection making the change, which
+                is not notified of it.
 
         Returns:
             dict: Serialized task data.
@@ -44,42 +83,135 @@ class TaskService:
         task_data = {"user": user_id, "title": title, "description": description}
         serializer = TaskSerializer(data=task_data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
 
-        # copy serialized data for streaming
-        data_stream = serializer.data
+        with transaction.atomic():
+            serializer.save()
 
-        data_stream["action"] = "task_create"
+            # copy serialized data for streaming
+            data_stream = serializer.data
 
-        # Stream task to WebSocket handler
-        # The `events.send_task` function is asynchronous and Python doesn't allow calling an async
-        # function directly in a synchronous context. To handle this, we use `async_to_sync` from `channels`.
-        # This utility function allows us to call asynchronous code from synchronous code.
-        async_to_sync(events.send_task)(
-            group_name=f"user_{user_id}_task_stream",
-            data=data_stream,
-        )
+            data_stream["action"] = "task_create"
+
+            # Stream task to WebSocket handler
+            # The event is written to the outbox in the task's transaction, and published
+            # to the websocket group by the `relay_task_events` process once committed.
+            events.enqueue_task_event(
+                group_name=f"user_{user_id}_task_stream",
+                data=data_stream,
+                origin=origin,
+            )
 
         return serializer.data
 
     @staticmethod
-    def get_task(user_id: uuid.UUID, task_id: str) -> dict:
+    def get_task(
+        user_id: uuid.UUID, task_id: str, fields: Optional[list] = None
+    ) -> dict:
         """
         Retrieves a task based on the task ID.
 
         Args:
             user_id (uuid.UUID): Task owner
             task_id (str): The ID of the task.
+            fields (list, optional): Only read and return these fields.
 
         Returns:
             dict: Serialized task data.
+
+        Raises:
+            NotFound: If the task does not exist, archived or not.
+        """
+        tasks = Task.objects.all()
+        archived = ArchivedTask.objects.all()
+        if fields is not None:
+            # Columns left out (such as a long description) are never read
+            tasks = tasks.only(*fields)
+            archived = archived.only(*fields)
+
+        try:
+            task = get_object_or_error(tasks, id=task_id, user_id=user_id)
+        except exceptions.NotFound:
+            task = archived.filter(id=task_id, user_id=user_id).first()
+            if task is None:
+                raise
+        return TaskSerializer(task, fields=fields).data
+
+    @staticmethod
+    def get_task_fingerprint(user_id: uuid.UUID, task_id: str) -> Tuple[str, object]:
+        """
+        Retrieves what a client needs to revalidate a cached task, without the task itself.
+
+        Only the `version` and `last_updated` columns are read.
+
+        Args:
+            user_id (uuid.UUID): Task owner
+            task_id (str): The ID of the task.
+
+        Returns:
+            tuple: The task's quoted ETag and its last modification time.
+
+        Raises:
+            NotFound: If the task does not exist.
+        """
+        fingerprint = (
+            Task.objects.filter(id=task_id, user_id=user_id)
+            .values_list("version", "last_updated")
+            .first()
+        ) or (
+            ArchivedTask.objects.filter(id=task_id, user_id=user_id)
+            .values_list("version", "last_updated")
+            .first()
+        )
+        if fingerprint is None:
+            raise exceptions.NotFound(detail="Task not found")
+
+        version, last_updated = fingerprint
+        return quote_etag(str(version)), last_updated
+
+    @staticmethod
+    def list_tasks_fingerprint(
+        user_id: uuid.UUID, variant: str = "", include_archived: bool = False
+    ) -> str:
+        """
+        Retrieves the ETag a client revalidates a cached task list with, from one
+        aggregate.
+
+        Every create and update moves the newest `last_updated`, and every delete
+        changes the count, so together they identify the state of a user's task list.
+        The newest `last_updated` alone does not (a delete leaves it unchanged), so
+        lists carry no `Last-Modified` date.
+
+        Args:
+            user_id (uuid.UUID): Task owner
+            variant (str, optional): Distinguishes representations of the same list,
+                such as the requested page.
+            include_archived (bool, optional): Fingerprint the archived tasks as well.
+
+        Returns:
+            str: The list's quoted ETag.
         """
-        task = get_object_or_error(Task, id=task_id, user_id=user_id)
-        return TaskSerializer(task).data
+        aggregates = {"count": Count("id"), "last_updated": Max("last_updated")}
+        fingerprint = Task.objects.filter(user_id=user_id).aggregate(**aggregates)
+
+        if include_archived:
+            archived = ArchivedTask.objects.filter(user_id=user_id).aggregate(**aggregates)
+            variant = f"{variant}:{archived['count']}:{archived['last_updated']}"
+
+        digest = hashlib.md5(
+            f"{user_id}:{fingerprint['count']}:{fingerprint['last_updated']}:{variant}".encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        return quote_etag(digest)
 
     @staticmethod
     def list_tasks(
-        request, user_id: uuid.UUID, page: int = 1, page_size: int = 10
+        request,
+        user_id: uuid.UUID,
+        page: int = 1,
+        page_size: int = 10,
+        after: Optional[str] = None,
+        include_archived: bool = False,
+        fields: Optional[list] = None,
     ) -> dict:
         """
         Retrieves a paginated list of all tasks.
@@ -89,20 +221,95 @@ class TaskService:
             user_id (uuid.UUID): Task owner
             page (int, optional): The page number for pagination.
             page_size (int, optional): The number of tasks per page.
+            after (str, optional): Switches to keyset pagination ordered by id, returning
+                the tasks after this task id. An empty string starts from the first task.
+            include_archived (bool, optional): Also list tasks moved to the archive.
+            fields (list, optional): Only read and return these fields of each task.
 
         Returns:
             dict: Serialized task data in a paginated format.
         """
         tasks = Task.objects.filter(user_id=user_id)
+        if fields is not None:
+            # Columns left out (such as a long description) are never read
+            tasks = tasks.only(*fields)
+
+        if include_archived:
+            tasks = TaskService._union_archived(user_id, after, fields)
+            # The cursor was applied to both sides of the union already
+            after = "" if after is not None else None
+
+        if after is not None:
+            return paginate_keyset(
+                request=request,
+                queryset=tasks,
+                serializer_class=TaskSerializer,
+                after=after,
+                page_size=page_size,
+                serializer_kwargs={"fields": fields},
+            ).data
+
+        # The total comes from the user's counters instead of a COUNT(*)
+        summary = TaskService.get_task_summary(user_id)
+        count = summary["total"]
+        if include_archived:
+            tasks = tasks.order_by("date_created", "id")
+        else:
+            count -= summary[TaskCounter.ARCHIVED]
+
         paginated_data = paginate_queryset(
             request=request,
             queryset=tasks,
             serializer_class=TaskSerializer,
             page=page,
             page_size=page_size,
+            count=count,
+            serializer_kwargs={"fields": fields},
         )
         return paginated_data.data
 
+    @staticmethod
+    def list_tasks_after(
+        user_id: uuid.UUID,
+        after: Optional[str] = None,
+        page_size: int = 10,
+        fields: Optional[list] = None,
+    ) -> dict:
+        """
+        Retrieves a page of tasks ordered by id, for clients without an HTTP request
+        (such as websocket commands) that can't follow `next` links.
+
+        Args:
+            user_id (uuid.UUID): Task owner
+            after (str, optional): Return the tasks after this task id.
+            page_size (int, optional): The number of tasks per page.
+            fields (list, optional): Only read and return these fields of each task.
+
+        Returns:
+            dict: The serialized `results`, and `after`, the cursor of the next page
+                (None on the last page).
+
+        Raises:
+            ValidationError: If `after` is not a valid id.
+        """
+        tasks = Task.objects.filter(user_id=user_id).order_by("id")
+        if fields is not None:
+            tasks = tasks.only("id", *fields)
+
+        after_id = parse_keyset_after(after)
+        if after_id is not None:
+            tasks = tasks.filter(id__gt=after_id)
+
+        # Fetch one extra row to know whether there is a next page
+        items = list(tasks[: page_size + 1])
+        has_next = len(items) > page_size
+        items = items[:page_size]
+
+        return {
+            "results": TaskSerializer(items, many=True, fields=fields).data,
+            "after": str(items[-1].id) if has_next else None,
+        }
+
     @staticmethod
     def update_task(
         user_id: uuid.UUID,
@@ -110,6 +317,8 @@ class TaskService:
         title: Optional[str] = None,
         description: Optional[str] = None,
         status_task: Optional[str] = None,
+        version: Optional[int] = None,
+        origin: Optional[str] = None,
     ) -> dict:
         """
         Updates task information based on the provided data.
@@ -120,11 +329,19 @@ class TaskService:
             title (str, optional): The updated title of the task.
             description (str, optional): The updated description of the task.
             status_task (str, optional): The updated status of the task.
+            version (int, optional): Only update the task if it is still at this version.
+            origin (str, optional): Id of the client connection making the change, which
+                is not notified of it.
 
         Returns:
             dict: Serialized updated task data.
+
+        Raises:
+            NotFound: If the task does not exist.
+            PreconditionFailed: If the task exists but is no longer at `version`.
+
+        An archived task is moved back to the task table before being updated.
         """
-        task = get_object_or_error(Task, id=task_id, user_id=user_id)
         task_update_data = remove_none_values(
             {
                 "title": title,
@@ -132,47 +349,298 @@ class TaskService:
                 "status_task": status_task,
             }
         )
-        serializer = TaskSerializer(task, data=task_update_data, partial=True)
+        # Validate the payload on its own; the task is never fetched before the update
+        serializer = TaskSerializer(data=task_update_data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
 
-        # copy serialized data for streaming
-        data_stream = serializer.data
+        filters = TaskService._task_filters(user_id, task_id, version)
+        new_status = serializer.validated_data.get("status_task")
+
+        values = {
+            **serializer.validated_data,
+            "last_updated": timezone.now(),
+            "version": F("version") + 1,
+        }
+
+        with transaction.atomic():
+            try:
+                old_status = TaskService._lock_status(filters, new_status)
+                # A single `UPDATE ... WHERE id AND user_id [AND version]` writes only the
+                # provided columns, doubles as the ownership check and compare-and-swap,
+                # and returns the row
+                task = update_object_or_error(Task, values, **filters)
+            except exceptions.NotFound:
+                TaskService._raise_on_version_conflict(user_id, task_id, version)
+                # Restored and updated in one transaction: the restored row stays locked,
+                # so `archive_tasks` can't archive it again before the update
+                if not TaskService._restore_archived_task(user_id, task_id, version):
+                    raise
+                old_status = TaskService._lock_status(filters, new_status)
+                task = update_object_or_error(Task, values, **filters)
+
+            if new_status is not None and old_status != new_status:
+                TaskCounter.adjust(user_id, {old_status: -1, new_status: 1})
+
+            task_data = TaskSerializer(task).data
+
+            # copy serialized data for streaming
+            data_stream = dict(task_data)
+
+            data_stream["action"] = "task_update"
+            if new_status is not None and old_status != new_status:
+                # Lets subscribers filtering on the old status drop the task
+                data_stream["previous_status"] = old_status
+
+            # Stream task to WebSocket handler through the transactional outbox
+            events.enqueue_task_event(
+                group_name=f"user_{user_id}_task_stream",
+                data=data_stream,
+                origin=origin,
+            )
+
+        return task_data
 
-        data_stream["action"] = "task_update"
+    @staticmethod
+    def delete_task(
+        user_id: uuid.UUID,
+        task_id: str,
+        version: Optional[int] = None,
+        origin: Optional[str] = None,
+    ) -> None:
+        """
+        Deletes a task based on the task ID.
 
-        # Stream task to WebSocket handler
-        # The `events.send_task` function is asynchronous and Python doesn't allow calling an async
-        # function directly in a synchronous context. To handle this, we use `async_to_sync` from `channels`.
-        # This utility function allows us to call asynchronous code from synchronous code.
-        async_to_sync(events.send_task)(
-            group_name=f"user_{user_id}_task_stream",
-            data=data_stream,
-        )
+        Args:
+            user_id (uuid.UUID): Task owner
+            task_id (str): The ID of the task to be deleted.
+            version (int, optional): Only delete the task if it is still at this version.
+            origin (str, optional): Id of the client connection making the change, which
+                is not notified of it.
 
-        return serializer.data
+        Raises:
+            NotFound: If the task does not exist.
+            PreconditionFailed: If the task exists but is no longer at `version`.
+        """
+        with transaction.atomic():
+            # A single `DELETE ... WHERE id AND user_id [AND version]`; no matching row means a 404
+            try:
+                task = delete_object_or_error(
+                    Task, **TaskService._task_filters(user_id, task_id, version)
+                )
+                TaskCounter.adjust(user_id, {task.status_task: -1})
+            except exceptions.NotFound:
+                TaskService._raise_on_version_conflict(user_id, task_id, version)
+                task = TaskService._delete_archived_task(user_id, task_id, version)
+                if task is None:
+                    raise
+
+            data_stream = {
+                "id": str(task_id),
+                "version": task.version,
+                "status_task": task.status_task,
+                "action": "task_delete",
+            }
+
+            # Stream task to WebSocket handler through the transactional outbox
+            events.enqueue_task_event(
+                group_name=f"user_{user_id}_task_stream",
+                data=data_stream,
+                origin=origin,
+            )
+
+        return {"message": "Task deleted successfully"}
 
     @staticmethod
-    def delete_task(user_id: uuid.UUID, task_id: str) -> None:
+    def get_task_summary(user_id: uuid.UUID) -> dict:
         """
-        Deletes a task based on the task ID.
+        Retrieves the number of tasks in each status from the user's counters.
 
         Args:
             user_id (uuid.UUID): Task owner
-            task_id (str): The ID of the task to be deleted.
+
+        Returns:
+            dict: The number of tasks per status, plus the total.
+        """
+        counter = TaskCounter.objects.filter(user_id=user_id).first()
+        return (counter or TaskCounter(user_id=user_id)).as_summary()
+
+    @staticmethod
+    def archive_tasks(older_than: datetime, batch_size: int = 1000) -> int:
         """
-        task = get_object_or_error(Task, id=task_id, user_id=user_id)
-        task.delete()
+        Moves one batch of DONE tasks last updated before `older_than` to the archive.
+
+        The batch is copied, deleted from the task table and counted as archived in one
+        transaction. Rows are locked with SKIP LOCKED (on Postgres), so tasks being
+        updated are left for a later batch and concurrent archivers don't collide.
+
+        Args:
+            older_than (datetime): Only archive tasks last updated before this time.
+            batch_size (int, optional): Maximum number of tasks moved.
 
-        data_stream = {"id": str(task_id), "action": "task_delete"}
+        Returns:
+            int: The number of tasks archived; 0 once nothing is left to archive.
+        """
+        with transaction.atomic():
+            rows = list(
+                Task.objects.select_for_update(skip_locked=True)
+                .filter(status_task="DONE", last_updated__lt=older_than)
+                .values(*TaskService.ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                return 0
+
+            ArchivedTask.objects.bulk_create(ArchivedTask(**row) for row in rows)
+            Task.objects.filter(id__in=[row["id"] for row in rows]).delete()
+
+            for user_id, archived in Counter(row["user_id"] for row in rows).items():
+                TaskCounter.adjust(
+                    user_id, {"DONE": -archived, TaskCounter.ARCHIVED: archived}
+                )
+
+        return len(rows)
+
+    @staticmethod
+    def _union_archived(
+        user_id: uuid.UUID, after: Optional[str] = None, fields: Optional[list] = None
+    ):
+        """
+        A user's tasks and archived tasks as one queryset of dicts.
+
+        Combined querysets can't be filtered, so the keyset cursor is applied to each side.
+        With `fields`, only those columns are selected, plus the ones used for ordering.
+        """
+        tasks = Task.objects.filter(user_id=user_id)
+        archived = ArchivedTask.objects.filter(user_id=user_id)
+
+        after_id = parse_keyset_after(after)
+        if after_id is not None:
+            tasks = tasks.filter(id__gt=after_id)
+            archived = archived.filter(id__gt=after_id)
+
+        columns = TaskService.ARCHIVE_FIELDS
+        if fields is not None:
+            columns = list(dict.fromkeys(["id", "date_created", *fields]))
+        return tasks.values(*columns).union(archived.values(*columns), all=True)
+
+    @staticmethod
+    def _lock_status(filters: dict, new_status: Optional[str]) -> Optional[str]:
+        """
+        Locks a task whose status is changing and reads the status it replaces, which
+        the task counters need. Other updates skip the read.
 
-        # Stream task to WebSocket handler
-        # The `events.send_task` function is asynchronous and Python doesn't allow calling an async
-        # function directly in a synchronous context. To handle this, we use `async_to_sync` from `channels`.
-        # This utility function allows us to call asynchronous code from synchronous code.
-        async_to_sync(events.send_task)(
-            group_name=f"user_{user_id}_task_stream",
-            data=data_stream,
+        Returns:
+            str: The current status, or None without a new status or a matching task.
+        """
+        if new_status is None:
+            return None
+        return (
+            Task.objects.select_for_update()
+            .filter(**filters)
+            .values_list("status_task", flat=True)
+            .first()
         )
 
-        return {"message": "Task deleted successfully"}
+    @staticmethod
+    def _restore_archived_task(
+        user_id: uuid.UUID, task_id: str, version: Optional[int] = None
+    ) -> bool:
+        """
+        Moves an archived task back to the task table, keeping its id and timestamps.
+
+        Returns:
+            bool: Whether an archived task was restored.
+
+        Raises:
+            PreconditionFailed: If the archived task is no longer at `version`.
+        """
+        with transaction.atomic():
+            archived = (
+                ArchivedTask.objects.select_for_update()
+                .filter(id=task_id, user_id=user_id)
+                .first()
+            )
+            if archived is None:
+                return False
+            TaskService._check_archived_version(archived, version)
+
+            task = Task(
+                **{field: getattr(archived, field) for field in TaskService.ARCHIVE_FIELDS}
+            )
+            # Counts the task as DONE again
+            task.save()
+            # `auto_now_add`/`auto_now` overwrote the original timestamps on insert
+            Task.objects.filter(pk=task.pk).update(
+                date_created=archived.date_created, last_updated=archived.last_updated
+            )
+            archived.delete()
+            TaskCounter.adjust(user_id, {TaskCounter.ARCHIVED: -1})
+
+        return True
+
+    @staticmethod
+    def _delete_archived_task(
+        user_id: uuid.UUID, task_id: str, version: Optional[int] = None
+    ) -> Optional[ArchivedTask]:
+        """
+        Deletes an archived task.
+
+        Returns:
+            ArchivedTask: The deleted task, or None if there was no such archived task.
+
+        Raises:
+            PreconditionFailed: If the archived task is no longer at `version`.
+        """
+        with transaction.atomic():
+            archived = (
+                ArchivedTask.objects.select_for_update()
+                .filter(id=task_id, user_id=user_id)
+                .first()
+            )
+            if archived is None:
+                return None
+            TaskService._check_archived_version(archived, version)
+
+            archived.delete()
+            TaskCounter.adjust(user_id, {TaskCounter.ARCHIVED: -1})
+
+        return archived
+
+    @staticmethod
+    def _check_archived_version(archived: ArchivedTask, version: Optional[int]) -> None:
+        """
+        Raises:
+            PreconditionFailed: If the archived task is not at `version`.
+        """
+        if version is not None and archived.version != version:
+            raise PreconditionFailed(
+                detail=f"Task has been modified since version {version}."
+            )
+
+    @staticmethod
+    def _task_filters(
+        user_id: uuid.UUID, task_id: str, version: Optional[int] = None
+    ) -> dict:
+        """Filter criteria selecting a user's task, optionally at an expected version."""
+        filters = {"id": task_id, "user_id": user_id}
+        if version is not None:
+            filters["version"] = version
+        return filters
+
+    @staticmethod
+    def _raise_on_version_conflict(
+        user_id: uuid.UUID, task_id: str, version: Optional[int] = None
+    ) -> None:
+        """
+        Tell a version mismatch apart from a missing task after a conditional write
+        matched no row. Only runs on that failure path.
+
+        Raises:
+            PreconditionFailed: If the task exists at another version.
+        """
+        if (
+            version is not None
+            and Task.objects.filter(id=task_id, user_id=user_id).exists()
+        ):
+            raise PreconditionFailed(
+                detail=f"Task has been modified since version {version}."
+            )
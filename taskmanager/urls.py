@@ -3,11 +3,17 @@
 from django.urls import path
 
 from taskmanager.consumers import AsyncTaskNotificationConsumer
-from taskmanager.views import CreateTaskAPI, ListTasksAPI, RetrieveUpdateDeleteTaskAPI
+from taskmanager.views import (
+    CreateTaskAPI,
+    ListTasksAPI,
+    RetrieveUpdateDeleteTaskAPI,
+    TaskSummaryAPI,
+)
 
 urlpatterns = [
     path("tasks/", ListTasksAPI.as_view(), name="list_tasks"),
     path("tasks/create/", CreateTaskAPI.as_view(), name="create_task"),
+    path("tasks/summary/", TaskSummaryAPI.as_view(), name="task_summary"),
     path(
         "tasks/<uuid:task_id>/",
         RetrieveUpdateDeleteTaskAPI.as_view(),
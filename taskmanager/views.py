@@ -2,10 +2,21 @@
 
 import uuid
 
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
 from rest_framework import generics, status
 from rest_framework.response import Response
 
+from taskmanager.serializers import TaskSerializer
 from taskmanager.services import TaskService
+from taskmaster.utils import (
+    get_conditional_headers,
+    get_connection_id,
+    get_if_match_version,
+    get_not_modified_response,
+    is_conditional_request,
+    parse_fields,
+)
 
 
 task_service = TaskService()
@@ -16,6 +27,9 @@ class CreateTaskAPI(generics.GenericAPIView):
     Endpoint for creating a new task.
 
     URL: /tasks/
+
+    Mutations accept an `X-Connection-Id` header naming the client's websocket
+    connection, which then doesn't receive the notification of its own change.
     """
 
     def post(self, request):
@@ -30,6 +44,7 @@ class CreateTaskAPI(generics.GenericAPIView):
                 request.user.id,
                 title=request.data.get("title"),
                 description=request.data.get("description"),
+                origin=get_connection_id(request),
             ),
             status=status.HTTP_201_CREATED,
         )
@@ -40,21 +55,53 @@ class RetrieveUpdateDeleteTaskAPI(generics.GenericAPIView):
     Endpoint for retrieving, updating, and deleting a task.
 
     URL: /tasks/<uuid:task_id>/
+
+    Responses carry the task version as an `ETag`. Sending it back in `If-Match` makes
+    PUT and DELETE conditional, so concurrent edits from another device are rejected
+    instead of being silently overwritten. Sending it in `If-None-Match` on GET (or the
+    `Last-Modified` date in `If-Modified-Since`) returns 304 when nothing changed.
     """
 
     def get(self, request, task_id: uuid.UUID):
         """
         Accepts GET requests to retrieve task data by task ID.
 
+        Query parameters:
+            - fields: Comma-separated fields to return, e.g. "id,title,status_task".
+
         Returns:
             - HTTP 200 OK: If the task is found.
+            - HTTP 304 Not Modified: If the client's cached copy is still current.
+            - HTTP 400 Bad Request: If `fields` names an unknown field.
             - HTTP 404 Not Found: If the task does not exist.
         """
-        return Response(
-            data=task_service.get_task(request.user.id, task_id),
-            status=status.HTTP_200_OK,
+        fields = parse_fields(
+            request.query_params.get("fields"), TaskSerializer.READ_FIELDS
         )
 
+        if is_conditional_request(request):
+            # Revalidate from the version/timestamp alone, without loading the task
+            etag, last_modified = task_service.get_task_fingerprint(
+                request.user.id, task_id
+            )
+            not_modified = get_not_modified_response(request, etag, last_modified)
+            if not_modified:
+                return not_modified
+
+        task = task_service.get_task(
+            request.user.id,
+            task_id,
+            # The conditional headers are built from the version and timestamp
+            fields=fields and [*fields, "version", "last_updated"],
+        )
+        headers = get_conditional_headers(
+            quote_etag(str(task["version"])), parse_datetime(task["last_updated"])
+        )
+        if fields:
+            task = {name: task[name] for name in fields}
+
+        return Response(data=task, status=status.HTTP_200_OK, headers=headers)
+
     def put(self, request, task_id: uuid.UUID):
         """
         Accepts PUT requests with updated task data including title, description, and status_task.
@@ -62,16 +109,21 @@ class RetrieveUpdateDeleteTaskAPI(generics.GenericAPIView):
         Returns:
             - HTTP 200 OK: If the task update is successful.
             - HTTP 404 Not Found: If the task does not exist.
+            - HTTP 412 Precondition Failed: If `If-Match` does not match the current version.
         """
+        task = task_service.update_task(
+            request.user.id,
+            task_id,
+            title=request.data.get("title"),
+            description=request.data.get("description"),
+            status_task=request.data.get("status_task"),
+            version=get_if_match_version(request),
+            origin=get_connection_id(request),
+        )
         return Response(
-            data=task_service.update_task(
-                request.user.id,
-                task_id,
-                title=request.data.get("title"),
-                description=request.data.get("description"),
-                status_task=request.data.get("status_task"),
-            ),
+            data=task,
             status=status.HTTP_200_OK,
+            headers={"ETag": quote_etag(str(task["version"]))},
         )
 
     def delete(self, request, task_id: uuid.UUID):
@@ -81,9 +133,15 @@ class RetrieveUpdateDeleteTaskAPI(generics.GenericAPIView):
         Returns:
             - HTTP 200: If the task deletion is successful.
             - HTTP 404 Not Found: If the task does not exist.
+            - HTTP 412 Precondition Failed: If `If-Match` does not match the current version.
         """
         return Response(
-            data=task_service.delete_task(request.user.id, task_id),
+            data=task_service.delete_task(
+                request.user.id,
+                task_id,
+                version=get_if_match_version(request),
+                origin=get_connection_id(request),
+            ),
             status=status.HTTP_200_OK,
         )
 
@@ -93,16 +151,72 @@ class ListTasksAPI(generics.GenericAPIView):
     Endpoint for listing all tasks.
 
     URL: /tasks/
+
+    Responses carry an `ETag` fingerprint of the user's task list, so polling clients
+    can revalidate with `If-None-Match` and get a 304 without any task being loaded or
+    serialized. There is no `Last-Modified` date: deleting a task doesn't move it.
     """
 
     def get(self, request):
         """
         Accepts GET requests to retrieve a list of tasks.
 
+        Query parameters:
+            - page: The page number to retrieve.
+            - after: Use keyset pagination and return the tasks after this task id.
+            - include_archived: "true" to also list tasks moved to the archive.
+            - fields: Comma-separated fields to return, e.g. "id,title,status_task".
+
         Returns:
             - HTTP 200 OK: With a paginated list of tasks.
+            - HTTP 304 Not Modified: If the client's cached list is still current.
+            - HTTP 400 Bad Request: If `fields` names an unknown field.
+        """
+        fields = parse_fields(
+            request.query_params.get("fields"), TaskSerializer.READ_FIELDS
+        )
+        include_archived = request.query_params.get("include_archived", "").lower() in (
+            "1",
+            "true",
+        )
+        etag = task_service.list_tasks_fingerprint(
+            request.user.id,
+            variant=request.get_full_path(),
+            include_archived=include_archived,
+        )
+        not_modified = get_not_modified_response(request, etag)
+        if not_modified:
+            return not_modified
+
+        return Response(
+            data=task_service.list_tasks(
+                request,
+                request.user.id,
+                page=request.query_params.get("page", 1),
+                after=request.query_params.get("after"),
+                include_archived=include_archived,
+                fields=fields,
+            ),
+            status=status.HTTP_200_OK,
+            headers=get_conditional_headers(etag),
+        )
+
+
+class TaskSummaryAPI(generics.GenericAPIView):
+    """
+    Endpoint for the number of tasks in each status.
+
+    URL: /tasks/summary/
+    """
+
+    def get(self, request):
+        """
+        Accepts GET requests to retrieve the task counts of the user.
+
+        Returns:
+            - HTTP 200 OK: With the number of tasks per status and the total.
         """
         return Response(
-            data=task_service.list_tasks(request, request.user.id),
+            data=task_service.get_task_summary(request.user.id),
             status=status.HTTP_200_OK,
         )
@@ -1,5 +1,5 @@
 """
-ASGI config for abinci project.
+ASGI config for taskmaster project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
@@ -10,24 +10,27 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 import os
 
 import django
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.security.websocket import AllowedHostsOriginValidator
-from django.core.asgi import get_asgi_application
-from taskmaster.wsgi import *
 
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "taskmaster.settings")
 
-asgi_app = get_asgi_application()
+# Set up Django, which must happen before importing code that uses the models
+django.setup(set_prefix=False)
 
-import taskmanager.urls
-from taskmanager.middlewares import JWTAuthMiddleware
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from taskmanager.middlewares import JWTAuthMiddleware  # noqa: E402
+from taskmanager.urls import ws_urlpatterns  # noqa: E402
+from taskmaster.handlers import PooledASGIHandler  # noqa: E402
+
+# Runs sync views on a fixed set of threads, so their connections outlive a request
+http_application = PooledASGIHandler()
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "taskmanager.settings")
-django.setup()
 application = ProtocolTypeRouter(
     {
-        "http": asgi_app,
+        "http": http_application,
         "websocket": AllowedHostsOriginValidator(
-            JWTAuthMiddleware(URLRouter(taskmanager.urls.ws_urlpatterns))
+            JWTAuthMiddleware(URLRouter(ws_urlpatterns))
         ),
     }
 )
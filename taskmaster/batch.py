@@ -0,0 +1,237 @@
+"""In-process dispatch of batched API calls"""
+
+import asyncio
+import io
+import json
+import logging
+from typing import Optional
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from taskmaster.db import pooled_sync_to_async
+from taskmaster.routers import current_routing_state, routing_context
+
+logger = logging.getLogger(__name__)
+
+BATCH_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE"}
+# Only the API's own views can be batched
+API_PREFIX = "/api/v1/"
+# Headers of the batch request that must not leak into its sub-requests
+REQUEST_ONLY_HEADERS = {
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_IF_MATCH",
+    "HTTP_IF_NONE_MATCH",
+    "HTTP_IF_MODIFIED_SINCE",
+    "HTTP_IF_UNMODIFIED_SINCE",
+}
+
+
+def _validate_batch(data) -> list:
+    """
+    Returns:
+        list: The sub-requests, each with its method upper-cased.
+
+    Raises:
+        ValidationError: If the batch is malformed or larger than `BATCH_MAX_REQUESTS`.
+    """
+    items = data.get("requests") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise exceptions.ValidationError(
+            detail={"requests": "A non-empty list of requests is required."}
+        )
+    if len(items) > settings.BATCH_MAX_REQUESTS:
+        raise exceptions.ValidationError(
+            detail={
+                "requests": f"At most {settings.BATCH_MAX_REQUESTS} requests per batch."
+            }
+        )
+
+    validated = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+            raise exceptions.ValidationError(
+                detail={"requests": f"Request {index} must be an object with a path."}
+            )
+        method = str(item.get("method") or "GET").upper()
+        if method not in BATCH_METHODS:
+            raise exceptions.ValidationError(
+                detail={
+                    "requests": f"Request {index} has an unsupported method {method}."
+                }
+            )
+        if not isinstance(item.get("headers") or {}, dict):
+            raise exceptions.ValidationError(
+                detail={"requests": f"Request {index} headers must be an object."}
+            )
+        validated.append({**item, "method": method})
+    return validated
+
+
+def _build_subrequest(request, item: dict) -> HttpRequest:
+    """
+    Build the `HttpRequest` of a sub-request from the batch request.
+
+    The sub-request inherits the batch request's metadata (host, cookies, ...) and its
+    authenticated user: DRF skips authentication for requests carrying
+    `_force_auth_user`, so the token is only verified once per batch.
+    """
+    url = urlsplit(item["path"])
+    body = b"" if item.get("body") is None else json.dumps(item["body"]).encode()
+
+    subrequest = HttpRequest()
+    subrequest.method = item["method"]
+    subrequest.path = subrequest.path_info = "/" + url.path.lstrip("/")
+    subrequest.META = {
+        key: value
+        for key, value in request._request.META.items()
+        if key not in REQUEST_ONLY_HEADERS
+    }
+    subrequest.META.update(
+        {
+            "REQUEST_METHOD": item["method"],
+            "PATH_INFO": subrequest.path_info,
+            "QUERY_STRING": url.query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+        }
+    )
+    for name, value in (item.get("headers") or {}).items():
+        key = "HTTP_" + name.upper().replace("-", "_")
+        if key != "HTTP_AUTHORIZATION":
+            subrequest.META[key] = str(value)
+
+    subrequest.GET = QueryDict(url.query)
+    subrequest.COOKIES = request._request.COOKIES
+    subrequest._stream = io.BytesIO(body)
+    subrequest._read_started = False
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    return subrequest
+
+
+def _response_entry(response) -> dict:
+    """Describe a sub-response as an item of the batch response."""
+    headers = dict(response.items())
+
+    if isinstance(response, Response):
+        body = response.data
+    else:
+        content = (
+            b"".join(response.streaming_content)
+            if response.streaming
+            else response.content
+        )
+        if not content:
+            body = None
+        elif "json" in headers.get("Content-Type", ""):
+            body = json.loads(content)
+        else:
+            body = content.decode(response.charset)
+
+    return {"status": response.status_code, "headers": headers, "body": body}
+
+
+def dispatch_subrequest(request, item: dict, state: Optional[dict] = None) -> dict:
+    """
+    Run a sub-request through its view, skipping the middleware stack.
+
+    Only DRF views under `API_PREFIX` can be targeted: they authenticate, check
+    permissions and handle CSRF themselves, so they don't depend on the middleware.
+
+    Args:
+        request (Request): The authenticated batch request.
+        item (dict): The validated sub-request.
+        state (dict): The batch request's replica routing state, so reads of the
+            sub-request follow the writes of the batch.
+
+    Returns:
+        dict: The sub-response's `status`, `headers` and `body`.
+    """
+    subrequest = _build_subrequest(request, item)
+
+    try:
+        match = resolve(subrequest.path_info)
+    except Resolver404:
+        match = None
+    if match is None or match.url_name == "batch":
+        return {
+            "status": status.HTTP_404_NOT_FOUND,
+            "headers": {},
+            "body": {"detail": "Not found."},
+        }
+    view_class = getattr(match.func, "cls", None)
+    if not (
+        subrequest.path_info.startswith(API_PREFIX)
+        and isinstance(view_class, type)
+        and issubclass(view_class, APIView)
+    ):
+        return {
+            "status": status.HTTP_400_BAD_REQUEST,
+            "headers": {},
+            "body": {"detail": f"Only {API_PREFIX} endpoints can be batched."},
+        }
+
+    subrequest.resolver_match = match
+    try:
+        with routing_context(state=state):
+            response = match.func(subrequest, *match.args, **match.kwargs)
+    except Exception:
+        # Other sub-requests still get their responses
+        logger.exception("Batched %s %s failed", item["method"], item["path"])
+        return {
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "headers": {},
+            "body": {"detail": "A server error occurred."},
+        }
+    return _response_entry(response)
+
+
+def dispatch_batch(request, data) -> list:
+    """
+    Run the sub-requests of a batch and collect their responses, in order.
+
+    Sub-requests run one after another on the batch request's thread, so they share its
+    authenticated user, database connection and replica routing, and a later call sees
+    the writes of an earlier one. With `"parallel": true` a batch made only of GET
+    requests runs its calls concurrently on the async database pool
+    (`DB_ASYNC_POOL_SIZE` threads, each with its own connection) instead.
+
+    Args:
+        request (Request): The authenticated batch request.
+        data (dict): `requests`, a list of `{"method", "path", "body", "headers"}`
+            sub-requests, and optionally `parallel`.
+
+    Returns:
+        list: A `{"status", "headers", "body"}` response for every sub-request.
+
+    Raises:
+        ValidationError: If the batch is malformed or too large.
+    """
+    items = _validate_batch(data)
+
+    parallel = (
+        data.get("parallel") is True
+        and settings.DB_ASYNC_POOL_SIZE
+        and all(item["method"] == "GET" for item in items)
+    )
+    # Without the routing middleware, the batch still reads its own writes
+    with routing_context(state=current_routing_state()) as state:
+        if not parallel:
+            return [dispatch_subrequest(request, item, state) for item in items]
+
+        dispatch = pooled_sync_to_async(dispatch_subrequest)
+
+        async def dispatch_all():
+            return await asyncio.gather(
+                *(dispatch(request, item, state) for item in items)
+            )
+
+        return async_to_sync(dispatch_all)()
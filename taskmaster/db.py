@@ -0,0 +1,162 @@
+"""Database connection helpers"""
+
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from taskmaster.profiling import current_profile
+
+
+class PoolStats:
+    """
+    Thread-safe counters describing the shared async database pool.
+
+    Attributes:
+        checkouts (int): Number of calls that ran on a pooled thread.
+        total_wait (float): Seconds spent by all calls waiting for a free thread.
+        max_wait (float): Longest single wait for a free thread, in seconds.
+        in_use (int): Calls currently running on a pooled thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset every counter to zero."""
+        with self._lock:
+            self.checkouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.in_use = 0
+
+    def checkout(self, wait: float) -> None:
+        """Record a call that waited `wait` seconds before a thread picked it up."""
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def release(self) -> None:
+        """Record that a pooled call has finished."""
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: A copy of the counters, including the average wait per checkout.
+        """
+        with self._lock:
+            return {
+                "size": settings.DB_ASYNC_POOL_SIZE,
+                "checkouts": self.checkouts,
+                "in_use": self.in_use,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "avg_wait": self.total_wait / self.checkouts if self.checkouts else 0.0,
+            }
+
+
+pool_stats = PoolStats()
+
+_executor: Optional[ThreadPoolExecutor] = None
+# Number of threads `_executor` was created with
+_executor_size = 0
+_executor_lock = threading.Lock()
+
+
+def get_pool_executor() -> Optional[ThreadPoolExecutor]:
+    """
+    Return the executor shared by all pooled async database calls.
+
+    The executor is created lazily with `settings.DB_ASYNC_POOL_SIZE` threads and is
+    rebuilt if that setting changes. Returns None when the pool is disabled (size 0).
+    """
+    global _executor, _executor_size
+
+    size = settings.DB_ASYNC_POOL_SIZE
+    if not size:
+        return None
+
+    with _executor_lock:
+        if _executor is None or _executor_size != size:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(
+                max_workers=size, thread_name_prefix="db-pool"
+            )
+            _executor_size = size
+        return _executor
+
+
+def reset_after_fork() -> None:
+    """
+    Forget the pool executor inherited from the parent of a forked process.
+
+    Threads don't survive a fork, so calls queued on the parent's executor would never
+    run. The next pooled call creates a new executor instead.
+    """
+    global _executor, _executor_size, _executor_lock
+
+    _executor = None
+    _executor_size = 0
+    _executor_lock = threading.Lock()
+
+
+def pooled_sync_to_async(func: Callable):
+    """
+    Decorator to run a synchronous ORM function from async code on the shared pool.
+
+    `channels.db.database_sync_to_async` can run every call on a fresh thread, and each
+    thread opens its own database connection. Here calls are queued on a fixed set of
+    `settings.DB_ASYNC_POOL_SIZE` threads instead, so at most that many connections are
+    used. These threads outlive the calls, so their connections are reused for up to
+    `CONN_MAX_AGE` seconds and closed by `close_old_connections` once they expire or
+    become unusable. This covers websocket and other async code; the sync views of HTTP
+    requests run on the threads of `taskmaster.handlers.PooledASGIHandler` instead.
+
+    The time each call waits for a free thread is recorded in `pool_stats`, and calls
+    made for a profiled request are sampled by its profile. With a pool size of 0 this
+    falls back to `database_sync_to_async`.
+
+    Examples:
+        >>> @pooled_sync_to_async
+        ... def get_user(user_id):
+        ...     return User.objects.get(id=user_id)
+    """
+
+    def run_pooled(queued_at: float, *args, **kwargs):
+        pool_stats.checkout(time.monotonic() - queued_at)
+        profile = current_profile.get()
+        if profile is not None:
+            profile.add_thread(threading.get_ident())
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+            if profile is not None:
+                profile.remove_thread(threading.get_ident())
+            pool_stats.release()
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        executor = get_pool_executor()
+
+        if executor is None:
+            return await database_sync_to_async(func)(*args, **kwargs)
+
+        return await sync_to_async(
+            run_pooled, thread_sensitive=False, executor=executor
+        )(time.monotonic(), *args, **kwargs)
+
+    return wrapper
@@ -1,6 +1,7 @@
 """Project-wide environment variables"""
 
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -8,10 +9,117 @@ load_dotenv()
 
 SECRET_KEY = os.environ.get("SECRET_KEY") or "123"
 
-ENVIRONMENT = "DEV"
+ENVIRONMENT = os.environ.get("ENVIRONMENT") or "DEV"
 DB_ENGINE = "django.db.backends.postgresql"
 DB_USER = os.environ.get("DB_USER")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_NAME = os.environ.get("DB_NAME")
 DB_HOST = os.environ.get("DB_HOST")
 DB_PORT = os.environ.get("DB_PORT")
+# Comma-separated hosts of read replicas sharing the primary's credentials
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in (os.environ.get("DB_REPLICA_HOSTS") or "").split(",")
+    if host.strip()
+]
+# Seconds a client keeps reading from the primary after it wrote
+DB_REPLICA_PIN_SECONDS = int(os.environ.get("DB_REPLICA_PIN_SECONDS") or 5)
+# Hash partitions of the task table on Postgres; 0 keeps it a regular table
+DB_TASK_PARTITIONS = int(os.environ.get("DB_TASK_PARTITIONS") or 0)
+
+# Persistent connections: seconds a connection is kept open (0 closes after every request)
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE") or 60)
+# Check a persistent connection is still usable before it is reused
+DB_CONN_HEALTH_CHECKS = (
+    os.environ.get("DB_CONN_HEALTH_CHECKS") or "true"
+).lower() == "true"
+# Threads (and therefore connections) shared by async ORM calls; 0 disables the pool
+DB_ASYNC_POOL_SIZE = int(os.environ.get("DB_ASYNC_POOL_SIZE") or 4)
+
+# Queries taking this many milliseconds or more are logged with their plan (0 disables)
+DB_SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS") or 100)
+# Distinct slow statements kept in memory by each process
+DB_SLOW_QUERY_LOG_SIZE = int(os.environ.get("DB_SLOW_QUERY_LOG_SIZE") or 200)
+# File the slow queries are logged to, rotated at 10 MiB
+DB_SLOW_QUERY_LOG_FILE = os.environ.get("DB_SLOW_QUERY_LOG_FILE") or os.path.join(
+    tempfile.gettempdir(), "taskmaster-slow-queries.log"
+)
+# Plan slow SELECTs with EXPLAIN ANALYZE on Postgres, which runs them a second time
+DB_SLOW_QUERY_ANALYZE = (
+    os.environ.get("DB_SLOW_QUERY_ANALYZE") or "false"
+).lower() == "true"
+
+# DONE tasks not updated for this many days are moved to the archive by `archive_tasks`
+TASK_ARCHIVE_AFTER_DAYS = int(os.environ.get("TASK_ARCHIVE_AFTER_DAYS") or 90)
+
+# Redis server shared by the websocket servers and the event relay, e.g. redis://redis:6379/0.
+# Without it each process uses its own in-memory channel layer.
+REDIS_URL = os.environ.get("REDIS_URL")
+# Hours delivered task events are kept in the outbox before being pruned
+TASK_EVENT_RETENTION_HOURS = int(os.environ.get("TASK_EVENT_RETENTION_HOURS") or 24)
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE") or 512)
+# Larger responses are sent uncompressed too, capping the CPU spent on one response
+COMPRESSION_MAX_SIZE = int(os.environ.get("COMPRESSION_MAX_SIZE") or 5 * 1024 * 1024)
+
+# Websocket commands a connection may have running at the same time
+WS_MAX_IN_FLIGHT = int(os.environ.get("WS_MAX_IN_FLIGHT") or 8)
+# Seconds of client silence before the server pings a websocket
+WS_PING_INTERVAL = float(os.environ.get("WS_PING_INTERVAL") or 25)
+# Seconds of client silence before the server closes a websocket
+WS_IDLE_TIMEOUT = float(os.environ.get("WS_IDLE_TIMEOUT") or 60)
+# Frames and bytes a websocket may have waiting to be sent before it is closed
+WS_SEND_QUEUE_SIZE = int(os.environ.get("WS_SEND_QUEUE_SIZE") or 100)
+WS_SEND_QUEUE_BYTES = int(os.environ.get("WS_SEND_QUEUE_BYTES") or 1024 * 1024)
+
+# Sub-requests accepted by one call to the batch endpoint
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS") or 20)
+
+# Background jobs (`run_jobs`): comma-separated lanes, highest priority first
+JOB_QUEUES = [
+    queue.strip()
+    for queue in (os.environ.get("JOB_QUEUES") or "high,default,low").split(",")
+    if queue.strip()
+]
+# Jobs a worker runs at the same time
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY") or 4)
+# Seconds a claimed job stays hidden from other workers unless its worker renews the lease
+JOB_VISIBILITY_TIMEOUT = int(os.environ.get("JOB_VISIBILITY_TIMEOUT") or 300)
+
+# Production server (`gunicorn.conf.py`): worker processes, each serving HTTP and websockets
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+# Threads per worker running the sync views of HTTP requests, each keeping one database
+# connection open between requests
+WEB_THREADS = int(os.environ.get("WEB_THREADS") or 4)
+# Seconds workers get to finish their requests on a graceful reload or shutdown
+WEB_GRACEFUL_TIMEOUT = int(os.environ.get("WEB_GRACEFUL_TIMEOUT") or 30)
+# Load the application in the master before forking the workers: they boot faster and
+# share its memory, but SIGHUP no longer reloads the code
+WEB_PRELOAD = (os.environ.get("WEB_PRELOAD") or "false").lower() == "true"
+# Requests after which a worker is replaced (0 never), plus up to 10% random jitter
+WEB_MAX_REQUESTS = int(os.environ.get("WEB_MAX_REQUESTS") or 10000)
+# MiB of resident memory past which a worker is replaced (0 disables the watchdog)
+WEB_MEMORY_LIMIT = int(os.environ.get("WEB_MEMORY_LIMIT") or 512)
+# Seconds between two samples of a worker's memory
+WEB_MEMORY_CHECK_INTERVAL = float(os.environ.get("WEB_MEMORY_CHECK_INTERVAL") or 10)
+# Stack frames traced per allocation to report where memory grew (0 disables tracing)
+WEB_TRACEMALLOC_FRAMES = int(os.environ.get("WEB_TRACEMALLOC_FRAMES") or 0)
+# Restart workers when the code changes (development only)
+WEB_RELOAD = (os.environ.get("WEB_RELOAD") or "false").lower() == "true"
+
+# Request profiling on demand in production (always on elsewhere); when disabled,
+# requests skip the profiler entirely
+PROFILING_ENABLED = (os.environ.get("PROFILING_ENABLED") or "false").lower() == "true"
+# Directory the profiles (folded stack files) are written to
+PROFILING_DIR = os.environ.get("PROFILING_DIR") or os.path.join(
+    tempfile.gettempdir(), "taskmaster-profiles"
+)
+# Fraction of requests and websocket connections profiled without a signed token
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE") or 0)
+# Profiles kept in PROFILING_DIR; older ones are deleted
+PROFILING_MAX_FILES = int(os.environ.get("PROFILING_MAX_FILES") or 200)
+
+# UUID version generated for new primary keys: 7 (time-ordered) or 4 (random)
+PK_UUID_VERSION = int(os.environ.get("PK_UUID_VERSION") or 7)
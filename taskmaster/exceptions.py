@@ -0,0 +1,14 @@
+"""Project-wide API exceptions"""
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    """
+    Raised when a conditional request (`If-Match`) does not match the current resource.
+    """
+
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The resource has been modified since it was last fetched."
+    default_code = "precondition_failed"
@@ -0,0 +1,84 @@
+"""ASGI request handler"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from asgiref.sync import SyncToAsync, ThreadSensitiveContext
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+
+
+class PooledASGIHandler(ASGIHandler):
+    """
+    ASGI handler running the sync code of HTTP requests on a fixed set of threads.
+
+    Django's `ASGIHandler` gives every request its own `ThreadSensitiveContext`, so the
+    sync middleware, views and signal handlers of each request run on a new thread
+    (Django ticket #33497). Database connections are per thread, so every request opened
+    a connection and `CONN_MAX_AGE` never reused one: the idle connections stayed open
+    until their thread was collected.
+
+    Here every request is bound to one of `settings.WEB_THREADS` long-lived threads, the
+    least busy one when it starts. Each thread keeps its own connection across requests
+    for up to `CONN_MAX_AGE` seconds, so a worker holds at most that many connections.
+    Requests sharing a thread interleave between their sync calls, like they would on
+    asgiref's default single sync thread.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        # Created on the first request, so a preloaded master forks no threads
+        self._executors: Optional[List[ThreadPoolExecutor]] = None
+        self._in_flight: List[int] = []
+
+    def acquire_executor(self) -> int:
+        """
+        Pick the thread with the fewest requests in flight and count one more on it.
+
+        Returns:
+            int: The index of the executor, to pass to `release_executor`.
+        """
+        with self._lock:
+            if self._executors is None:
+                self._executors = [
+                    ThreadPoolExecutor(max_workers=1, thread_name_prefix="web")
+                    for _ in range(settings.WEB_THREADS)
+                ]
+                self._in_flight = [0] * settings.WEB_THREADS
+            index = min(range(len(self._in_flight)), key=self._in_flight.__getitem__)
+            self._in_flight[index] += 1
+            return index
+
+    def release_executor(self, index: int) -> None:
+        """Record that a request bound to the executor at `index` has finished."""
+        with self._lock:
+            self._in_flight[index] -= 1
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await super().__call__(scope, receive, send)
+
+        index = self.acquire_executor()
+        try:
+            async with ThreadSensitiveContext() as context:
+                # Only the outermost context picks the executor (it is re-entrant)
+                if SyncToAsync.thread_sensitive_context.get() is not context:
+                    return await self.handle(scope, receive, send)
+
+                SyncToAsync.context_to_thread_executor[context] = self._executors[index]
+                try:
+                    await self.handle(scope, receive, send)
+                finally:
+                    # Unmap it before the context exits, which would shut it down
+                    SyncToAsync.context_to_thread_executor.pop(context, None)
+        finally:
+            self.release_executor(index)
+
+    def shutdown(self) -> None:
+        """Stop the threads while no request is in flight; requests restart them."""
+        with self._lock:
+            executors, self._executors = self._executors or [], None
+        for executor in executors:
+            executor.shutdown()
@@ -0,0 +1,124 @@
+"""Worker memory watchdog"""
+
+import gc
+import logging
+import os
+import signal
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Callable, List, Optional
+
+from taskmaster.utils import get_rss
+
+logger = logging.getLogger(__name__)
+
+MiB = 1024 * 1024
+
+# Allocations made by the tracing itself or by imports are not leaks
+TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def terminate_process() -> None:
+    """Ask the current process to shut down gracefully."""
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+class MemoryWatchdog:
+    """
+    Recycle the current process once its resident memory passes a watermark.
+
+    A daemon thread samples the RSS every `interval` seconds. Past `limit` bytes it logs
+    where memory grew since the watchdog started and calls `on_limit` once. By default
+    that sends SIGTERM to the process: a gunicorn worker finishes its requests and
+    exits, and the master starts a fresh one before the container meets the OOM killer.
+
+    With `trace_frames` above 0, allocations are traced with `tracemalloc` and the
+    report lists the source lines whose allocations grew most. Tracing slows allocations
+    down, so without it the report lists the object types the collector tracks most.
+
+    Examples:
+        >>> MemoryWatchdog(limit=512 * MiB, interval=10, trace_frames=1).start()
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        interval: float = 10,
+        trace_frames: int = 0,
+        top: int = 10,
+        on_limit: Optional[Callable[[], None]] = None,
+    ):
+        self.limit = limit
+        self.interval = interval
+        self.trace_frames = trace_frames
+        self.top = top
+        self.on_limit = on_limit or terminate_process
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Take the baseline and start sampling in a daemon thread."""
+        if self.trace_frames:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.trace_frames)
+            self.baseline = self.snapshot()
+
+        self.thread = threading.Thread(
+            target=self.run, name="memory-watchdog", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if self.check():
+                return
+
+    def check(self) -> bool:
+        """
+        Compare the RSS to the limit, reporting and recycling the process past it.
+
+        Returns:
+            bool: True when the limit was passed.
+        """
+        rss = get_rss()
+        if rss <= self.limit:
+            return False
+
+        logger.warning(
+            "Process %d uses %.1f MiB, above its %.1f MiB limit; recycling it. "
+            "Largest growth since it started:\n%s",
+            os.getpid(),
+            rss / MiB,
+            self.limit / MiB,
+            "\n".join(self.growth_report()),
+        )
+        self.on_limit()
+        return True
+
+    def snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+
+    def growth_report(self) -> List[str]:
+        """
+        Returns:
+            list: One line per allocation site (with tracing) or object type, largest
+                first.
+        """
+        if self.baseline is not None:
+            statistics = self.snapshot().compare_to(self.baseline, "lineno")
+            return [f"  {statistic}" for statistic in statistics[: self.top]]
+
+        counts = Counter(type(obj).__qualname__ for obj in gc.get_objects())
+        return [
+            f"  {name}: {count} objects" for name, count in counts.most_common(self.top)
+        ]
@@ -0,0 +1,274 @@
+"""Project-wide HTTP middlewares"""
+
+import re
+import threading
+import time
+import zlib
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from taskmaster.profiling import current_profile, start_profile, write_profile
+from taskmaster.routers import routing_context
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: pip install zstandard
+    zstandard = None
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests that ask for it with a signed token, or a sample of all requests.
+
+    A request is profiled when its `X-Profile` header holds a token issued by
+    `python manage.py profiling_token`, or at random with the probability
+    `settings.PROFILING_SAMPLE_RATE`. The thread serving the request, and the pooled
+    threads running database calls for it, are sampled until the response is returned.
+    The folded stacks are written to `settings.PROFILING_DIR` and the file's name is
+    sent back in the `X-Profile` response header.
+
+    Other requests only pay for a header lookup, and with `settings.PROFILING_ENABLED`
+    off the middleware is left out of the chain.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = start_profile(
+            f"http {request.method} {request.path}",
+            request.META.get(settings.PROFILING_HEADER),
+        )
+        if profile is None:
+            return self.get_response(request)
+
+        profile.add_thread(threading.get_ident())
+        token = current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+            profile.stop()
+
+        response["X-Profile"] = write_profile(profile).name
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keep clients that just wrote on the primary database for a short window.
+
+    Each request runs inside a `routing_context`. A request is pinned to the primary when
+    it carries an unexpired pin cookie. When a request writes to the database, the
+    response sets the cookie (holding the pin's expiry timestamp) for
+    `settings.REPLICA_PIN_SECONDS`, so reads that follow right after see that write
+    even if the replicas lag behind.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing_context(pinned=self.is_pinned(request)) as state:
+            response = self.get_response(request)
+
+        if state["wrote"] and settings.DATABASE_REPLICAS:
+            pinned_until = time.time() + settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                str(int(pinned_until)),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
+
+    @staticmethod
+    def is_pinned(request) -> bool:
+        """Whether the request carries a pin cookie that has not expired yet."""
+        try:
+            return float(request.COOKIES[settings.REPLICA_PIN_COOKIE]) > time.time()
+        except (KeyError, ValueError):
+            return False
+
+
+class GzipEncoder:
+    """Incremental gzip compressor."""
+
+    def __init__(self, level: int):
+        # wbits 16 + MAX_WBITS writes a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """Compress `data`; with `flush`, everything given so far can be decoded."""
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else output
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    """Incremental brotli compressor."""
+
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        output = self._compressor.process(data)
+        return output + self._compressor.flush() if flush else output
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    """Incremental zstd compressor."""
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        output = self._compressor.compress(data)
+        if flush:
+            output += self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return output
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Available encodings, in the order preferred when a client accepts several equally
+ENCODERS = {
+    name: encoder
+    for name, encoder, module in (
+        ("zstd", ZstdEncoder, zstandard),
+        ("br", BrotliEncoder, brotli),
+        ("gzip", GzipEncoder, zlib),
+    )
+    if module is not None
+}
+
+_COMPRESSIBLE_TYPE = re.compile(
+    r"^(text/|application/(json|javascript|xml)|[^;]+\+(json|xml))", re.IGNORECASE
+)
+
+
+def negotiate_encoding(accept_encoding: str, available=ENCODERS) -> Optional[str]:
+    """
+    Pick the response encoding from an `Accept-Encoding` header.
+
+    The encoding with the highest q-value wins; ties go to the first one in
+    `available`. Encodings with `q=0` are refused, and `*` covers unlisted encodings.
+
+    Args:
+        accept_encoding (str): The request's `Accept-Encoding` header.
+        available (Iterable[str]): Supported encodings, most preferred first.
+
+    Returns:
+        str: The chosen encoding, or None to send the body as is.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        match = re.search(r"q\s*=\s*([0-9.]+)", params)
+        if match:
+            try:
+                weight = float(match.group(1))
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for name in available:
+        weight = weights.get(name, wildcard)
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with zstd, brotli or gzip, as negotiated with `Accept-Encoding`.
+
+    brotli and zstd are used when the `brotli`/`zstandard` packages are installed; gzip
+    is always available. Only textual content types (JSON, text, XML, JavaScript) are
+    compressed.
+
+    Regular responses are compressed at `settings.COMPRESSION_LEVELS` when their body
+    is between `COMPRESSION_MIN_SIZE` bytes (smaller bodies gain nothing) and
+    `COMPRESSION_MAX_SIZE` bytes, which caps the CPU a single response can take.
+    Streaming responses have no known size: they are compressed chunk by chunk at the
+    cheaper `COMPRESSION_STREAMING_LEVELS`, and each chunk is flushed so clients can
+    decode it as soon as it arrives.
+
+    Strong ETags become weak ones, as the compressed body is no longer byte-identical,
+    so conditional requests keep working.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.has_header("Content-Encoding") or not _COMPRESSIBLE_TYPE.match(
+            response.get("Content-Type", "")
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            encoder = ENCODERS[encoding](settings.COMPRESSION_STREAMING_LEVELS[encoding])
+            response.streaming_content = self.compress_stream(
+                response.streaming_content, encoder
+            )
+            del response["Content-Length"]
+        else:
+            size = len(response.content)
+            if not settings.COMPRESSION_MIN_SIZE <= size <= settings.COMPRESSION_MAX_SIZE:
+                return response
+
+            encoder = ENCODERS[encoding](settings.COMPRESSION_LEVELS[encoding])
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= size:
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = f"W/{etag}"
+        response["Content-Encoding"] = encoding
+
+        return response
+
+    @staticmethod
+    def compress_stream(chunks, encoder) -> Iterator[bytes]:
+        """Compress and flush every chunk of a streaming response."""
+        for chunk in chunks:
+            output = encoder.compress(chunk, flush=True)
+            if output:
+                yield output
+        yield encoder.finish()
@@ -40,3 +40,14 @@ class IsObjectOwner(BasePermission):
             return False
 
         return user_id == request.user.id
+
+
+class IsStaff(BasePermission):
+    """
+    Allows access only to staff users.
+    """
+
+    message = "You do not have permission to perform this action"
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_staff)
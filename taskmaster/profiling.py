@@ -0,0 +1,201 @@
+"""On-demand request profiling"""
+
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+SIGNING_SALT = "taskmaster.profiling"
+
+# Profile of the request or connection the current code runs for, if it is profiled
+current_profile: contextvars.ContextVar = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def make_profiling_token() -> str:
+    """
+    Sign a token asking for requests to be profiled.
+
+    Returns:
+        str: A token valid for `settings.PROFILING_TOKEN_MAX_AGE` seconds.
+    """
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign("profile")
+
+
+def is_valid_token(token: str) -> bool:
+    try:
+        value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return value == "profile"
+
+
+def should_profile(token: Optional[str]) -> bool:
+    """Whether to profile a request carrying `token`, or none, or to sample it."""
+    if not settings.PROFILING_ENABLED:
+        return False
+    if token and is_valid_token(token):
+        return True
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class Profile:
+    """
+    Sampling profiler of the threads and asyncio tasks serving one request.
+
+    While started, a daemon thread wakes every `interval` seconds and records the stack
+    of each thread added with `add_thread`, and of the event loop thread when it runs
+    one of the tasks added with `add_task`. Each stack is weighted by the microseconds
+    elapsed since the previous sample, so slow database calls and serialization show
+    up in proportion to the wall time they take. Sampling stops after `max_seconds`.
+
+    The stacks are written in the folded format read by `flamegraph.pl` and
+    speedscope: one line per stack, frames from the root separated by `;`, then the
+    microseconds spent in it.
+
+    Examples:
+        >>> profile = Profile("http GET /api/v1/tasks/")
+        >>> profile.add_thread(threading.get_ident())
+        >>> profile.start()
+        >>> ...
+        >>> profile.stop()
+        >>> profile.folded()
+    """
+
+    def __init__(self, name: str, interval: float = 0.001, max_seconds: float = 60):
+        self.name = name
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.threads = set()
+        self.tasks = weakref.WeakSet()
+        self.loop = None
+        self.loop_thread = None
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add_thread(self, ident: int) -> None:
+        with self._lock:
+            self.threads.add(ident)
+
+    def remove_thread(self, ident: int) -> None:
+        with self._lock:
+            self.threads.discard(ident)
+
+    def add_task(self, task: asyncio.Task) -> None:
+        """Sample the event loop while it runs `task`; call from the loop's thread."""
+        with self._lock:
+            self.tasks.add(task)
+            self.loop = task.get_loop()
+            self.loop_thread = threading.get_ident()
+
+    def start(self) -> "Profile":
+        self._thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def run(self) -> None:
+        deadline = time.monotonic() + self.max_seconds
+        previous = time.perf_counter()
+        while not self._stopped.wait(self.interval) and time.monotonic() < deadline:
+            now = time.perf_counter()
+            self.sample(int((now - previous) * 1_000_000))
+            previous = now
+
+    def sample(self, weight: int) -> None:
+        frames = sys._current_frames()
+        with self._lock:
+            # Not the owner waiting for this thread to stop
+            if self._stopped.is_set():
+                return
+            idents = list(self.threads)
+            if self.loop is not None and asyncio.current_task(self.loop) in self.tasks:
+                idents.append(self.loop_thread)
+
+        for ident in idents:
+            frame = frames.get(ident)
+            if frame is not None:
+                self.stacks[self.fold(frame)] += weight
+
+    def fold(self, frame) -> str:
+        """The stack ending at `frame` as `module:function` labels, root first."""
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                module = frame.f_globals.get("__name__", "?")
+                label = self._labels[code] = f"{module}:{code.co_name}"
+            labels.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {weight}\n" for stack, weight in self.stacks.items())
+
+
+def start_profile(name: str, token: Optional[str] = None) -> Optional[Profile]:
+    """
+    Start profiling a request when `should_profile` says so.
+
+    Returns:
+        Profile: The started profile, or None when the request is not profiled.
+    """
+    if not should_profile(token):
+        return None
+    return Profile(
+        name,
+        interval=settings.PROFILING_INTERVAL,
+        max_seconds=settings.PROFILING_MAX_SECONDS,
+    ).start()
+
+
+def write_profile(profile: Profile) -> Path:
+    """
+    Write a profile's folded stacks to `settings.PROFILING_DIR`.
+
+    Only the newest `settings.PROFILING_MAX_FILES` profiles are kept.
+
+    Returns:
+        Path: The file written.
+    """
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # Names sort in the order the profiles were written
+    seconds, nanoseconds = divmod(time.time_ns(), 1_000_000_000)
+    timestamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(seconds))
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", profile.name).strip("_")[:80]
+    path = directory / f"{timestamp}.{nanoseconds:09d}Z-{slug}.folded"
+    path.write_text(profile.folded())
+
+    profiles = sorted(directory.glob("*.folded"))
+    for stale in profiles[: -settings.PROFILING_MAX_FILES]:
+        stale.unlink(missing_ok=True)
+
+    logger.info("Profile of %s written to %s", profile.name, path)
+    return path
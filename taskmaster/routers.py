@@ -0,0 +1,83 @@
+"""Database routers"""
+
+import contextvars
+import random
+from contextlib import contextmanager
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+
+# Per-request routing state. A mutable dict is stored (rather than plain flags) so that
+# writes recorded inside `sync_to_async`-copied contexts are visible to the middleware.
+_routing_state: contextvars.ContextVar = contextvars.ContextVar(
+    "routing_state", default=None
+)
+
+
+def current_routing_state() -> Optional[dict]:
+    """The state of the innermost `routing_context`, or None outside of one."""
+    return _routing_state.get()
+
+
+@contextmanager
+def routing_context(pinned: bool = False, state: Optional[dict] = None):
+    """
+    Scope replica routing to a unit of work, such as a single HTTP request.
+
+    Args:
+        pinned (bool): Send every read inside the context to the primary.
+        state (dict): The state of an enclosing unit of work to share, such as the
+            request a batched call belongs to. Its writes then pin the reads of both.
+
+    Yields:
+        dict: The routing state. `wrote` is True once a write has been routed.
+    """
+    if state is None:
+        state = {"pinned": pinned, "wrote": False}
+    token = _routing_state.set(state)
+    try:
+        yield state
+    finally:
+        _routing_state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Route reads to read replicas and writes to the primary ("default") database.
+
+    Reads are spread randomly across `settings.DATABASE_REPLICAS`. Inside a
+    `routing_context`, reads stay on the primary when the context is pinned or once a
+    write has happened, so a client always reads its own writes. Reads inside a
+    transaction on the primary stay in it, so they see its writes and the rows it locks,
+    whether they come before or after the first write. Without replicas configured every
+    query goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        state = _routing_state.get()
+
+        if not replicas or (state and (state["pinned"] or state["wrote"])):
+            return "default"
+
+        if connections["default"].in_atomic_block:
+            return "default"
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+
+        if state is not None:
+            state["wrote"] = True
+
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data, so objects may relate across them
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db == "default"
@@ -35,7 +35,6 @@ CORS_ALLOW_ALL_ORIGINS = True
 # Application definition
 
 INSTALLED_APPS = [
-    "daphne",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -44,10 +43,21 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "accounts",
     "taskmanager",
+    "jobs",
 ]
 
+if env.ENVIRONMENT != "PROD":
+    # Makes `runserver` serve websockets too. Production runs uvicorn workers, and
+    # loading this app would import Twisted in every worker for nothing.
+    INSTALLED_APPS.insert(0, "daphne")
+
 MIDDLEWARE = [
+    # Outermost, so a profile covers every other middleware
+    "taskmaster.middlewares.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # Runs last on the response, once the body is final
+    "taskmaster.middlewares.CompressionMiddleware",
+    "taskmaster.middlewares.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -91,17 +101,65 @@ if env.ENVIRONMENT == "PROD":
             "NAME": env.DB_NAME,
             "HOST": env.DB_HOST,
             "PORT": env.DB_PORT,
+            # Keep connections open across requests instead of reconnecting every time.
+            # Only long-lived threads reuse them: the `web` threads of
+            # `PooledASGIHandler` and the `db-pool` threads of `pooled_sync_to_async`.
+            "CONN_MAX_AGE": env.DB_CONN_MAX_AGE,
+            # Verify a reused connection before handing it to the request
+            "CONN_HEALTH_CHECKS": env.DB_CONN_HEALTH_CHECKS,
         }
     }
+
+    # Register every read replica as `replica_<n>` with the primary's settings
+    for index, host in enumerate(env.DB_REPLICA_HOSTS):
+        DATABASES[f"replica_{index}"] = {**DATABASES["default"], "HOST": host}
 else:
     # Use SQLite as the database backend for development and other environments
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            # A file rather than shared-cache memory, so threads of the job and async
+            # pools wait for each other's writes instead of failing with "table is locked"
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
         }
     }
 
+# Read replicas: reads are spread over these aliases, writes always go to "default".
+# A client that wrote is pinned to the primary for REPLICA_PIN_SECONDS so it reads its own writes.
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["taskmaster.routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = env.DB_REPLICA_PIN_SECONDS
+REPLICA_PIN_COOKIE = "pin_primary"
+
+# Number of hash partitions (on user_id) migration taskmanager.0009 splits the task table
+# into on Postgres. 0 leaves the table unpartitioned; SQLite is never partitioned.
+TASK_PARTITIONS = env.DB_TASK_PARTITIONS
+
+# Default age (days since the last update) at which `archive_tasks` moves DONE tasks
+# to the archive table.
+TASK_ARCHIVE_AFTER_DAYS = env.TASK_ARCHIVE_AFTER_DAYS
+
+# Number of threads shared by `taskmaster.db.pooled_sync_to_async`. Every thread holds
+# one persistent connection, so this bounds the connections opened by async ORM calls.
+DB_ASYNC_POOL_SIZE = env.DB_ASYNC_POOL_SIZE
+
+# Number of threads `taskmaster.handlers.PooledASGIHandler` runs the sync views of HTTP
+# requests on. Every thread holds one persistent connection, so this bounds the
+# connections opened by the HTTP requests of a worker.
+WEB_THREADS = env.WEB_THREADS
+
+# Slow query log (`taskmaster.slow_queries`): queries taking SLOW_QUERY_THRESHOLD
+# seconds or more are logged with their plan, and the last SLOW_QUERY_LOG_SIZE slow
+# statements are kept in memory, served by `GET /api/v1/slow-queries/` to staff users
+SLOW_QUERY_THRESHOLD = env.DB_SLOW_QUERY_MS / 1000
+SLOW_QUERY_LOG_SIZE = env.DB_SLOW_QUERY_LOG_SIZE
+SLOW_QUERY_EXPLAIN_ANALYZE = env.DB_SLOW_QUERY_ANALYZE
+
+# UUID version used by `taskmaster.utils.generate_id` for new primary keys.
+# Version 7 ids are time-ordered, so inserts append to the end of the primary key index.
+PRIMARY_KEY_UUID_VERSION = env.PK_UUID_VERSION
+
 
 # Auth user model
 AUTH_USER_MODEL = "accounts.User"
@@ -163,6 +221,93 @@ CHANNEL_LAYERS = {
     },
 }
 
+if env.REDIS_URL:
+    # Task events are published by the `relay_task_events` process, so the layer must be
+    # shared with the websocket servers
+    CHANNEL_LAYERS["default"] = {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [env.REDIS_URL]},
+    }
+
+# Without a shared layer the relay can't reach the websocket clients of other processes,
+# so each process publishes the task events it writes once they are committed
+TASK_EVENTS_PUBLISH_ON_COMMIT = not env.REDIS_URL
+
+# Commands a websocket connection may have running at the same time
+WS_MAX_IN_FLIGHT = env.WS_MAX_IN_FLIGHT
+# Heartbeats: quiet clients are pinged, silent ones are closed (code 4408)
+WS_PING_INTERVAL = env.WS_PING_INTERVAL
+WS_IDLE_TIMEOUT = env.WS_IDLE_TIMEOUT
+# Bounds of a websocket's send queue; clients reading slower are closed (code 4429)
+WS_SEND_QUEUE_SIZE = env.WS_SEND_QUEUE_SIZE
+WS_SEND_QUEUE_BYTES = env.WS_SEND_QUEUE_BYTES
+
+# Hours delivered task events are kept in the outbox (`taskmanager.TaskEvent`)
+TASK_EVENT_RETENTION_HOURS = env.TASK_EVENT_RETENTION_HOURS
+
+# Response compression (`taskmaster.middlewares.CompressionMiddleware`)
+COMPRESSION_MIN_SIZE = env.COMPRESSION_MIN_SIZE
+COMPRESSION_MAX_SIZE = env.COMPRESSION_MAX_SIZE
+# Levels per encoding; streaming responses have no size cap, so they use cheap levels
+COMPRESSION_LEVELS = {"gzip": 6, "br": 5, "zstd": 3}
+COMPRESSION_STREAMING_LEVELS = {"gzip": 1, "br": 1, "zstd": 1}
+
+# Request profiling (`taskmaster.profiling`): requests carrying a token signed by
+# `python manage.py profiling_token` in PROFILING_HEADER (websockets: `?profile=`), or
+# sampled at PROFILING_SAMPLE_RATE, are profiled into PROFILING_DIR. Opt-in in
+# production; development and tests always have it.
+PROFILING_ENABLED = env.PROFILING_ENABLED or env.ENVIRONMENT != "PROD"
+PROFILING_DIR = env.PROFILING_DIR
+PROFILING_SAMPLE_RATE = env.PROFILING_SAMPLE_RATE
+PROFILING_MAX_FILES = env.PROFILING_MAX_FILES
+PROFILING_HEADER = "HTTP_X_PROFILE"
+# Seconds a signed token stays valid
+PROFILING_TOKEN_MAX_AGE = 3600
+# Seconds between two stack samples, and seconds after which a profile stops sampling
+PROFILING_INTERVAL = 0.001
+PROFILING_MAX_SECONDS = 60
+
+# Sub-requests accepted by one call to `POST /api/v1/batch/`
+BATCH_MAX_REQUESTS = env.BATCH_MAX_REQUESTS
+
+# Background jobs (`jobs` app)
+JOB_QUEUES = env.JOB_QUEUES
+JOB_CONCURRENCY = env.JOB_CONCURRENCY
+JOB_VISIBILITY_TIMEOUT = env.JOB_VISIBILITY_TIMEOUT
+# Retry backoff: seconds before the 2nd attempt, doubling up to the maximum
+JOB_RETRY_BASE_DELAY = 10
+JOB_RETRY_MAX_DELAY = 3600
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "default": {"format": "%(asctime)s %(levelname)s %(name)s: %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "default"},
+        "slow_queries": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": env.DB_SLOW_QUERY_LOG_FILE,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 3,
+            "delay": True,
+            "formatter": "default",
+        },
+    },
+    "root": {"handlers": ["console"], "level": "WARNING"},
+    "loggers": {
+        "taskmanager": {"handlers": ["console"], "level": env.LOG_LEVEL, "propagate": False},
+        "taskmaster": {"handlers": ["console"], "level": env.LOG_LEVEL, "propagate": False},
+        "jobs": {"handlers": ["console"], "level": env.LOG_LEVEL, "propagate": False},
+        "taskmaster.slow_queries": {
+            "handlers": ["console", "slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=7),  # Access token lifetime set to 7 days
     "REFRESH_TOKEN_LIFETIME": timedelta(
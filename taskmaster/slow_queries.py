@@ -0,0 +1,241 @@
+"""Slow query log"""
+
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import List
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Statements EXPLAIN accepts; only SELECTs are explained with ANALYZE, which runs them
+EXPLAINABLE = frozenset({"SELECT", "WITH", "INSERT", "UPDATE", "DELETE"})
+
+_state = threading.local()
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Reduce a statement to its shape: literals and placeholders become `?`, lists of
+    placeholders (`IN (%s, %s)`, `VALUES (%s, %s)`) become `(...)`, and whitespace is
+    collapsed. Statements differing only in their values normalize the same way.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql.replace("%s", "?"))
+    sql = _PLACEHOLDERS.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def params_shape(params, many: bool = False) -> str:
+    """
+    Describe the parameters of a query by their types, without their values.
+
+    Examples:
+        >>> params_shape((uuid.uuid4(), 1, 2, 3, "DONE"))
+        '(UUID, int x3, str)'
+    """
+    if many:
+        return "executemany"
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        types = (f"{name}: {type(value).__name__}" for name, value in params.items())
+        return "{{{}}}".format(", ".join(types))
+
+    runs = []
+    for param in params:
+        name = type(param).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return "({})".format(
+        ", ".join(name if count == 1 else f"{name} x{count}" for name, count in runs)
+    )
+
+
+def find_call_site(depth: int = 3) -> str:
+    """
+    The innermost `depth` frames of the project's own code that led to a query.
+
+    Examples:
+        >>> find_call_site()
+        'taskmaster/utils.py:397 get_object_or_error < taskmanager/services.py:132 ...'
+    """
+    base = str(settings.BASE_DIR) + os.sep
+    sites = []
+    frame = sys._getframe(1)
+    while frame is not None and len(sites) < depth:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base)
+            and "site-packages" not in filename
+            and filename != __file__
+        ):
+            path = filename[len(base) :]
+            sites.append(f"{path}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return " < ".join(sites) or "?"
+
+
+def explain(connection, sql: str, params) -> List[str]:
+    """
+    The plan of a query, or an empty list for statements that can't be explained.
+
+    The plan is taken in a savepoint on the query's own connection, so it sees the same
+    transaction, and a failing EXPLAIN doesn't break it.
+    """
+    words = sql.split(None, 1)
+    statement = words[0].upper() if words else ""
+    if statement not in EXPLAINABLE or connection.needs_rollback:
+        return []
+
+    options = {}
+    if (
+        settings.SLOW_QUERY_EXPLAIN_ANALYZE
+        and statement == "SELECT"
+        and connection.vendor == "postgresql"
+    ):
+        options["analyze"] = True
+    prefix = connection.ops.explain_query_prefix(**options)
+
+    _state.explaining = True
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f"{prefix} {sql}", params)
+                # The plan is the last column: SQLite prefixes it with node ids
+                return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError as error:
+        return [f"EXPLAIN failed: {error}"]
+    finally:
+        _state.explaining = False
+
+
+class SlowQueryLog:
+    """
+    Bounded record of the slowest statements, deduplicated by their normalized SQL.
+
+    Each distinct statement keeps its count and timings, with the SQL, parameter shape,
+    call site and plan of its first slow execution. Past `settings.SLOW_QUERY_LOG_SIZE`
+    statements, the one seen least recently is dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def record(self, connection, sql: str, params, many: bool, duration: float):
+        """
+        Record a slow execution, explaining its statement when it is seen first.
+
+        Returns:
+            dict: The statement's entry.
+        """
+        statement = normalize_sql(sql)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(statement)
+            if entry is not None:
+                self._entries.move_to_end(statement)
+                entry["count"] += 1
+                entry["total"] += duration
+                entry["max"] = max(entry["max"], duration)
+                entry["last_seen"] = now
+
+        if entry is None:
+            entry = {
+                "id": hashlib.sha1(statement.encode()).hexdigest()[:12],
+                "statement": statement,
+                "sql": sql,
+                "params": params_shape(params, many),
+                "call_site": find_call_site(),
+                "database": connection.alias,
+                "count": 1,
+                "total": duration,
+                "max": duration,
+                "first_seen": now,
+                "last_seen": now,
+                "plan": [] if many else explain(connection, sql, params),
+            }
+            with self._lock:
+                self._entries[statement] = entry
+                while len(self._entries) > settings.SLOW_QUERY_LOG_SIZE:
+                    self._entries.popitem(last=False)
+
+            logger.warning(
+                "Slow query %s (%.1fms) on %s at %s: %s %s\n%s",
+                entry["id"],
+                duration * 1000,
+                entry["database"],
+                entry["call_site"],
+                sql,
+                entry["params"],
+                "\n".join(f"  {line}" for line in entry["plan"]),
+            )
+        else:
+            logger.warning(
+                "Slow query %s (%.1fms, seen %d times) at %s",
+                entry["id"],
+                duration * 1000,
+                entry["count"],
+                find_call_site(),
+            )
+
+        return entry
+
+    def entries(self) -> List[dict]:
+        """
+        Returns:
+            list: Copies of the entries, the most total time first.
+        """
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        return sorted(entries, key=lambda entry: entry["total"], reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Execute wrapper timing a query, and recording it in `slow_query_log` when it took
+    `settings.SLOW_QUERY_THRESHOLD` seconds or more.
+    """
+    if getattr(_state, "explaining", False):
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+
+    if duration >= settings.SLOW_QUERY_THRESHOLD:
+        slow_query_log.record(context["connection"], sql, params, many, duration)
+    return result
+
+
+def install_query_timer(sender, connection, **kwargs) -> None:
+    """
+    `connection_created` receiver wrapping every new connection's queries with
+    `time_query`, unless `settings.SLOW_QUERY_THRESHOLD` is 0.
+    """
+    if settings.SLOW_QUERY_THRESHOLD and time_query not in connection.execute_wrappers:
+        # First, so `connection.execute_wrapper()` blocks still remove their own wrapper
+        connection.execute_wrappers.insert(0, time_query)
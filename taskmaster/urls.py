@@ -17,8 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from taskmaster.views import BatchAPI, SlowQueriesAPI
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/v1/batch/", BatchAPI.as_view(), name="batch"),
+    path("api/v1/slow-queries/", SlowQueriesAPI.as_view(), name="slow_queries"),
     path("api/v1/", include("accounts.urls"), name="accounts"),
     path("api/v1/", include("taskmanager.urls"), name="taskmanager"),
 ]
@@ -1,30 +1,95 @@
 """Project-wide helper module"""
 
+import os
+import sys
+import threading
+import time
 import uuid
-from typing import Type
+from typing import Optional, Type
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.paginator import EmptyPage, Paginator
-from django.db import models
-from django.http import Http404
+from django.db import connections, models, router, transaction
+from django.db.models.deletion import Collector
+from django.db.models.sql import DeleteQuery, UpdateQuery
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
 from rest_framework import exceptions, status
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
+# Last 60-bit timestamp (milliseconds + 12-bit sub-millisecond fraction) used by `uuid7`
+_uuid7_last_timestamp = 0
+_uuid7_lock = threading.Lock()
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID version 7 (RFC 9562).
+
+    The first 48 bits hold the Unix time in milliseconds and the next 12 bits a
+    sub-millisecond fraction, followed by 62 random bits. Ids generated by a process are
+    strictly increasing, so new rows are appended to the right edge of a primary key
+    index instead of landing on a random page.
+
+    Returns:
+        uuid.UUID: A new version 7 UUID.
+    """
+    global _uuid7_last_timestamp
+
+    nanoseconds = time.time_ns()
+    milliseconds, remainder = divmod(nanoseconds, 1_000_000)
+    timestamp = milliseconds << 12 | remainder * 4096 // 1_000_000
+
+    with _uuid7_lock:
+        # Never go backwards, even if the clock does or two ids share a timestamp
+        if timestamp <= _uuid7_last_timestamp:
+            timestamp = _uuid7_last_timestamp + 1
+        _uuid7_last_timestamp = timestamp
+
+    random_bits = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+
+    return uuid.UUID(
+        int=(timestamp >> 12) << 80  # unix_ts_ms
+        | 0x7 << 76  # version
+        | (timestamp & 0xFFF) << 64  # rand_a: sub-millisecond fraction
+        | 0b10 << 62  # variant
+        | random_bits  # rand_b
+    )
+
+
+def generate_id() -> uuid.UUID:
+    """
+    Default primary key generator for `BaseModel`.
+
+    Returns a time-ordered `uuid7` unless `settings.PRIMARY_KEY_UUID_VERSION` is 4.
+    """
+    if settings.PRIMARY_KEY_UUID_VERSION == 4:
+        return uuid.uuid4()
+    return uuid7()
+
 
 class BaseModel(models.Model):
     """
     An abstract base model that provides UUID primary key, and timestamp fields for creation and last update.
 
     Attributes:
-        id (UUIDField): The primary key for the model, automatically generated as a UUID.
+        id (UUIDField): The primary key for the model, automatically generated by `generate_id`.
         date_created (DateTimeField): The date and time when the model instance was created.
         last_updated (DateTimeField): The date and time when the model instance was last updated.
 
     This model will be inherited by other models in the project to include common fields and functionality.
+
+    Ids are time-ordered UUIDv7 by default. Rows created before the switch keep their
+    random UUIDv4 ids: both are valid UUIDs of the same column type, and rewriting primary
+    keys would have to cascade to every foreign key and to issued tokens. Old and new
+    ids can be mixed freely; only the insert locality of new rows improves.
     """
 
-    id = models.UUIDField(primary_key=True, unique=True, default=uuid.uuid4)
+    id = models.UUIDField(primary_key=True, unique=True, default=generate_id)
     date_created = models.DateTimeField(auto_now_add=True)
     last_updated = models.DateTimeField(auto_now=True)
 
@@ -37,12 +102,131 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class CodedChoiceField(models.PositiveSmallIntegerField):
+    """
+    A choice field whose string values are stored as small integer codes.
+
+    Python code, querysets and serializers keep using the string values; only the
+    database column holds the 2-byte code. Lookups such as `filter(status="DONE")` are
+    translated to the code, and values read back (including `values()` and
+    `UPDATE ... RETURNING` rows) are translated back to strings.
+
+    Args:
+        codes (dict): Maps each string value to its integer code. Codes must never be
+            reused for another value, as existing rows keep them.
+
+    Examples:
+        >>> status = CodedChoiceField(codes={"TO DO": 1, "DONE": 2}, default="TO DO")
+    """
+
+    def __init__(self, *args, codes: Optional[dict] = None, **kwargs):
+        self.codes = dict(codes or {})
+        self.values_by_code = {code: value for value, code in self.codes.items()}
+        kwargs["choices"] = [(value, value) for value in self.codes]
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["codes"] = self.codes
+        del kwargs["choices"]
+        return name, path, args, kwargs
+
+    @property
+    def validators(self):
+        # The integer range validators of the parent would compare the string values
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else self.values_by_code[value]
+
+    def to_python(self, value):
+        if value is None or value in self.codes:
+            return value
+        if value in self.values_by_code:
+            return self.values_by_code[value]
+        raise ValidationError(f"{value} is not a valid choice.")
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        try:
+            return self.codes[value]
+        except (KeyError, TypeError):
+            raise ValueError(f"{value!r} is not a valid choice for {self.name}.") from None
+
+
+def _page_url(request, **params) -> str:
+    """
+    Build the absolute URL of another page of the current request.
+
+    Query parameters other than the pagination ones (such as filters) are kept.
+    """
+    query = request.GET.copy()
+    query.pop("page", None)
+    query.pop("after", None)
+    for key, value in params.items():
+        query[key] = value
+    return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+
+def parse_keyset_after(after: Optional[str]) -> Optional[uuid.UUID]:
+    """
+    Parse the `after` cursor of keyset pagination.
+
+    Args:
+        after (str, optional): The id of the last item of the previous page.
+
+    Returns:
+        uuid.UUID: The id, or None to start from the first item.
+
+    Raises:
+        ValidationError: If `after` is not a valid id.
+    """
+    if not after:
+        return None
+    try:
+        return uuid.UUID(str(after))
+    except ValueError as error:
+        raise exceptions.ValidationError(
+            detail={"after": f"{after} is not a valid id"}
+        ) from error
+
+
+def parse_fields(fields: Optional[str], allowed) -> Optional[list]:
+    """
+    Parse a sparse fieldset parameter, such as `?fields=id,title,status_task`.
+
+    Args:
+        fields (str, optional): Comma-separated field names.
+        allowed (Iterable[str]): The fields that may be requested.
+
+    Returns:
+        list: The requested fields in the given order, or None for every field.
+
+    Raises:
+        ValidationError: If a field is not one of `allowed`.
+    """
+    if not fields:
+        return None
+
+    requested = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise exceptions.ValidationError(
+            detail={"fields": f"Unknown fields: {', '.join(unknown)}"}
+        )
+    return requested or None
+
+
 def paginate_queryset(
     request,
     queryset,
     serializer_class: Type[Serializer],
     page: int,
     page_size: int = 10,
+    count: Optional[int] = None,
+    serializer_kwargs: Optional[dict] = None,
 ) -> Response:
     """
     Paginate a queryset and serialize the paginated data.
@@ -53,6 +237,10 @@ def paginate_queryset(
         serializer_class (Type[Serializer]): The serializer class used to serialize the queryset data.
         page (int): The page number to retrieve.
         page_size (int, optional): The number of items per page. Defaults to 10.
+        count (int, optional): The total number of items, when already known. Defaults to
+            a COUNT query on the queryset.
+        serializer_kwargs (dict, optional): Extra arguments for the serializer, such as
+            the `fields` of a sparse fieldset.
 
     Returns:
         Response: A DRF Response object containing the paginated and serialized data.
@@ -69,6 +257,9 @@ def paginate_queryset(
 
     # Create a paginator instance with the provided page_size
     paginator = Paginator(queryset, page_size)
+    if count is not None:
+        # Skip the COUNT query when the caller already knows the total
+        paginator.count = count
 
     try:
         # Get the paginated data for the requested page
@@ -78,16 +269,14 @@ def paginate_queryset(
         raise Http404("No items found on this page")
 
     # Serialize the paginated data
-    serializer = serializer_class(paginated_data, many=True).data
+    serializer = serializer_class(paginated_data, many=True, **(serializer_kwargs or {})).data
 
     # Determine the next page URL if there is a next page
     next_page_number = (
         paginated_data.next_page_number() if paginated_data.has_next() else None
     )
     if next_page_number:
-        current_path = request.path
-        next_url = f"{current_path}?page={next_page_number}"
-        full_next_url = request.build_absolute_uri(next_url)
+        full_next_url = _page_url(request, page=next_page_number)
     else:
         full_next_url = None
 
@@ -96,15 +285,13 @@ def paginate_queryset(
         paginated_data.previous_page_number() if paginated_data.has_previous() else None
     )
     if prev_page_number:
-        current_path = request.path
-        prev_url = f"{current_path}?page={prev_page_number}"
-        full_prev_url = request.build_absolute_uri(prev_url)
+        full_prev_url = _page_url(request, page=prev_page_number)
     else:
         full_prev_url = None
 
     # Include "next" and "previous" URLs at the top of the serialized data
     serializer_data = {
-        "count": len(queryset),  # Total number of items in the queryset
+        "count": paginator.count,  # Total number of items in the queryset
         "previous": full_prev_url,  # URL for the previous page, if any
         "next": full_next_url,  # URL for the next page, if any
         "results": serializer,  # Serialized paginated data
@@ -114,6 +301,66 @@ def paginate_queryset(
     return Response(serializer_data)
 
 
+def paginate_keyset(
+    request,
+    queryset,
+    serializer_class: Type[Serializer],
+    after: Optional[str] = None,
+    page_size: int = 10,
+    serializer_kwargs: Optional[dict] = None,
+) -> Response:
+    """
+    Paginate a queryset by primary key and serialize the page.
+
+    Unlike `paginate_queryset`, no COUNT or OFFSET is needed: each page is read with
+    `WHERE id > after ORDER BY id LIMIT page_size`, which stays fast on deep pages.
+    With time-ordered UUIDv7 ids this is also creation order.
+
+    Args:
+        request: The HTTP request object, used to build URLs.
+        queryset: The queryset to paginate. Querysets of `values()` dicts, including
+            combined (`union`) ones that the caller has already filtered with
+            `parse_keyset_after`, are supported too.
+        serializer_class (Type[Serializer]): The serializer class used to serialize the queryset data.
+        after (str, optional): The id of the last item of the previous page.
+        page_size (int, optional): The number of items per page. Defaults to 10.
+        serializer_kwargs (dict, optional): Extra arguments for the serializer, such as
+            the `fields` of a sparse fieldset.
+
+    Returns:
+        Response: A DRF Response object containing the serialized page and the next page URL.
+
+    Raises:
+        ValidationError: If `after` is not a valid id.
+    """
+    queryset = queryset.order_by("id")
+
+    after_id = parse_keyset_after(after)
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+
+    # Fetch one extra row to know whether there is a next page
+    items = list(queryset[: page_size + 1])
+    has_next = len(items) > page_size
+    items = items[:page_size]
+
+    if has_next:
+        last = items[-1]
+        full_next_url = _page_url(
+            request, after=last["id"] if isinstance(last, dict) else last.id
+        )
+    else:
+        full_next_url = None
+
+    return Response(
+        {
+            "next": full_next_url,  # URL for the next page, if any
+            # Serialized page data
+            "results": serializer_class(items, many=True, **(serializer_kwargs or {})).data,
+        }
+    )
+
+
 def remove_none_values(obj):
     """Remove none values from dict/list"""
 
@@ -131,7 +378,8 @@ def get_object_or_error(model, **kwargs):
     or raise appropriate error if the object is not found or multiple objects are found.
 
     Args:
-        model: The Django model class from which to retrieve the object.
+        model: The Django model class from which to retrieve the object, or a queryset of
+            it (e.g. restricted to some columns with `.only()`).
         **kwargs: Keyword arguments representing the filter criteria.
 
     Returns:
@@ -147,10 +395,14 @@ def get_object_or_error(model, **kwargs):
     Examples:
         >>> user = get_object_or_error(User, username='john_doe')
         >>> task = get_object_or_error(Task, id=42)
+        >>> task = get_object_or_error(Task.objects.only("id", "title"), id=42)
     """
+    queryset = model if isinstance(model, models.QuerySet) else model.objects
+    model = queryset.model
+
     try:
         # Attempt to retrieve a single object based on the provided filter criteria
-        return model.objects.get(**kwargs)
+        return queryset.get(**kwargs)
     except model.DoesNotExist as error:
         # If no object is found matching the criteria, raise NotFound error
         raise exceptions.NotFound(detail=f"{model.__name__} not found") from error
@@ -165,8 +417,261 @@ def get_object_or_error(model, **kwargs):
         raise error
 
 
+def supports_update_returning(connection) -> bool:
+    """
+    Whether a backend accepts `RETURNING` on UPDATE and DELETE statements.
+
+    `features.can_return_columns_from_insert` only covers INSERT: MariaDB sets it but
+    has no `UPDATE ... RETURNING`.
+    """
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def _execute_returning(model, db: str, query_sql: str, params):
+    """
+    Run an UPDATE/DELETE statement with a RETURNING clause for every concrete column.
+
+    Returns:
+        The affected object built from the returned row, or None if no row matched.
+    """
+    connection = connections[db]
+    fields = model._meta.concrete_fields
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"{query_sql} RETURNING {columns}", params)
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    # Apply the same backend and field converters the ORM uses when reading rows
+    values = []
+    for field, value in zip(fields, row):
+        expression = field.get_col(model._meta.db_table)
+        converters = connection.ops.get_db_converters(
+            expression
+        ) + expression.get_db_converters(connection)
+        for converter in converters:
+            value = converter(value, expression, connection)
+        values.append(value)
+
+    return model.from_db(db, [field.attname for field in fields], values)
+
+
+def update_object_or_error(model, values: dict, **kwargs):
+    """
+    Update a single object matching the filter criteria with one UPDATE statement,
+    or raise NotFound if no object matches.
+
+    Only the columns in `values` are written, and the row is never read beforehand, so
+    the filter criteria double as the ownership check. On backends that support
+    RETURNING (Postgres, SQLite >= 3.35) the updated row comes back from the same
+    statement; other backends lock, update and re-read the row in a transaction.
+
+    Args:
+        model: The Django model class of the object to update.
+        values (dict): Field names mapped to new values or expressions (e.g. `F("version") + 1`).
+        **kwargs: Keyword arguments representing the filter criteria.
+
+    Returns:
+        The updated object.
+
+    Raises:
+        NotFound: If no object matches the filter criteria.
+
+    Examples:
+        >>> task = update_object_or_error(Task, {"title": "New"}, id=task_id, user_id=user_id)
+    """
+    db = router.db_for_write(model)
+    queryset = model._default_manager.using(db).filter(**kwargs)
+
+    if supports_update_returning(connections[db]):
+        query = queryset.query.chain(UpdateQuery)
+        query.add_update_values(values)
+        query_sql, params = query.get_compiler(db).as_sql()
+        instance = _execute_returning(model, db, query_sql, params)
+    else:
+        # The filter may reference columns being updated (e.g. a version check),
+        # so lock the row by primary key and read it back from there
+        with transaction.atomic(using=db):
+            instance = queryset.select_for_update().first()
+            if instance is not None:
+                model._default_manager.using(db).filter(pk=instance.pk).update(**values)
+                instance.refresh_from_db()
+
+    if instance is None:
+        raise exceptions.NotFound(detail=f"{model.__name__} not found")
+
+    return instance
+
+
+def delete_object_or_error(model, **kwargs):
+    """
+    Delete a single object matching the filter criteria with one DELETE statement,
+    or raise NotFound if no object matches.
+
+    The deleted row is returned by the same statement on backends that support
+    RETURNING. Models with cascades or delete signals can't be deleted with a single
+    statement, so they go through Django's deletion collector instead. Either way the
+    model's `delete()` method is not called.
+
+    Args:
+        model: The Django model class of the object to delete.
+        **kwargs: Keyword arguments representing the filter criteria.
+
+    Returns:
+        The deleted object.
+
+    Raises:
+        NotFound: If no object matches the filter criteria.
+
+    Examples:
+        >>> task = delete_object_or_error(Task, id=task_id, user_id=user_id)
+    """
+    db = router.db_for_write(model)
+    queryset = model._default_manager.using(db).filter(**kwargs)
+
+    if supports_update_returning(connections[db]) and Collector(
+        using=db
+    ).can_fast_delete(queryset):
+        query = queryset.query.chain(DeleteQuery)
+        query_sql, params = query.get_compiler(db).as_sql()
+        instance = _execute_returning(model, db, query_sql, params)
+    else:
+        instance = queryset.first()
+        if instance is not None:
+            # Through the queryset, like the single statement: not `Model.delete()`,
+            # whose overrides (e.g. `Task.delete()` adjusting counters) the caller owns
+            model._default_manager.using(db).filter(pk=instance.pk).delete()
+
+    if instance is None:
+        raise exceptions.NotFound(detail=f"{model.__name__} not found")
+
+    return instance
+
+
+def get_if_match_version(request) -> Optional[int]:
+    """
+    Read the version a client expects from the request's `If-Match` header.
+
+    Versions are sent to clients as ETags (e.g. `"3"`). Compressed responses weaken them
+    (`W/"3"`), but the version they name is the same, so the weak form is accepted too.
+    A missing header or `*` places no constraint on the version.
+
+    Returns:
+        int or None: The expected version, or None when any version is acceptable.
+        An ETag that is not a version yields -1, which never matches.
+    """
+    if_match = request.headers.get("If-Match")
+    if not if_match:
+        return None
+
+    etags = parse_etags(if_match)
+    if "*" in etags:
+        return None
+
+    try:
+        return int(etags[0].removeprefix("W/").strip('"'))
+    except (IndexError, ValueError):
+        return -1
+
+
+def get_connection_id(request) -> Optional[str]:
+    """
+    Read the id of the client's websocket connection from the `X-Connection-Id` header.
+
+    Clients send the id they connected to `ws/tasks/` with, so the change a request makes
+    is not echoed back to that connection.
+
+    Returns:
+        str or None: The connection id, or None when missing or longer than 64 characters.
+    """
+    connection_id = request.headers.get("X-Connection-Id", "").strip()
+    if not connection_id or len(connection_id) > 64:
+        return None
+    return connection_id
+
+
+def is_conditional_request(request) -> bool:
+    """Whether a request asks to be answered with 304 Not Modified if nothing changed."""
+    return bool(
+        request.headers.get("If-None-Match") or request.headers.get("If-Modified-Since")
+    )
+
+
+def get_not_modified_response(
+    request, etag: Optional[str] = None, last_modified=None
+) -> Optional[HttpResponse]:
+    """
+    Answer a conditional GET from a resource fingerprint instead of the resource.
+
+    Args:
+        request: The HTTP request carrying `If-None-Match`/`If-Modified-Since`.
+        etag (str, optional): The current ETag of the resource, already quoted.
+        last_modified (datetime, optional): When the resource last changed.
+
+    Returns:
+        HttpResponse or None: A 304 (or 412) response when the client's copy is still
+        current, otherwise None and the resource should be served as usual.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        for header, value in get_conditional_headers(etag, last_modified).items():
+            response[header] = value
+    return response
+
+
+def get_conditional_headers(etag: Optional[str] = None, last_modified=None) -> dict:
+    """
+    Build `ETag` and `Last-Modified` response headers.
+
+    Args:
+        etag (str, optional): The ETag of the resource, already quoted.
+        last_modified (datetime, optional): When the resource last changed.
+
+    Returns:
+        dict: The headers to set on the response.
+    """
+    headers = {}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified.timestamp())
+    return headers
+
+
 def generate_user_tokens(user):
     """Generate JWT token to authenticate a user."""
 
     refresh = RefreshToken.for_user(user)
     return {"access": str(refresh.access_token), "refresh": str(refresh)}
+
+
+def get_rss() -> int:
+    """
+    Resident set size of the current process.
+
+    Reads `/proc/self/statm` where available (Linux). Elsewhere falls back to the peak
+    RSS reported by `getrusage`, which never decreases.
+
+    Returns:
+        int: The RSS in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource  # Unix only
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in kilobytes on Linux, in bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
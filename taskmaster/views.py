@@ -0,0 +1,68 @@
+"""Project-wide APIs"""
+
+from rest_framework import generics, status
+from rest_framework.response import Response
+
+from taskmaster.batch import dispatch_batch
+from taskmaster.permissions import IsAuthenticated, IsStaff
+from taskmaster.slow_queries import slow_query_log
+
+
+class BatchAPI(generics.GenericAPIView):
+    """
+    Endpoint for running several API calls in one request.
+
+    URL: /batch/
+
+    Requires authentication. The token is checked once, and each sub-request then runs
+    in-process as the authenticated user, without going through the middleware stack
+    again. Only the API's own (`/api/v1/`) endpoints can be batched.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Accepts POST requests with a list of sub-requests, e.g.
+        `{"requests": [{"method": "GET", "path": "/api/v1/tasks/"}], "parallel": true}`.
+
+        Returns:
+            - HTTP 200 OK: With the responses of the sub-requests, in order.
+            - HTTP 400 Bad Request: If the batch is malformed or too large.
+        """
+        return Response(
+            data=dispatch_batch(request, request.data),
+            status=status.HTTP_200_OK,
+        )
+
+
+class SlowQueriesAPI(generics.GenericAPIView):
+    """
+    Endpoint for the slow query log of the process serving the request.
+
+    URL: /slow-queries/
+
+    Restricted to staff users. Each worker process keeps its own log, so successive
+    requests may be answered by different workers.
+    """
+
+    permission_classes = [IsStaff]
+
+    def get(self, request):
+        """
+        Accepts GET requests for the slowest statements.
+
+        Returns:
+            - HTTP 200 OK: With the statements, the most total time first.
+        """
+        return Response(data=slow_query_log.entries(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        """
+        Accepts DELETE requests to empty the log, e.g. after adding an index.
+
+        Returns:
+            - HTTP 204 No Content: Once the log is empty.
+        """
+        slow_query_log.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,23 @@
+"""Gunicorn worker classes"""
+
+from uvicorn.workers import UvicornWorker
+
+
+class AsgiWorker(UvicornWorker):
+    """
+    Uvicorn worker serving `taskmaster.asgi:application`, HTTP and websockets alike.
+
+    Gunicorn manages the worker processes (scaling, restarts and graceful reloads on
+    SIGHUP) while each worker serves both protocols from one event loop, so websockets
+    scale across cores like HTTP does.
+    """
+
+    CONFIG_KWARGS = {
+        # uvloop and httptools when installed
+        "loop": "auto",
+        "http": "auto",
+        # Sans-IO websockets: about a third of the memory per socket of "websockets"
+        "ws": "wsproto",
+        # Django's ASGI handler doesn't implement the lifespan protocol
+        "lifespan": "off",
+    }
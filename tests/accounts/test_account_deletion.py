@@ -0,0 +1,67 @@
+"""Test account deletion"""
+
+import io
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+
+from accounts.models import AccountDeletion
+from accounts.services import AuthService
+from taskmanager.middlewares import get_user
+from taskmanager.models import Task, TaskCounter
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+class TestAccountDeletion:
+    """
+    Test suite for soft-deleting accounts and purging their data in chunks.
+    """
+
+    @pytest.fixture
+    def deleted_user(self, user_factory, task_factory):
+        """A deleted user who still owns five tasks."""
+        user = user_factory.create()
+        task_factory.create_batch(5, user=user)
+        AuthService.delete_user(user.id)
+        return user
+
+    def test_delete_user_disables_account(self, deleted_user, user_model):
+        """Deleting disables the user at once and leaves the data for the purge."""
+        user = user_model.objects.get(id=deleted_user.id)
+
+        assert not user.is_active
+        assert Task.objects.filter(user=user).count() == 5
+        assert AccountDeletion.objects.get(user_id=user.id).completed_at is None
+
+    def test_deleted_user_rejected_by_websocket_auth(self, deleted_user):
+        """Websocket authentication no longer resolves a deleted user."""
+        assert async_to_sync(get_user)(deleted_user.id) is None
+
+    def test_purge_is_chunked_and_resumable(self, deleted_user, user_model):
+        """A purge stopped after some chunks resumes where it left off."""
+        done = AuthService.purge_deleted_user(deleted_user.id, chunk_size=2, max_chunks=2)
+
+        assert not done
+        assert Task.objects.filter(user_id=deleted_user.id).count() == 1
+        assert AccountDeletion.objects.get(user_id=deleted_user.id).deleted_rows == 4
+
+        assert AuthService.purge_deleted_user(deleted_user.id, chunk_size=2)
+        assert not Task.objects.filter(user_id=deleted_user.id).exists()
+        assert not TaskCounter.objects.filter(user_id=deleted_user.id).exists()
+        assert not user_model.objects.filter(id=deleted_user.id).exists()
+
+        deletion = AccountDeletion.objects.get(user_id=deleted_user.id)
+        # Five tasks and the counter row
+        assert deletion.deleted_rows == 6
+        assert deletion.completed_at is not None
+
+    def test_purge_command(self, deleted_user, user_factory, user_model):
+        """The command purges pending deletions and leaves other accounts alone."""
+        other_user = user_factory.create()
+
+        call_command("purge_deleted_accounts", "--chunk-size", "2", stdout=io.StringIO())
+
+        assert not user_model.objects.filter(id=deleted_user.id).exists()
+        assert user_model.objects.filter(id=other_user.id).exists()
@@ -59,3 +59,12 @@ def created_user(db, user_factory):
     user = user_factory.create(password=password)
 
     return user, password
+
+
+@pytest.fixture
+def shared_channel_layer(settings):
+    """
+    Fixture leaving task events to the outbox relay, as with a shared channel layer,
+    instead of publishing them once committed.
+    """
+    settings.TASK_EVENTS_PUBLISH_ON_COMMIT = False
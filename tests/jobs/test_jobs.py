@@ -0,0 +1,156 @@
+"""Test the background job queue"""
+
+import io
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from accounts.models import AccountDeletion
+from accounts.services import AuthService
+from jobs.models import Job
+from jobs.registry import job
+from jobs.services import JobService
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+calls = []
+
+
+@job(name="tests.record")
+def record(value):
+    calls.append(value)
+
+
+@job(name="tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+def run_jobs(*args):
+    out = io.StringIO()
+    call_command("run_jobs", "--burst", *args, stdout=out)
+    return out.getvalue()
+
+
+class TestJobQueue:
+    """
+    Test suite for queueing, claiming and running background jobs.
+    """
+
+    def test_burst_runs_queued_jobs(self):
+        """A burst worker runs every queued job and exits."""
+        record.enqueue(value=1)
+        record.enqueue(value=2)
+
+        assert "2 jobs processed" in run_jobs("--concurrency", "0")
+        assert calls == [1, 2]
+        assert set(Job.objects.values_list("status", flat=True)) == {"DONE"}
+
+    def test_thread_pool(self):
+        """Jobs run on the thread pool and their outcome is recorded."""
+        for value in range(4):
+            record.enqueue(value=value)
+
+        run_jobs("--concurrency", "2")
+
+        assert sorted(calls) == [0, 1, 2, 3]
+        assert not Job.objects.filter(finished_at=None).exists()
+
+    def test_lanes_run_in_priority_order(self):
+        """Earlier lanes are drained before later ones, whatever the queueing order."""
+        record.enqueue(queue="low", value="low")
+        record.enqueue(queue="default", value="default")
+        record.enqueue(queue="high", value="high")
+
+        run_jobs("--concurrency", "0")
+
+        assert calls == ["high", "default", "low"]
+
+    def test_delayed_job_waits(self):
+        """A job does not run before its delay has passed."""
+        record.enqueue(delay=60, value=1)
+
+        run_jobs("--concurrency", "0")
+
+        assert calls == []
+        assert Job.objects.get().status == "QUEUED"
+
+    def test_failed_job_retried_with_backoff(self):
+        """A failing job is requeued with a backoff, then fails for good."""
+        fail.enqueue()
+
+        run_jobs("--concurrency", "0")
+
+        failed_job = Job.objects.get()
+        assert failed_job.status == "QUEUED"
+        assert failed_job.attempts == 1
+        assert failed_job.run_at > timezone.now()
+        assert "RuntimeError: boom" in failed_job.last_error
+
+        Job.objects.update(run_at=timezone.now())
+        run_jobs("--concurrency", "0")
+
+        failed_job.refresh_from_db()
+        assert failed_job.status == "FAILED"
+        assert failed_job.attempts == 2
+        assert failed_job.finished_at is not None
+
+    def test_retry_delay_grows_and_is_capped(self, settings):
+        """The backoff doubles per attempt, with jitter, up to the maximum."""
+        settings.JOB_RETRY_BASE_DELAY = 10
+        settings.JOB_RETRY_MAX_DELAY = 60
+
+        assert 5 <= JobService.retry_delay(1) <= 10
+        assert 20 <= JobService.retry_delay(3) <= 40
+        assert 30 <= JobService.retry_delay(10) <= 60
+
+    def test_expired_lease_is_reclaimed(self):
+        """A job whose worker died becomes visible again after the visibility timeout."""
+        record.enqueue(value=1)
+        claimed = JobService.claim(["default"], "dead-worker", visibility_timeout=60)
+
+        assert (
+            JobService.claim(["default"], "other-worker", visibility_timeout=60) is None
+        )
+
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = JobService.claim(["default"], "other-worker", visibility_timeout=60)
+
+        assert reclaimed.id == claimed.id
+        assert reclaimed.attempts == 2
+        # The dead worker can no longer run the job nor record an outcome
+        JobService.execute(claimed.id, "dead-worker")
+        assert calls == []
+        assert Job.objects.get().status == "RUNNING"
+
+    def test_unknown_job_rejected(self):
+        """Only registered jobs can be queued."""
+        with pytest.raises(LookupError):
+            JobService.enqueue("tests.missing")
+
+
+class TestAccountPurgeJob:
+    """
+    Test suite for purging deleted accounts in the background.
+    """
+
+    def test_delete_user_queues_purge(self, user_factory, task_factory, user_model):
+        """Deleting a user queues the purge, which a worker completes."""
+        user = user_factory.create()
+        task_factory.create_batch(3, user=user)
+
+        AuthService.delete_user(user.id)
+
+        assert Job.objects.get().name == "accounts.purge_deleted_user"
+
+        run_jobs("--concurrency", "0")
+
+        assert not user_model.objects.filter(id=user.id).exists()
+        assert AccountDeletion.objects.get(user_id=user.id).completed_at is not None
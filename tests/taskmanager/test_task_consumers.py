@@ -0,0 +1,360 @@
+"""Test the task websocket consumer"""
+
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.urls import reverse
+
+from taskmanager.consumers import (
+    CLOSE_IDLE,
+    CLOSE_SLOW,
+    AsyncTaskNotificationConsumer,
+    compile_event_filter,
+    connection_stats,
+)
+from taskmanager.events import send_task
+from taskmanager.models import Task, TaskEvent
+from tests.factories import TaskFactory
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def connect(user, path="/ws/tasks/"):
+    """Open a websocket as `user`, bypassing token authentication."""
+    communicator = WebsocketCommunicator(AsyncTaskNotificationConsumer.as_asgi(), path)
+    communicator.scope["user"] = user
+    return communicator
+
+
+async def exchange(communicator, *commands):
+    """Send commands and return their responses by id."""
+    for command in commands:
+        await communicator.send_json_to(command)
+    responses = [await communicator.receive_json_from(timeout=5) for _ in commands]
+    return {response.get("id"): response for response in responses}
+
+
+class TestTaskCommands:
+    """
+    Test suite for managing tasks with commands over the websocket.
+    """
+
+    def test_crud_commands(self, created_user):
+        """Each command is answered with the response carrying its id."""
+        user, _ = created_user
+
+        async def session():
+            communicator = connect(user)
+            await communicator.connect()
+
+            created = (
+                await exchange(
+                    communicator,
+                    {"id": "c", "command": "create", "data": {"title": "Over the socket"}},
+                )
+            )["c"]
+            task_id = created["data"]["id"]
+            # One command at a time: SQLite's shared cache locks tables between threads
+            responses = await exchange(
+                communicator,
+                {
+                    "id": "g",
+                    "command": "get",
+                    "data": {"task_id": task_id, "fields": ["title"]},
+                },
+            )
+            responses |= await exchange(
+                communicator,
+                {
+                    "id": "u",
+                    "command": "update",
+                    "data": {"task_id": task_id, "status_task": "DONE", "version": 1},
+                },
+            )
+            listed = (await exchange(communicator, {"id": "l", "command": "list"}))["l"]
+            deleted = (
+                await exchange(
+                    communicator,
+                    {"id": "d", "command": "delete", "data": {"task_id": task_id}},
+                )
+            )["d"]
+            await communicator.disconnect()
+            return created, responses, listed, deleted
+
+        created, responses, listed, deleted = async_to_sync(session)()
+
+        assert created["status"] == 201
+        assert responses["g"]["data"] == {"title": "Over the socket"}
+        assert responses["u"]["data"]["status_task"] == "DONE"
+        assert [task["id"] for task in listed["data"]["results"]] == [created["data"]["id"]]
+        assert listed["data"]["after"] is None
+        assert deleted["status"] == 200
+        assert not Task.objects.exists()
+        # Mutations still notify the user's other devices through the outbox
+        assert TaskEvent.objects.count() == 3
+
+    def test_command_errors(self, created_user):
+        """Errors are reported with their HTTP status, correlated by id."""
+        user, _ = created_user
+        task = TaskFactory.create(user=user)
+        other_task = TaskFactory.create()
+
+        async def session():
+            communicator = connect(user)
+            await communicator.connect()
+            responses = await exchange(
+                communicator,
+                {"id": 1, "command": "get", "data": {"task_id": str(other_task.id)}},
+                {"id": 2, "command": "get", "data": {"task_id": "not-an-id"}},
+                {"id": 3, "command": "explode"},
+                {"id": 4, "command": "create", "data": {"title": ""}},
+                {
+                    "id": 5,
+                    "command": "update",
+                    "data": {"task_id": str(task.id), "title": "x", "version": "one"},
+                },
+                {
+                    "id": 6,
+                    "command": "delete",
+                    "data": {"task_id": str(task.id), "version": [1]},
+                },
+            )
+            await communicator.disconnect()
+            return responses
+
+        responses = async_to_sync(session)()
+
+        assert responses[1]["status"] == 404
+        assert responses[2]["status"] == 400
+        assert responses[3]["status"] == 400
+        assert responses[4]["status"] == 400
+        assert "title" in responses[4]["error"]
+        # Malformed versions are validation errors, not server errors
+        assert responses[5]["status"] == 400
+        assert responses[6]["status"] == 400
+        assert "version" in responses[5]["error"]
+
+    def test_in_flight_limit(self, created_user, settings):
+        """Commands beyond the in-flight limit are refused."""
+        settings.WS_MAX_IN_FLIGHT = 0
+        user, _ = created_user
+
+        async def session():
+            communicator = connect(user)
+            await communicator.connect()
+            responses = await exchange(communicator, {"id": "x", "command": "list"})
+            await communicator.disconnect()
+            return responses
+
+        assert async_to_sync(session)()["x"]["status"] == 429
+
+
+class TestTaskSubscriptions:
+    """
+    Test suite for filtering task notifications per connection.
+    """
+
+    def test_compile_event_filter(self):
+        """Only the given criteria are checked, including the previous status."""
+        assert compile_event_filter() is None
+
+        in_progress = compile_event_filter(statuses=frozenset({"IN PROGRESS"}))
+        assert in_progress({"status_task": "IN PROGRESS", "action": "task_create"})
+        assert in_progress({"status_task": "DONE", "previous_status": "IN PROGRESS"})
+        assert not in_progress({"status_task": "DONE", "action": "task_update"})
+
+        deletes_of_one_task = compile_event_filter(
+            task_ids=frozenset({"a"}), actions=frozenset({"task_delete"})
+        )
+        assert deletes_of_one_task({"id": "a", "action": "task_delete"})
+        assert not deletes_of_one_task({"id": "a", "action": "task_update"})
+        assert not deletes_of_one_task({"id": "b", "action": "task_delete"})
+
+    def test_subscription_filters_events(self, created_user):
+        """Events outside the subscription are never sent to the socket."""
+        user, _ = created_user
+        group_name = f"user_{user.id}_task_stream"
+
+        async def session():
+            communicator = connect(user)
+            await communicator.connect()
+            subscribed = await exchange(
+                communicator,
+                {
+                    "id": "s",
+                    "command": "subscribe",
+                    "data": {"statuses": ["IN PROGRESS"]},
+                },
+            )
+            for status_task in ("TO DO", "DONE", "IN PROGRESS"):
+                await send_task(group_name, {"id": status_task, "status_task": status_task})
+            received = await communicator.receive_json_from(timeout=5)
+            nothing_else = await communicator.receive_nothing()
+
+            await exchange(communicator, {"id": "u", "command": "unsubscribe"})
+            await send_task(group_name, {"id": "any", "status_task": "DONE"})
+            unfiltered = await communicator.receive_json_from(timeout=5)
+            await communicator.disconnect()
+            return subscribed, received, nothing_else, unfiltered
+
+        subscribed, received, nothing_else, unfiltered = async_to_sync(session)()
+
+        assert subscribed["s"]["data"] == {"statuses": ["IN PROGRESS"]}
+        assert received["id"] == "IN PROGRESS"
+        assert nothing_else
+        assert unfiltered["id"] == "any"
+
+    def test_invalid_subscription(self, created_user):
+        """Unknown statuses, actions or malformed ids are rejected."""
+        user, _ = created_user
+
+        async def session():
+            communicator = connect(user)
+            await communicator.connect()
+            responses = await exchange(
+                communicator,
+                {"id": 1, "command": "subscribe", "data": {"statuses": ["LATER"]}},
+                {"id": 2, "command": "subscribe", "data": {"task_ids": ["nope"]}},
+                {"id": 3, "command": "subscribe", "data": {"actions": "task_create"}},
+            )
+            await communicator.disconnect()
+            return responses
+
+        responses = async_to_sync(session)()
+
+        assert {response["status"] for response in responses.values()} == {400}
+
+
+class TestEchoSuppression:
+    """
+    Test suite for not echoing a connection's own changes back to it.
+    """
+
+    def test_rest_mutation_not_echoed(self, api_client, created_user):
+        """A REST change naming a connection is stored with it as the event origin."""
+        user, _ = created_user
+        api_client.force_authenticate(user=user)
+
+        response = api_client.post(
+            reverse("create_task"),
+            data={"title": "From REST", "description": ""},
+            format="json",
+            HTTP_X_CONNECTION_ID="tab-1",
+        )
+
+        assert response.status_code == 201
+        assert TaskEvent.objects.get().origin == "tab-1"
+
+    def test_origin_connection_skipped(self, created_user):
+        """Only the connection that caused an event doesn't receive it."""
+        user, _ = created_user
+        group_name = f"user_{user.id}_task_stream"
+
+        async def session():
+            origin = connect(user, "/ws/tasks/?connection_id=tab-1")
+            other = connect(user, "/ws/tasks/?connection_id=tab-2")
+            await origin.connect()
+            await other.connect()
+
+            await send_task(group_name, {"id": "a"}, origin="tab-1")
+            received = await other.receive_json_from(timeout=5)
+            nothing = await origin.receive_nothing()
+
+            created = await exchange(
+                origin, {"id": "c", "command": "create", "data": {"title": "Own"}}
+            )
+            await origin.disconnect()
+            await other.disconnect()
+            return received, nothing, created
+
+        received, nothing, created = async_to_sync(session)()
+
+        assert received == {"id": "a"}
+        assert nothing
+        assert created["c"]["status"] == 201
+        assert TaskEvent.objects.get().origin == "tab-1"
+
+
+async def receive_close(communicator):
+    """Skip frames until the server closes the socket and return the close code."""
+    while True:
+        output = await communicator.receive_output(timeout=5)
+        if output["type"] == "websocket.close":
+            return output.get("code")
+
+
+class TestConnectionHealth:
+    """
+    Test suite for heartbeats and evicting idle or slow websocket clients.
+    """
+
+    def test_heartbeat(self, created_user, settings):
+        """The server answers pings and pings clients that went quiet."""
+        user, _ = created_user
+        settings.WS_PING_INTERVAL = 0.1
+
+        async def session():
+            communicator = connect(user)
+            await communicator.connect()
+            await communicator.send_json_to({"type": "ping"})
+            pong = await communicator.receive_json_from(timeout=5)
+            ping = await communicator.receive_json_from(timeout=5)
+            await communicator.send_json_to({"type": "pong"})
+            nothing = await communicator.receive_nothing(timeout=0.05)
+            await communicator.disconnect()
+            return pong, ping, nothing
+
+        pong, ping, nothing = async_to_sync(session)()
+
+        assert pong == {"type": "pong"}
+        assert ping == {"type": "ping"}
+        assert nothing
+
+    def test_idle_client_evicted(self, created_user, settings):
+        """A client that sends nothing, pongs included, is closed."""
+        user, _ = created_user
+        settings.WS_PING_INTERVAL = 0.05
+        settings.WS_IDLE_TIMEOUT = 0.2
+        connection_stats.reset()
+
+        async def session():
+            communicator = connect(user)
+            await communicator.connect()
+            code = await receive_close(communicator)
+            await communicator.disconnect()
+            return code
+
+        assert async_to_sync(session)() == CLOSE_IDLE
+        assert connection_stats.snapshot()["evicted"]["idle"] == 1
+        assert connection_stats.open == 0
+
+    def test_slow_client_evicted(self, created_user, settings, monkeypatch):
+        """A client whose send queue overflows is closed and its queue released."""
+        user, _ = created_user
+        group_name = f"user_{user.id}_task_stream"
+        settings.WS_SEND_QUEUE_SIZE = 2
+        connection_stats.reset()
+
+        async def stalled_send(self, text_data=None, bytes_data=None, close=False):
+            await asyncio.sleep(3600)
+
+        # The client never reads: writing the first frame blocks forever
+        monkeypatch.setattr(AsyncTaskNotificationConsumer, "send", stalled_send)
+
+        async def session():
+            communicator = connect(user)
+            await communicator.connect()
+            for index in range(5):
+                await send_task(group_name, {"id": index})
+            code = await receive_close(communicator)
+            stats = connection_stats.snapshot()
+            await communicator.disconnect()
+            return code, stats
+
+        code, stats = async_to_sync(session)()
+
+        assert code == CLOSE_SLOW
+        assert stats["evicted"]["slow"] == 1
+        assert stats["queued_frames"] == stats["queued_bytes"] == 0
@@ -1,7 +1,15 @@
 """Test task endpoints"""
 
+import io
+from datetime import timedelta
+
 import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
 
 from taskmanager.models import Task
@@ -118,3 +126,245 @@ class TestTaskEndpoints:
         # Assertions to check if the tasks were listed successfully
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data["results"]) == len(tasks)
+
+    def test_list_tasks_keyset_pagination(self, api_client, created_user):
+        """
+        Test walking the task list with keyset pagination.
+
+        Input parameters:
+            api_client: A fixture that provides an instance of Django's test client.
+            created_user: A fixture that provides a tuple with a user and its plain password.
+        """
+        user, _ = created_user
+        tasks = TaskFactory.create_batch(12, user=user)
+        api_client.force_authenticate(user=user)
+
+        # Start from the first task and follow the `next` links
+        response = api_client.get(reverse("list_tasks"), {"after": ""})
+        first_page = response.data["results"]
+        response = api_client.get(response.data["next"])
+        second_page = response.data["results"]
+
+        # Assertions to check that pages are ordered by id and cover every task once
+        assert len(first_page) == 10
+        assert response.data["next"] is None
+        assert [item["id"] for item in first_page + second_page] == sorted(
+            str(task.id) for task in tasks
+        )
+
+    def test_update_task_if_match(self, api_client, task, created_user):
+        """
+        Test optimistic concurrency on task updates.
+
+        Input parameters:
+            api_client: A fixture that provides an instance of Django's test client.
+            task: A fixture from `tests/factories` that creates a task instance.
+            created_user: A fixture that provides a tuple with a user and its plain password.
+        """
+        url = reverse("retrieve_update_delete_task", args=[task.id])
+        user, _ = created_user
+        api_client.force_authenticate(user=user)
+
+        # Both devices read the task and get the same ETag
+        etag = api_client.get(url)["ETag"]
+
+        # The first device updates the task with the ETag it read
+        response = api_client.put(
+            url, data={"title": "First"}, format="json", HTTP_IF_MATCH=etag
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+        # The second device's update with the stale ETag is rejected
+        response = api_client.put(
+            url, data={"title": "Second"}, format="json", HTTP_IF_MATCH=etag
+        )
+        assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+        assert Task.objects.get(id=task.id).title == "First"
+
+        # A stale delete is rejected as well
+        response = api_client.delete(url, HTTP_IF_MATCH=etag)
+        assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+        assert Task.objects.filter(id=task.id).exists()
+
+    def test_retrieve_task_not_modified(
+        self, api_client, task, created_user, django_assert_num_queries
+    ):
+        """
+        Test revalidating a cached task with If-None-Match.
+
+        Input parameters:
+            api_client: A fixture that provides an instance of Django's test client.
+            task: A fixture from `tests/factories` that creates a task instance.
+            created_user: A fixture that provides a tuple with a user and its plain password.
+            django_assert_num_queries: A pytest-django fixture that counts database queries.
+        """
+        url = reverse("retrieve_update_delete_task", args=[task.id])
+        user, _ = created_user
+        api_client.force_authenticate(user=user)
+        etag = api_client.get(url)["ETag"]
+
+        # An unchanged task is answered from a single fingerprint query
+        with django_assert_num_queries(1):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not response.content
+
+        # After an update the full task is served again
+        api_client.put(url, data={"title": "Changed"}, format="json")
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["title"] == "Changed"
+
+    def test_list_tasks_not_modified(self, api_client, created_user):
+        """
+        Test revalidating a cached task list with If-None-Match.
+
+        Input parameters:
+            api_client: A fixture that provides an instance of Django's test client.
+            created_user: A fixture that provides a tuple with a user and its plain password.
+        """
+        user, _ = created_user
+        TaskFactory.create_batch(3, user=user)
+        url = reverse("list_tasks")
+        api_client.force_authenticate(user=user)
+        etag = api_client.get(url)["ETag"]
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        # A new task changes the fingerprint
+        TaskFactory.create(user=user)
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 4
+
+    def test_list_tasks_not_modified_after_delete(self, api_client, created_user):
+        """
+        Test that deleting a task, not the newest one, invalidates cached lists.
+
+        Input parameters:
+            api_client: A fixture that provides an instance of Django's test client.
+            created_user: A fixture that provides a tuple with a user and its plain password.
+        """
+        user, _ = created_user
+        older, _ = TaskFactory.create_batch(2, user=user)
+        url = reverse("list_tasks")
+        api_client.force_authenticate(user=user)
+        response = api_client.get(url)
+        etag = response["ETag"]
+
+        # A list has no modification date to revalidate with
+        assert "Last-Modified" not in response
+
+        api_client.delete(reverse("retrieve_update_delete_task", args=[older.id]))
+        since = http_date((timezone.now() + timedelta(minutes=1)).timestamp())
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        assert response.status_code == status.HTTP_200_OK
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 1
+
+    def test_task_summary(self, api_client, created_user):
+        """
+        Test retrieving the number of tasks in each status.
+
+        Input parameters:
+            api_client: A fixture that provides an instance of Django's test client.
+            created_user: A fixture that provides a tuple with a user and its plain password.
+        """
+        user, _ = created_user
+        TaskFactory.create_batch(2, user=user)
+        TaskFactory.create(user=user, status_task="DONE")
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(reverse("task_summary"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {
+            "TO DO": 2,
+            "IN PROGRESS": 0,
+            "DONE": 1,
+            "archived": 0,
+            "total": 3,
+        }
+
+        # The list total comes from the same counters
+        assert api_client.get(reverse("list_tasks")).data["count"] == 3
+
+    def test_list_tasks_include_archived(self, api_client, created_user):
+        """
+        Test listing tasks together with archived ones.
+
+        Input parameters:
+            api_client: A fixture that provides an instance of Django's test client.
+            created_user: A fixture that provides a tuple with a user and its plain password.
+        """
+        user, _ = created_user
+        tasks = TaskFactory.create_batch(12, user=user, status_task="DONE")
+        Task.objects.filter(id__in=[task.id for task in tasks[:5]]).update(
+            last_updated=timezone.now() - timedelta(days=365)
+        )
+        call_command("archive_tasks", "--days", "30", stdout=io.StringIO())
+        api_client.force_authenticate(user=user)
+        url = reverse("list_tasks")
+
+        # Archived tasks are left out by default
+        assert api_client.get(url).data["count"] == 7
+
+        # Page pagination keeps the flag in its links
+        response = api_client.get(url, {"include_archived": "true"})
+        assert response.data["count"] == 12
+        assert "include_archived=true" in response.data["next"]
+        second_page = api_client.get(response.data["next"]).data["results"]
+        assert len(response.data["results"]) + len(second_page) == 12
+
+        # Keyset pagination walks both tables in id order
+        response = api_client.get(url, {"include_archived": "true", "after": ""})
+        first_page = response.data["results"]
+        second_page = api_client.get(response.data["next"]).data["results"]
+        assert [item["id"] for item in first_page + second_page] == sorted(
+            str(task.id) for task in tasks
+        )
+        assert {item["status_task"] for item in first_page + second_page} == {"DONE"}
+
+    def test_sparse_fieldsets(self, api_client, created_user):
+        """
+        Test restricting task responses and queries to the requested fields.
+
+        Input parameters:
+            api_client: A fixture that provides an instance of Django's test client.
+            created_user: A fixture that provides a tuple with a user and its plain password.
+        """
+        user, _ = created_user
+        tasks = TaskFactory.create_batch(12, user=user)
+        api_client.force_authenticate(user=user)
+        fields = {"fields": "id,title,status_task"}
+
+        # The description column is neither read nor returned
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(reverse("list_tasks"), fields)
+        assert response.status_code == status.HTTP_200_OK
+        assert all(
+            item.keys() == {"id", "title", "status_task"}
+            for item in response.data["results"]
+        )
+        assert "fields=id%2Ctitle%2Cstatus_task" in response.data["next"]
+        assert not any("description" in query["sql"] for query in queries.captured_queries)
+
+        # Keyset pages and the archive union are pruned as well
+        for params in ({"after": ""}, {"include_archived": "true"}):
+            response = api_client.get(reverse("list_tasks"), {**fields, **params})
+            assert response.data["results"][0].keys() == {"id", "title", "status_task"}
+
+        # A single task keeps its ETag
+        url = reverse("retrieve_update_delete_task", args=[tasks[0].id])
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url, {"fields": "title"})
+        assert response.data == {"title": tasks[0].title}
+        assert response["ETag"] == '"1"'
+        assert not any("description" in query["sql"] for query in queries.captured_queries)
+
+        # Unknown (or write-only) fields are rejected
+        response = api_client.get(reverse("list_tasks"), {"fields": "title,user"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,177 @@
+"""Test the task event outbox"""
+
+import io
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.utils import timezone
+
+from taskmanager import events
+from taskmanager.models import Task, TaskEvent
+from taskmanager.services import TaskService
+
+pytestmark = [
+    pytest.mark.django_db(transaction=True),
+    pytest.mark.usefixtures("shared_channel_layer"),
+]
+
+
+class TestTaskEventOutbox:
+    """
+    Test suite for writing task events to the outbox and relaying them.
+    """
+
+    def test_event_written_with_task(self, created_user):
+        """Creating a task writes its event to the outbox instead of publishing it."""
+        user, _ = created_user
+
+        data = TaskService.create_task(user.id, "Outboxed", "")
+
+        event = TaskEvent.objects.get()
+        assert event.group_name == f"user_{user.id}_task_stream"
+        assert event.payload["id"] == data["id"]
+        assert event.payload["action"] == "task_create"
+        assert event.delivered_at is None
+
+    def test_event_rolled_back_with_task(self, created_user):
+        """An event is never left behind for a change that was rolled back."""
+        user, _ = created_user
+
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                TaskService.create_task(user.id, "Rolled back", "")
+                raise RuntimeError
+
+        assert not Task.objects.exists()
+        assert not TaskEvent.objects.exists()
+
+    def test_relay_publishes_in_order(self, task):
+        """The relay publishes pending events in order and marks them delivered."""
+        TaskService.update_task(task.user_id, task.id, title="First")
+        TaskService.update_task(task.user_id, task.id, title="Second")
+        channel_layer = get_channel_layer()
+
+        async def relay_and_receive():
+            channel = await channel_layer.new_channel()
+            await channel_layer.group_add(f"user_{task.user_id}_task_stream", channel)
+            stats = await sync_to_async(events.relay_events)(batch_size=10)
+            messages = [await channel_layer.receive(channel) for _ in range(2)]
+            return stats, messages
+
+        stats, messages = async_to_sync(relay_and_receive)()
+
+        assert stats["relayed"] == 2
+        assert stats["max_lag"] >= stats["avg_lag"] >= 0
+        assert [message["message"]["title"] for message in messages] == ["First", "Second"]
+        assert not TaskEvent.objects.filter(delivered_at__isnull=True).exists()
+        assert events.relay_events()["relayed"] == 0
+
+    def test_failed_publish_released(self, task, monkeypatch):
+        """A batch that fails to publish is released for the next relay."""
+        TaskService.update_task(task.user_id, task.id, title="Retried")
+
+        async def fail(events):
+            raise ConnectionError
+
+        monkeypatch.setattr(events, "_publish", fail)
+        with pytest.raises(ConnectionError):
+            events.relay_events()
+
+        assert TaskEvent.objects.get().claimed_until is None
+        monkeypatch.undo()
+        assert events.relay_events()["relayed"] == 1
+
+    def test_claimed_events_skipped(self, task):
+        """Events claimed by a relay that died are retried once the claim expires."""
+        TaskService.update_task(task.user_id, task.id, title="Claimed")
+        TaskEvent.objects.update(claimed_until=timezone.now() + timedelta(seconds=30))
+
+        assert events.relay_events()["relayed"] == 0
+
+        TaskEvent.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        assert events.relay_events()["relayed"] == 1
+        assert TaskEvent.objects.get().claimed_until is None
+
+    def test_published_on_commit_without_shared_layer(self, task, settings):
+        """Without a shared channel layer, events are published once committed."""
+        settings.TASK_EVENTS_PUBLISH_ON_COMMIT = True
+        channel_layer = get_channel_layer()
+
+        async def update_and_receive():
+            channel = await channel_layer.new_channel()
+            await channel_layer.group_add(f"user_{task.user_id}_task_stream", channel)
+            await sync_to_async(TaskService.update_task)(
+                task.user_id, task.id, title="Inline"
+            )
+            return await channel_layer.receive(channel)
+
+        message = async_to_sync(update_and_receive)()
+
+        assert message["message"]["title"] == "Inline"
+        assert TaskEvent.objects.get().delivered_at is not None
+
+    def test_relay_requires_shared_layer(self, task, settings):
+        """Without a shared channel layer the relay refuses to run."""
+        settings.TASK_EVENTS_PUBLISH_ON_COMMIT = True
+        TaskEvent.objects.create(group_name="user_1_task_stream", payload={})
+
+        with pytest.raises(ImproperlyConfigured):
+            events.relay_events()
+        with pytest.raises(CommandError):
+            call_command("relay_task_events", "--once", stdout=io.StringIO())
+
+        assert TaskEvent.objects.get().delivered_at is None
+
+    def test_group_in_flight_held_back(self, task):
+        """Later events of a group wait for its claimed batch, other groups don't."""
+        claimed = TaskEvent.objects.create(
+            group_name="user_1_task_stream",
+            payload={},
+            claimed_until=timezone.now() + timedelta(seconds=30),
+        )
+        TaskEvent.objects.create(group_name="user_1_task_stream", payload={})
+        other = TaskEvent.objects.create(group_name="user_2_task_stream", payload={})
+
+        assert events.relay_events()["relayed"] == 1
+        assert TaskEvent.objects.get(delivered_at__isnull=False) == other
+
+        claimed.claimed_until = timezone.now() - timedelta(seconds=1)
+        claimed.save(update_fields=["claimed_until"])
+        assert events.relay_events()["relayed"] == 2
+
+    def test_prune_delivered_events(self, task):
+        """Only events delivered before the cutoff are pruned."""
+        TaskService.update_task(task.user_id, task.id, title="Old")
+        events.relay_events()
+        TaskService.update_task(task.user_id, task.id, title="Pending")
+
+        pruned = events.prune_events(timezone.now() + timedelta(seconds=1))
+
+        assert pruned == 1
+        assert TaskEvent.objects.get().payload["title"] == "Pending"
+        assert events.pending_events()["pending"] == 1
+
+    def test_relay_command_once(self, task):
+        """`relay_task_events --once` drains the outbox and exits."""
+        TaskService.update_task(task.user_id, task.id, title="Relayed")
+        out = io.StringIO()
+
+        call_command("relay_task_events", "--once", stdout=out)
+
+        assert "1 events relayed" in out.getvalue()
+        assert not TaskEvent.objects.filter(delivered_at__isnull=True).exists()
+
+    def test_status_change_event_carries_previous_status(self, task):
+        """Status changes and deletes carry the statuses subscriptions filter on."""
+        TaskService.update_task(task.user_id, task.id, status_task="DONE")
+        TaskService.delete_task(task.user_id, task.id)
+
+        update, delete = TaskEvent.objects.order_by("id")
+        assert update.payload["status_task"] == "DONE"
+        assert update.payload["previous_status"] == "TO DO"
+        assert delete.payload["status_task"] == "DONE"
@@ -1,5 +1,6 @@
 import pytest
 from django.core.exceptions import ValidationError
+from django.db import connection
 from taskmanager.models import Task
 
 
@@ -108,3 +109,29 @@ class TestTaskModel:
 
         # Assert that the default status is 'TO DO'
         assert task.status_task == "TO DO"
+
+    def test_task_status_stored_as_code(self, task_factory):
+        """
+        Test that statuses are stored as integer codes but read and filtered as strings.
+        Input parameter:
+            task_factory: A fixture from `tests/factories` that creates task instances.
+        """
+        # Create a task that is done
+        task = task_factory.create(status_task="DONE")
+
+        # The column holds the code. The id is adapted as the backend stores UUIDs
+        task_id = Task._meta.pk.get_db_prep_value(task.id, connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT status_task FROM taskmanager_task WHERE id = %s", [task_id]
+            )
+            assert cursor.fetchone()[0] == Task.STATUS_CODES["DONE"]
+
+        # Queries take and return the string values
+        assert Task.objects.get(id=task.id).status_task == "DONE"
+        assert Task.objects.filter(status_task="DONE").count() == 1
+        assert list(Task.objects.values_list("status_task", flat=True)) == ["DONE"]
+
+        # Unknown statuses are rejected in lookups too
+        with pytest.raises(ValueError):
+            Task.objects.filter(status_task="INVALID STATUS").count()
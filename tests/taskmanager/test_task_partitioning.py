@@ -0,0 +1,103 @@
+"""Test the task table partitioning migration"""
+
+import importlib
+
+import pytest
+from django.apps import apps
+from django.db import connection
+
+from tests.factories import TaskFactory
+
+migration = importlib.import_module("taskmanager.migrations.0009_partition_task")
+
+
+class RecordingSchemaEditor:
+    """Collects the statements a migration would execute."""
+
+    def __init__(self):
+        self.statements = []
+        self.connection = connection
+
+    def quote_name(self, name):
+        return f'"{name}"'
+
+    def execute(self, sql):
+        self.statements.append(sql)
+
+
+class TestTaskPartitioning:
+    """
+    Test suite for migration `0009_partition_task`.
+    """
+
+    def test_partitioned_rebuild(self):
+        """The partitioned table is keyed on (id, user_id) with one table per remainder."""
+        editor = RecordingSchemaEditor()
+
+        migration.rebuild_task_table(editor, "accounts_user", partitions=4)
+
+        sql = "\n".join(editor.statements)
+        assert "PARTITION BY HASH (user_id)" in sql
+        assert '"taskmanager_task_pkey" PRIMARY KEY (id, user_id)' in sql
+        assert sql.count("PARTITION OF") == 4
+        assert "FOR VALUES WITH (MODULUS 4, REMAINDER 3)" in sql
+        # Rows are copied before the staging table is dropped
+        assert sql.index("INSERT INTO") < sql.index("DROP TABLE")
+
+    def test_unpartitioned_rebuild(self):
+        """Rebuilding with no partitions restores a plain table keyed on id."""
+        editor = RecordingSchemaEditor()
+
+        migration.rebuild_task_table(editor, "accounts_user", partitions=0)
+
+        sql = "\n".join(editor.statements)
+        assert "PARTITION" not in sql
+        assert '"taskmanager_task_pkey" PRIMARY KEY (id)' in sql
+        assert "user_id DROP NOT NULL" in sql
+        # The old table's primary key and index give up their names first
+        assert sql.index("RENAME TO") < sql.index("CREATE TABLE")
+
+    @pytest.mark.django_db
+    @pytest.mark.skipif(connection.vendor != "sqlite", reason="SQLite only")
+    def test_sqlite_is_left_alone(self, settings):
+        """On SQLite the migration does nothing, whatever the setting."""
+        settings.TASK_PARTITIONS = 8
+        editor = RecordingSchemaEditor()
+
+        migration.partition_task_table(None, editor)
+
+        assert editor.statements == []
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.skipif(connection.vendor != "postgresql", reason="Postgres only")
+    def test_partition_round_trip(self, settings, created_user):
+        """Partitioning and unpartitioning keep the rows, names and nullability."""
+        settings.TASK_PARTITIONS = 4
+        user, _ = created_user
+        TaskFactory.create_batch(3, user=user)
+
+        def describe():
+            with connection.cursor() as cursor:
+                partitioned = migration.is_partitioned(cursor)
+                cursor.execute(
+                    "SELECT conname FROM pg_constraint "
+                    "WHERE conrelid = %s::regclass AND contype = 'p'",
+                    [migration.TABLE],
+                )
+                primary_key = cursor.fetchone()[0]
+                cursor.execute(
+                    "SELECT is_nullable FROM information_schema.columns "
+                    "WHERE table_name = %s AND column_name = 'user_id'",
+                    [migration.TABLE],
+                )
+                nullable = cursor.fetchone()[0] == "YES"
+                cursor.execute(f"SELECT count(*) FROM {migration.TABLE}")
+                return partitioned, primary_key, nullable, cursor.fetchone()[0]
+
+        with connection.schema_editor() as editor:
+            migration.partition_task_table(apps, editor)
+        assert describe() == (True, "taskmanager_task_pkey", False, 3)
+
+        with connection.schema_editor() as editor:
+            migration.unpartition_task_table(apps, editor)
+        assert describe() == (False, "taskmanager_task_pkey", True, 3)
@@ -0,0 +1,285 @@
+"""Test task services"""
+
+import io
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import exceptions
+
+from taskmanager.models import ArchivedTask, Task, TaskCounter
+from taskmanager.services import TaskService
+
+pytestmark = [
+    pytest.mark.django_db(transaction=True),
+    pytest.mark.usefixtures("shared_channel_layer"),
+]
+
+
+def _statements(context) -> list:
+    """SQL of the captured queries, without transaction control statements."""
+    return [
+        query["sql"]
+        for query in context.captured_queries
+        if not query["sql"].startswith(("BEGIN", "SAVEPOINT", "RELEASE", "COMMIT"))
+    ]
+
+
+class TestTaskService:
+    """
+    Test suite for the `TaskService` write paths.
+    Each test case uses fixtures from the `tests/factories` module.
+    """
+
+    def test_update_task_status_reads_old_status(self, task):
+        """A status change locks the row to read the status it replaces, then issues
+        one UPDATE ... RETURNING, the counter update and the outbox event."""
+        with CaptureQueriesContext(connection) as context:
+            data = TaskService.update_task(task.user_id, task.id, status_task="DONE")
+
+        statements = _statements(context)
+        assert len(statements) == 4
+        assert statements[0].startswith('SELECT "taskmanager_task"."status_task"')
+        assert statements[1].startswith("UPDATE")
+        assert statements[2].startswith('UPDATE "taskmanager_taskcounter"')
+        assert statements[3].startswith('INSERT INTO "taskmanager_taskevent"')
+        assert "description" not in statements[1].split("RETURNING")[0]
+        assert data["status_task"] == "DONE"
+        assert TaskService.get_task_summary(task.user_id)["DONE"] == 1
+        assert TaskService.get_task_summary(task.user_id)["TO DO"] == 0
+
+    def test_update_task_title_is_single_statement(self, task):
+        """An update without a status change issues one UPDATE ... RETURNING (plus the
+        outbox event) and writes only the given columns."""
+        with CaptureQueriesContext(connection) as context:
+            data = TaskService.update_task(task.user_id, task.id, title="Renamed")
+
+        statements = _statements(context)
+        assert len(statements) == 2
+        assert statements[0].startswith("UPDATE")
+        assert statements[1].startswith('INSERT INTO "taskmanager_taskevent"')
+        assert "description" not in statements[0].split("RETURNING")[0]
+        assert data["title"] == "Renamed"
+        assert data["status_task"] == task.status_task
+        assert Task.objects.get(id=task.id).title == "Renamed"
+
+    def test_update_and_delete_without_returning(self, task, monkeypatch):
+        """Backends without UPDATE/DELETE ... RETURNING (such as MariaDB, which only
+        returns columns from INSERT) lock and re-read the row instead."""
+        monkeypatch.setattr(connection, "vendor", "mysql")
+
+        with CaptureQueriesContext(connection) as context:
+            data = TaskService.update_task(task.user_id, task.id, status_task="DONE")
+            TaskService.delete_task(task.user_id, task.id)
+
+        assert not any(
+            "RETURNING" in sql
+            for sql in _statements(context)
+            if sql.startswith(("UPDATE", "DELETE"))
+        )
+        assert data["status_task"] == "DONE"
+        assert not Task.objects.filter(id=task.id).exists()
+        assert TaskService.get_task_summary(task.user_id)["DONE"] == 0
+
+    def test_update_task_of_other_user(self, task, user_factory):
+        """Updating another user's task raises NotFound and leaves it untouched."""
+        other_user = user_factory.create()
+
+        with pytest.raises(exceptions.NotFound):
+            TaskService.update_task(other_user.id, task.id, title="Stolen")
+
+        assert Task.objects.get(id=task.id).title == task.title
+
+    def test_delete_task_is_single_statement(self, task):
+        """A delete issues one DELETE statement, followed by the counter update and the
+        outbox event."""
+        with CaptureQueriesContext(connection) as context:
+            TaskService.delete_task(task.user_id, task.id)
+
+        statements = _statements(context)
+        assert len(statements) == 3
+        assert statements[0].startswith("DELETE")
+        assert statements[1].startswith("UPDATE")
+        assert statements[2].startswith('INSERT INTO "taskmanager_taskevent"')
+        assert not Task.objects.filter(id=task.id).exists()
+
+    def test_delete_task_of_other_user(self, task, user_factory):
+        """Deleting another user's task raises NotFound and keeps it."""
+        other_user = user_factory.create()
+
+        with pytest.raises(exceptions.NotFound):
+            TaskService.delete_task(other_user.id, task.id)
+
+        assert Task.objects.filter(id=task.id).exists()
+
+
+class TestTaskCounters:
+    """
+    Test suite for the per-user task counters behind the task summary.
+    """
+
+    def test_counters_follow_task_writes(self, created_user):
+        """Creates, status changes and deletes keep the counters in step."""
+        user, _ = created_user
+        first = TaskService.create_task(user.id, "First", "")
+        second = TaskService.create_task(user.id, "Second", "")
+        assert TaskService.get_task_summary(user.id) == {
+            "TO DO": 2,
+            "IN PROGRESS": 0,
+            "DONE": 0,
+            "archived": 0,
+            "total": 2,
+        }
+
+        TaskService.update_task(user.id, first["id"], status_task="DONE")
+        TaskService.update_task(user.id, first["id"], status_task="DONE")
+        TaskService.delete_task(user.id, second["id"])
+
+        assert TaskService.get_task_summary(user.id) == {
+            "TO DO": 0,
+            "IN PROGRESS": 0,
+            "DONE": 1,
+            "archived": 0,
+            "total": 1,
+        }
+
+    def test_failed_update_leaves_counters(self, task):
+        """An update on a stale version changes neither the task nor the counters."""
+        with pytest.raises(exceptions.APIException):
+            TaskService.update_task(
+                task.user_id, task.id, status_task="DONE", version=task.version + 1
+            )
+
+        assert TaskService.get_task_summary(task.user_id)["TO DO"] == 1
+        assert TaskService.get_task_summary(task.user_id)["DONE"] == 0
+
+    def test_summary_without_tasks(self, created_user):
+        """A user without tasks gets zero counts, without a counter row being created."""
+        user, _ = created_user
+
+        assert TaskService.get_task_summary(user.id)["total"] == 0
+        assert not TaskCounter.objects.filter(user=user).exists()
+
+    def test_reconcile_repairs_drift(self, task):
+        """The reconcile command recomputes counters that drifted from the task table."""
+        TaskCounter.objects.filter(user=task.user).update(todo_count=7, done_count=3)
+
+        call_command("reconcile_task_counters", stdout=io.StringIO())
+
+        assert TaskService.get_task_summary(task.user_id) == {
+            "TO DO": 1,
+            "IN PROGRESS": 0,
+            "DONE": 0,
+            "archived": 0,
+            "total": 1,
+        }
+
+    def test_reconcile_dry_run(self, task):
+        """A dry run reports drift without fixing it."""
+        TaskCounter.objects.filter(user=task.user).update(todo_count=7)
+        out = io.StringIO()
+
+        call_command("reconcile_task_counters", "--dry-run", stdout=out)
+
+        assert "1 drifted" in out.getvalue()
+        assert TaskService.get_task_summary(task.user_id)["TO DO"] == 7
+
+
+class TestTaskArchive:
+    """
+    Test suite for moving completed tasks to the archive and back.
+    """
+
+    @pytest.fixture
+    def archived_task(self, task_factory):
+        """A DONE task last updated long ago, moved to the archive."""
+        task = task_factory.create(status_task="DONE")
+        Task.objects.filter(id=task.id).update(
+            last_updated=timezone.now() - timedelta(days=365)
+        )
+        call_command("archive_tasks", "--days", "30", stdout=io.StringIO())
+        return task
+
+    def test_archive_moves_old_done_tasks(self, archived_task, task_factory):
+        """Only old DONE tasks are moved, and they stay counted as DONE."""
+        user = archived_task.user
+        recent = task_factory.create(user=user, status_task="DONE")
+        todo = task_factory.create(user=user)
+
+        call_command("archive_tasks", "--days", "30", stdout=io.StringIO())
+
+        assert not Task.objects.filter(id=archived_task.id).exists()
+        assert ArchivedTask.objects.filter(id=archived_task.id).exists()
+        assert Task.objects.filter(id__in=[recent.id, todo.id]).count() == 2
+        assert TaskService.get_task_summary(user.id) == {
+            "TO DO": 1,
+            "IN PROGRESS": 0,
+            "DONE": 2,
+            "archived": 1,
+            "total": 3,
+        }
+
+    def test_get_archived_task(self, archived_task):
+        """Archived tasks can still be retrieved by id."""
+        data = TaskService.get_task(archived_task.user_id, archived_task.id)
+
+        assert data["id"] == str(archived_task.id)
+        assert data["status_task"] == "DONE"
+
+    def test_update_restores_archived_task(self, archived_task):
+        """Updating an archived task moves it back to the task table."""
+        user_id = archived_task.user_id
+
+        data = TaskService.update_task(
+            user_id,
+            archived_task.id,
+            status_task="TO DO",
+            version=archived_task.version,
+        )
+
+        assert data["status_task"] == "TO DO"
+        assert data["version"] == archived_task.version + 1
+        assert not ArchivedTask.objects.filter(id=archived_task.id).exists()
+        restored = Task.objects.get(id=archived_task.id)
+        assert restored.date_created == archived_task.date_created
+        assert TaskService.get_task_summary(user_id)["archived"] == 0
+        assert TaskService.get_task_summary(user_id)["TO DO"] == 1
+
+    def test_restore_rolled_back_with_update(self, archived_task, monkeypatch):
+        """The restore and the update commit together, or the task stays archived."""
+
+        def fail(**kwargs):
+            raise RuntimeError("outbox unavailable")
+
+        monkeypatch.setattr("taskmanager.events.enqueue_task_event", fail)
+
+        with pytest.raises(RuntimeError):
+            TaskService.update_task(
+                archived_task.user_id, archived_task.id, title="Restored"
+            )
+
+        assert ArchivedTask.objects.filter(id=archived_task.id).exists()
+        assert not Task.objects.filter(id=archived_task.id).exists()
+        assert TaskService.get_task_summary(archived_task.user_id)["archived"] == 1
+
+    def test_update_archived_task_stale_version(self, archived_task):
+        """A stale If-Match version is rejected without restoring the task."""
+        with pytest.raises(exceptions.APIException):
+            TaskService.update_task(
+                archived_task.user_id,
+                archived_task.id,
+                title="Late edit",
+                version=archived_task.version + 1,
+            )
+
+        assert ArchivedTask.objects.filter(id=archived_task.id).exists()
+
+    def test_delete_archived_task(self, archived_task):
+        """Archived tasks can be deleted, which updates the counters."""
+        TaskService.delete_task(archived_task.user_id, archived_task.id)
+
+        assert not ArchivedTask.objects.filter(id=archived_task.id).exists()
+        assert TaskService.get_task_summary(archived_task.user_id)["total"] == 0
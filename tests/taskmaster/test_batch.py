@@ -0,0 +1,188 @@
+"""Test the batch endpoint"""
+
+import pytest
+from django.http import HttpResponse
+from django.urls import include, path, reverse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from taskmanager.models import Task
+from tests.factories import TaskFactory
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+class PingAPI(APIView):
+    def get(self, request):
+        return Response({"pong": True})
+
+
+def ping(request):
+    return HttpResponse("pong")
+
+
+# Used with `pytest.mark.urls`: views the batch endpoint must not dispatch to
+urlpatterns = [
+    path("", include("taskmaster.urls")),
+    path("api/v1/ping/", ping),
+    path("ping/", PingAPI.as_view()),
+]
+
+
+class TestBatchAPI:
+    """
+    Test suite for running several API calls through `POST /api/v1/batch/`.
+    """
+
+    @pytest.fixture
+    def client(self, api_client, created_user):
+        user, _ = created_user
+        api_client.force_authenticate(user=user)
+        return api_client
+
+    def test_batch_dispatches_in_order(self, client, created_user):
+        """Every sub-request gets its own response, in the order of the batch."""
+        user, _ = created_user
+        task = TaskFactory.create(user=user)
+
+        response = client.post(
+            reverse("batch"),
+            {
+                "requests": [
+                    {"path": "/api/v1/auth/profile/"},
+                    {"path": f"/api/v1/tasks/{task.id}/?fields=title"},
+                    {
+                        "method": "PUT",
+                        "path": f"/api/v1/tasks/{task.id}/",
+                        "body": {"title": "Renamed"},
+                        "headers": {"If-Match": '"1"'},
+                    },
+                    {"method": "GET", "path": "/api/v1/tasks/?fields=title"},
+                    {"path": "/api/v1/missing/"},
+                ]
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        profile, retrieved, updated, listed, missing = response.data
+        assert profile["body"]["username"] == user.username
+        assert retrieved["body"] == {"title": task.title}
+        assert retrieved["headers"]["ETag"] == '"1"'
+        assert updated["status"] == status.HTTP_200_OK
+        # Later calls see the writes of earlier ones
+        assert listed["body"]["results"] == [{"title": "Renamed"}]
+        assert missing["status"] == status.HTTP_404_NOT_FOUND
+
+    def test_sub_request_errors_are_isolated(self, client, created_user):
+        """A failing sub-request reports its error without failing the batch."""
+        user, _ = created_user
+        task = TaskFactory.create(user=user)
+
+        response = client.post(
+            reverse("batch"),
+            {
+                "requests": [
+                    {
+                        "method": "DELETE",
+                        "path": f"/api/v1/tasks/{task.id}/",
+                        "headers": {"If-Match": '"7"'},
+                    },
+                    {"method": "POST", "path": "/api/v1/tasks/create/", "body": {}},
+                ]
+            },
+            format="json",
+        )
+
+        conflict, invalid = response.data
+        assert conflict["status"] == status.HTTP_412_PRECONDITION_FAILED
+        assert invalid["status"] == status.HTTP_400_BAD_REQUEST
+        assert Task.objects.filter(id=task.id).exists()
+
+    def test_parallel_reads(self, client, created_user, settings):
+        """Batches of reads can run concurrently on the async database pool."""
+        settings.DB_ASYNC_POOL_SIZE = 2
+        user, _ = created_user
+        tasks = TaskFactory.create_batch(3, user=user)
+
+        response = client.post(
+            reverse("batch"),
+            {
+                "requests": [{"path": f"/api/v1/tasks/{task.id}/"} for task in tasks],
+                "parallel": True,
+            },
+            format="json",
+        )
+
+        assert [item["body"]["id"] for item in response.data] == [
+            str(task.id) for task in tasks
+        ]
+
+    def test_batch_limits(self, client, settings):
+        """Oversized, empty and nested batches are rejected."""
+        settings.BATCH_MAX_REQUESTS = 2
+        url = reverse("batch")
+
+        oversized = {"requests": [{"path": "/api/v1/tasks/"}] * 3}
+        assert client.post(url, oversized, format="json").status_code == 400
+        assert client.post(url, {"requests": []}, format="json").status_code == 400
+
+        nested = {"requests": [{"method": "POST", "path": "/api/v1/batch/"}]}
+        assert client.post(url, nested, format="json").data[0]["status"] == 404
+
+    @pytest.mark.urls(__name__)
+    def test_only_api_views_are_dispatched(self, client):
+        """Admin pages, non-DRF views and views outside the API get a 400 entry."""
+        response = client.post(
+            reverse("batch"),
+            {
+                "requests": [
+                    {"path": "/admin/"},
+                    {"path": "/api/v1/ping/"},
+                    {"path": "/ping/"},
+                ]
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["status"] for item in response.data] == [
+            status.HTTP_400_BAD_REQUEST
+        ] * 3
+
+    def test_reads_follow_batched_writes(self, client, created_user, settings):
+        """Reads after a batched write go to the primary, and the client is pinned."""
+        # Not a configured database: any read routed to it would fail
+        settings.DATABASE_REPLICAS = ["replica_0"]
+        user, _ = created_user
+        task = TaskFactory.create(user=user)
+
+        response = client.post(
+            reverse("batch"),
+            {
+                "requests": [
+                    {
+                        "method": "PUT",
+                        "path": f"/api/v1/tasks/{task.id}/",
+                        "body": {"title": "Renamed"},
+                        "headers": {"If-Match": '"1"'},
+                    },
+                    {"path": f"/api/v1/tasks/{task.id}/?fields=title"},
+                ]
+            },
+            format="json",
+        )
+
+        updated, retrieved = response.data
+        assert updated["status"] == status.HTTP_200_OK
+        assert retrieved["body"] == {"title": "Renamed"}
+        assert settings.REPLICA_PIN_COOKIE in response.cookies
+
+    def test_batch_requires_authentication(self, api_client):
+        """Anonymous batches are refused before any sub-request runs."""
+        response = api_client.post(
+            reverse("batch"), {"requests": [{"path": "/api/v1/tasks/"}]}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
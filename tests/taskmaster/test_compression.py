@@ -0,0 +1,134 @@
+"""Test response compression"""
+
+import gzip
+import json
+import zlib
+
+import pytest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework import status
+
+from taskmaster.middlewares import CompressionMiddleware, negotiate_encoding
+from tests.factories import TaskFactory
+
+BODY = json.dumps([{"title": f"Task {index}", "status_task": "TO DO"} for index in range(100)])
+
+
+def respond(response, accept_encoding="gzip"):
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+class TestCompressionMiddleware:
+    """
+    Test suite for `CompressionMiddleware` and encoding negotiation.
+    """
+
+    @pytest.mark.parametrize(
+        "accept_encoding, available, expected",
+        [
+            ("gzip, deflate, br, zstd", ["zstd", "br", "gzip"], "zstd"),
+            ("gzip, br", ["zstd", "br", "gzip"], "br"),
+            ("br;q=0.5, gzip;q=0.8", ["zstd", "br", "gzip"], "gzip"),
+            ("gzip;q=0, *", ["gzip"], None),
+            ("*", ["br", "gzip"], "br"),
+            ("identity", ["gzip"], None),
+            ("", ["gzip"], None),
+        ],
+    )
+    def test_negotiate_encoding(self, accept_encoding, available, expected):
+        """The highest q-value wins, ties go to the server's preference."""
+        assert negotiate_encoding(accept_encoding, available) == expected
+
+    def test_compresses_json(self):
+        """JSON bodies above the threshold are compressed and ETags made weak."""
+        response = HttpResponse(BODY, content_type="application/json")
+        response["ETag"] = '"1"'
+
+        response = respond(response)
+
+        assert response["Content-Encoding"] == "gzip"
+        assert response["ETag"] == 'W/"1"'
+        assert response["Vary"] == "Accept-Encoding"
+        assert int(response["Content-Length"]) == len(response.content)
+        assert gzip.decompress(response.content).decode() == BODY
+
+    def test_skips_small_and_large_bodies(self, settings):
+        """Bodies outside the size limits are sent as they are."""
+        settings.COMPRESSION_MIN_SIZE = 100
+        settings.COMPRESSION_MAX_SIZE = 1000
+
+        small = respond(HttpResponse("{}", content_type="application/json"))
+        large = respond(HttpResponse(BODY * 2, content_type="application/json"))
+
+        assert not small.has_header("Content-Encoding")
+        assert not large.has_header("Content-Encoding")
+        assert large["Vary"] == "Accept-Encoding"
+
+    def test_skips_binary_and_unaccepted(self):
+        """Binary content and clients without a supported encoding get the raw body."""
+        image = respond(HttpResponse(b"\x89PNG" * 500, content_type="image/png"))
+        plain = respond(HttpResponse(BODY, content_type="application/json"), "identity")
+
+        assert not image.has_header("Content-Encoding")
+        assert plain.content.decode() == BODY
+
+    def test_compresses_streaming_incrementally(self):
+        """Each streamed chunk is flushed so it can be decoded on arrival."""
+        chunks = [BODY.encode()[:1000], BODY.encode()[1000:]]
+
+        response = respond(StreamingHttpResponse(iter(chunks), content_type="text/csv"))
+        output = list(response.streaming_content)
+
+        assert response["Content-Encoding"] == "gzip"
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert decoder.decompress(output[0]) == chunks[0]
+        assert b"".join(decoder.decompress(part) for part in output[1:]) == chunks[1]
+
+    @pytest.mark.django_db
+    def test_task_list_compressed_and_revalidated(self, api_client, created_user):
+        """Task lists are compressed and their weak ETag still revalidates."""
+        user, _ = created_user
+        TaskFactory.create_batch(10, user=user)
+        api_client.force_authenticate(user=user)
+        url = reverse("list_tasks")
+
+        response = api_client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        assert response["Content-Encoding"] == "gzip"
+        assert len(json.loads(gzip.decompress(response.content))["results"]) == 10
+
+        response = api_client.get(
+            url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    @pytest.mark.django_db
+    def test_compressed_etag_accepted_by_if_match(
+        self, api_client, created_user, settings
+    ):
+        """The weak ETag of a compressed task still works as its If-Match version."""
+        settings.COMPRESSION_MIN_SIZE = 0
+        user, _ = created_user
+        task = TaskFactory.create(user=user)
+        api_client.force_authenticate(user=user)
+        url = reverse("retrieve_update_delete_task", args=[task.id])
+
+        response = api_client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        assert response["Content-Encoding"] == "gzip"
+        assert response["ETag"] == 'W/"1"'
+
+        response = api_client.put(
+            url,
+            data={"title": "Compressed"},
+            format="json",
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_MATCH=response["ETag"],
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        response = api_client.put(
+            url, data={"title": "Stale"}, format="json", HTTP_IF_MATCH='W/"1"'
+        )
+        assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
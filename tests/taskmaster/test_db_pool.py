@@ -0,0 +1,62 @@
+"""Test the shared async database pool"""
+
+import asyncio
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+
+from taskmaster.db import (
+    get_pool_executor,
+    pool_stats,
+    pooled_sync_to_async,
+    reset_after_fork,
+)
+
+
+@pooled_sync_to_async
+def current_thread_name():
+    return threading.current_thread().name
+
+
+@pytest.mark.django_db
+class TestPooledSyncToAsync:
+    """
+    Test suite for `taskmaster.db.pooled_sync_to_async`.
+    """
+
+    @override_settings(DB_ASYNC_POOL_SIZE=2)
+    def test_calls_share_bounded_pool(self):
+        """Concurrent calls run on at most `DB_ASYNC_POOL_SIZE` threads and are counted."""
+        pool_stats.reset()
+
+        async def run_many():
+            return await asyncio.gather(*(current_thread_name() for _ in range(10)))
+
+        thread_names = set(async_to_sync(run_many)())
+
+        assert len(thread_names) <= 2
+        assert all(name.startswith("db-pool") for name in thread_names)
+        assert pool_stats.snapshot()["checkouts"] == 10
+        assert pool_stats.snapshot()["in_use"] == 0
+
+    @override_settings(DB_ASYNC_POOL_SIZE=0)
+    def test_disabled_pool_falls_back(self):
+        """With a pool size of 0 calls go through `database_sync_to_async`."""
+        pool_stats.reset()
+
+        thread_name = async_to_sync(current_thread_name)()
+
+        assert not thread_name.startswith("db-pool")
+        assert pool_stats.snapshot()["checkouts"] == 0
+
+    @override_settings(DB_ASYNC_POOL_SIZE=2)
+    def test_reset_after_fork(self):
+        """A forked worker gets a new executor instead of the parent's threadless one."""
+        inherited = get_pool_executor()
+
+        reset_after_fork()
+
+        assert get_pool_executor() is not inherited
+        assert async_to_sync(current_thread_name)().startswith("db-pool")
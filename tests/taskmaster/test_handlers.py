@@ -0,0 +1,95 @@
+"""Test the ASGI request handler"""
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.testing import HttpCommunicator
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from taskmaster.handlers import PooledASGIHandler
+from taskmaster.utils import generate_user_tokens
+
+
+@pytest.fixture
+def count_connections(monkeypatch):
+    """Keep connections open across requests and count those opened."""
+    monkeypatch.setitem(connection.settings_dict, "CONN_MAX_AGE", 60)
+    opened = []
+
+    def on_connection_created(sender, connection, **kwargs):
+        if connection.alias == "default":
+            opened.append(connection)
+
+    connection_created.connect(on_connection_created)
+    yield opened
+    connection_created.disconnect(on_connection_created)
+
+
+def get_tasks(application, user, times=2):
+    """Request the task list `times` times, one request after the other."""
+    token = generate_user_tokens(user)["access"]
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+
+    async def request():
+        communicator = HttpCommunicator(
+            application, "GET", "/api/v1/tasks/", headers=headers
+        )
+        return await communicator.get_response()
+
+    for _ in range(times):
+        assert async_to_sync(request)()["status"] == 200
+
+
+@pytest.mark.django_db(transaction=True)
+class TestPooledASGIHandler:
+    """
+    Test suite for `taskmaster.handlers.PooledASGIHandler`.
+    """
+
+    def test_requests_reuse_connection(self, settings, created_user, count_connections):
+        """A second request reuses the connection of the first one."""
+        settings.WEB_THREADS = 1
+        handler = PooledASGIHandler()
+
+        try:
+            get_tasks(handler, created_user[0])
+        finally:
+            handler.shutdown()
+
+        assert len(count_connections) == 1
+
+    def test_application_reuses_connection(self, created_user, count_connections):
+        """Sequential requests to the deployed application share one connection."""
+        from taskmaster.asgi import application, http_application
+
+        try:
+            get_tasks(application, created_user[0], times=3)
+        finally:
+            http_application.shutdown()
+
+        assert len(count_connections) == 1
+
+    def test_django_handler_reconnects(self, created_user, count_connections):
+        """Django's handler opens a connection on every request (ticket #33497)."""
+        get_tasks(ASGIHandler(), created_user[0])
+
+        assert len(count_connections) == 2
+
+    def test_requests_spread_over_threads(self, settings):
+        """Requests go to the thread with the fewest requests in flight."""
+        settings.WEB_THREADS = 2
+        handler = PooledASGIHandler()
+
+        try:
+            assert [handler.acquire_executor() for _ in range(3)] == [0, 1, 0]
+            handler.release_executor(1)
+            handler.release_executor(1)
+            assert handler.acquire_executor() == 1
+        finally:
+            handler.shutdown()
+
+    def test_rejects_other_protocols(self):
+        """Like Django's handler, only HTTP is served."""
+        with pytest.raises(ValueError):
+            async_to_sync(PooledASGIHandler())({"type": "websocket"}, None, None)
@@ -0,0 +1,55 @@
+"""Test the worker memory watchdog"""
+
+import threading
+import tracemalloc
+
+from taskmaster.memory import MemoryWatchdog
+
+
+class TestMemoryWatchdog:
+    """
+    Test suite for `taskmaster.memory.MemoryWatchdog`.
+    """
+
+    def test_below_limit(self):
+        """A process under its limit is left alone."""
+        recycled = []
+        watchdog = MemoryWatchdog(limit=1 << 40, on_limit=lambda: recycled.append(True))
+
+        assert not watchdog.check()
+        assert not recycled
+
+    def test_recycles_past_limit(self):
+        """Past the limit the process is recycled once, from the sampling thread."""
+        recycled = threading.Event()
+        watchdog = MemoryWatchdog(limit=1, interval=0.01, on_limit=recycled.set)
+
+        watchdog.start()
+
+        assert recycled.wait(timeout=5)
+        watchdog.thread.join(timeout=5)
+        assert not watchdog.thread.is_alive()
+
+    def test_growth_report_lists_allocation_sites(self):
+        """With tracing, the report points at the lines that allocated since start."""
+        watchdog = MemoryWatchdog(
+            limit=1, trace_frames=1, top=3, on_limit=lambda: None
+        )
+        try:
+            watchdog.start()
+            watchdog.stop()
+            leak = [bytearray(1024) for _ in range(1000)]  # noqa: F841
+
+            report = watchdog.growth_report()
+        finally:
+            tracemalloc.stop()
+
+        assert len(report) == 3
+        assert "test_memory.py" in report[0]
+
+    def test_growth_report_without_tracing(self):
+        """Without tracing, the report counts the objects tracked by the collector."""
+        report = MemoryWatchdog(limit=1, top=5).growth_report()
+
+        assert len(report) == 5
+        assert all(line.endswith("objects") for line in report)
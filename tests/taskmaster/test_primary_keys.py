@@ -0,0 +1,34 @@
+"""Test primary key generation"""
+
+import uuid
+
+import pytest
+
+from taskmaster.utils import generate_id, uuid7
+
+
+class TestPrimaryKeys:
+    """
+    Test suite for `uuid7` and `generate_id`.
+    """
+
+    def test_uuid7_layout(self):
+        """uuid7 sets the RFC 9562 version and variant bits."""
+        value = uuid7()
+
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+
+    def test_uuid7_is_strictly_increasing(self):
+        """Ids generated in a tight loop never repeat and sort in creation order."""
+        values = [uuid7() for _ in range(10_000)]
+
+        assert values == sorted(values)
+        assert len(set(values)) == len(values)
+
+    @pytest.mark.parametrize("version", [4, 7])
+    def test_generate_id_honours_setting(self, settings, version):
+        """generate_id produces the UUID version selected in settings."""
+        settings.PRIMARY_KEY_UUID_VERSION = version
+
+        assert generate_id().version == version
@@ -0,0 +1,133 @@
+"""Test on-demand request profiling"""
+
+import threading
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.core import signing
+from django.urls import reverse
+from rest_framework import status
+
+from taskmanager.consumers import AsyncTaskNotificationConsumer
+from taskmaster.profiling import Profile, make_profiling_token, should_profile
+
+
+def spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def profiling_dir(settings, tmp_path):
+    settings.PROFILING_DIR = str(tmp_path)
+    settings.PROFILING_SAMPLE_RATE = 0
+    return tmp_path
+
+
+class TestProfile:
+    """
+    Test suite for `taskmaster.profiling.Profile` and the profiling decision.
+    """
+
+    def test_samples_added_threads(self):
+        """Stacks of the added threads are folded root first, weighted by time."""
+        profile = Profile("test", interval=0.001)
+        profile.add_thread(threading.get_ident())
+        profile.start()
+        spin(0.1)
+        profile.stop()
+
+        folded = profile.folded().splitlines()
+        assert any(line.split(" ")[0].endswith(f"{__name__}:spin") for line in folded)
+        assert 0 < sum(int(line.rsplit(" ", 1)[1]) for line in folded) <= 200_000
+
+    def test_ignores_other_threads(self):
+        """Threads that were not added are never sampled."""
+        profile = Profile("test", interval=0.001).start()
+        spin(0.05)
+        profile.stop()
+
+        assert profile.folded() == ""
+
+    def test_should_profile(self, settings):
+        """Valid signed tokens enable profiling, tampered or expired ones don't."""
+        settings.PROFILING_SAMPLE_RATE = 0
+        token = make_profiling_token()
+
+        assert should_profile(token)
+        assert not should_profile(None)
+        assert not should_profile(token + "x")
+        assert not should_profile(signing.TimestampSigner().sign("profile"))
+
+        settings.PROFILING_TOKEN_MAX_AGE = -1
+        assert not should_profile(token)
+
+        settings.PROFILING_SAMPLE_RATE = 1
+        assert should_profile(None)
+
+        settings.PROFILING_ENABLED = False
+        assert not should_profile(None)
+
+
+class TestProfilingMiddleware:
+    """
+    Test suite for profiling HTTP requests and websocket connections.
+    """
+
+    def test_profiles_requests(self, api_client, created_user, profiling_dir):
+        """A request with a signed token is profiled and told where the profile is."""
+        user, _ = created_user
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(
+            reverse("list_tasks"), HTTP_X_PROFILE=make_profiling_token()
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert (profiling_dir / response["X-Profile"]).is_file()
+        assert "api_v1_tasks" in response["X-Profile"]
+
+    def test_skips_other_requests(self, api_client, created_user, profiling_dir):
+        """Requests without a valid token are not profiled when sampling is off."""
+        user, _ = created_user
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(reverse("list_tasks"), HTTP_X_PROFILE="forged")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "X-Profile" not in response
+        assert not list(profiling_dir.iterdir())
+
+    def test_rotates_profiles(self, api_client, created_user, profiling_dir, settings):
+        """Sampled requests are profiled, and only the newest profiles are kept."""
+        settings.PROFILING_SAMPLE_RATE = 1
+        settings.PROFILING_MAX_FILES = 2
+        user, _ = created_user
+        api_client.force_authenticate(user=user)
+
+        names = [api_client.get(reverse("list_tasks"))["X-Profile"] for _ in range(3)]
+
+        assert sorted(path.name for path in profiling_dir.iterdir()) == names[1:]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profiles_websockets_with_token(self, created_user, profiling_dir):
+        """A websocket opened with a signed token is profiled until it closes."""
+        user, _ = created_user
+
+        async def session():
+            communicator = WebsocketCommunicator(
+                AsyncTaskNotificationConsumer.as_asgi(),
+                f"/ws/tasks/?profile={make_profiling_token()}",
+            )
+            communicator.scope["user"] = user
+            await communicator.connect()
+            await communicator.send_json_to({"id": "l", "command": "list"})
+            response = await communicator.receive_json_from(timeout=5)
+            await communicator.disconnect()
+            return response
+
+        assert async_to_sync(session)()["status"] == status.HTTP_200_OK
+        assert len(list(profiling_dir.glob("*-ws_ws_tasks.folded"))) == 1
@@ -0,0 +1,108 @@
+"""Test read-replica routing"""
+
+import time
+
+import pytest
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from taskmanager.models import Task
+from taskmaster.middlewares import ReplicaPinningMiddleware
+from taskmaster.routers import PrimaryReplicaRouter, routing_context
+from tests.factories import TaskFactory
+
+router = PrimaryReplicaRouter()
+
+
+@pytest.fixture
+def replica_database(transactional_db):
+    """
+    Register `replica_0` as a second connection to the test database.
+
+    It only sees what the primary connection committed, like a replica.
+    """
+    connections.settings["replica_0"] = dict(connections["default"].settings_dict)
+    yield "replica_0"
+    connections["replica_0"].close()
+    del connections["replica_0"]
+    del connections.settings["replica_0"]
+
+
+class TestPrimaryReplicaRouter:
+    """
+    Test suite for `PrimaryReplicaRouter` and `ReplicaPinningMiddleware`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        """Configure a single replica alias for every test."""
+        settings.DATABASE_REPLICAS = ["replica_0"]
+        settings.REPLICA_PIN_SECONDS = 5
+
+    def test_reads_go_to_replica(self):
+        """Reads outside of a pinned context are routed to a replica."""
+        assert router.db_for_read(Task) == "replica_0"
+        assert router.db_for_write(Task) == "default"
+
+    def test_reads_go_to_primary_without_replicas(self, settings):
+        """Without replicas configured everything stays on the primary."""
+        settings.DATABASE_REPLICAS = []
+        assert router.db_for_read(Task) == "default"
+
+    def test_reads_follow_writes_to_primary(self):
+        """Once a write is routed, later reads in the same context use the primary."""
+        with routing_context():
+            assert router.db_for_read(Task) == "replica_0"
+            router.db_for_write(Task)
+            assert router.db_for_read(Task) == "default"
+
+        assert router.db_for_read(Task) == "replica_0"
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reads_in_transaction_go_to_primary(self):
+        """Reads inside a transaction stay on the primary, even before any write."""
+        with transaction.atomic():
+            assert router.db_for_read(Task) == "default"
+
+        assert router.db_for_read(Task) == "replica_0"
+
+    def test_transaction_reads_its_own_writes(self, replica_database, created_user):
+        """A transaction reads its uncommitted writes, which the replica can't see."""
+        user, _ = created_user
+        task = TaskFactory.create(user=user, title="Committed")
+
+        with transaction.atomic():
+            locked = Task.objects.select_for_update().get(id=task.id)
+            Task.objects.filter(id=locked.id).update(title="Uncommitted")
+            assert Task.objects.get(id=task.id).title == "Uncommitted"
+
+        replica = Task.objects.using(replica_database).get(id=task.id)
+        assert replica.title == "Uncommitted"
+
+    def test_middleware_sets_pin_cookie_after_write(self):
+        """A request that writes gets a cookie pinning its next reads to the primary."""
+
+        def view(request):
+            router.db_for_write(Task)
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(RequestFactory().post("/"))
+
+        assert float(response.cookies["pin_primary"].value) > time.time()
+
+    @pytest.mark.parametrize("offset, expected", [(60, "default"), (-60, "replica_0")])
+    def test_middleware_honours_pin_cookie(self, offset, expected):
+        """Reads are pinned only while the cookie has not expired."""
+        routed = []
+
+        def view(request):
+            routed.append(router.db_for_read(Task))
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.COOKIES["pin_primary"] = str(time.time() + offset)
+        response = ReplicaPinningMiddleware(view)(request)
+
+        assert routed == [expected]
+        assert "pin_primary" not in response.cookies
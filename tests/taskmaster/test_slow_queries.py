@@ -0,0 +1,120 @@
+"""Test the slow query log"""
+
+import uuid
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from taskmanager.models import Task
+from taskmanager.services import TaskService
+from taskmaster.slow_queries import normalize_sql, params_shape, slow_query_log
+from tests.factories import TaskFactory
+
+
+@pytest.fixture
+def slow_queries(settings):
+    """Record every query in an empty slow query log."""
+    settings.SLOW_QUERY_THRESHOLD = 0
+    slow_query_log.clear()
+    yield slow_query_log
+    slow_query_log.clear()
+
+
+def task_entries(log):
+    return [
+        entry
+        for entry in log.entries()
+        if entry["statement"].startswith('SELECT "taskmanager_task"."id"')
+    ]
+
+
+class TestSlowQueryLog:
+    """
+    Test suite for `taskmaster.slow_queries`.
+    """
+
+    def test_normalize_sql(self):
+        """Statements differing only in their values normalize the same way."""
+        assert normalize_sql(
+            "SELECT * FROM t1  WHERE id IN (%s, %s, %s) AND title = 'x''y' LIMIT 21"
+        ) == normalize_sql("SELECT * FROM t1 WHERE id IN (%s) AND title = 'z' LIMIT 1")
+        assert normalize_sql("SELECT * FROM t1 WHERE id = %s") == (
+            "SELECT * FROM t1 WHERE id = ?"
+        )
+
+    def test_params_shape(self):
+        """Parameters are described by their types, runs collapsed."""
+        assert params_shape((uuid.uuid4(), 1, 2, 3, "DONE")) == "(UUID, int x3, str)"
+        assert params_shape({"id": 1}) == "{id: int}"
+        assert params_shape(None) == "()"
+        assert params_shape([(1,), (2,)], many=True) == "executemany"
+
+    def test_records_plan_and_call_site(self, created_user, slow_queries):
+        """Slow queries are recorded with their call site and plan, deduplicated."""
+        user, _ = created_user
+        first, second = TaskFactory.create_batch(2, user=user)
+
+        TaskService.get_task(user.id, first.id)
+        TaskService.get_task(user.id, second.id)
+
+        entries = task_entries(slow_queries)
+        assert len(entries) == 1
+        entry = entries[0]
+        assert entry["count"] == 2
+        # Types only: SQLite receives the UUIDs as strings
+        assert entry["params"] in ("(UUID x2)", "(str x2)")
+        assert entry["call_site"].startswith("taskmaster/utils.py:")
+        assert "get_object_or_error < taskmanager/services.py:" in entry["call_site"]
+        assert any("taskmanager_task" in line for line in entry["plan"])
+
+    def test_explain_keeps_transaction_usable(self, created_user, slow_queries):
+        """Writes are explained in a savepoint, without running them twice."""
+        user, _ = created_user
+
+        TaskService.create_task(user.id, title="Explained", description="")
+
+        assert Task.objects.filter(user=user, title="Explained").count() == 1
+        inserts = [
+            entry
+            for entry in slow_queries.entries()
+            if entry["statement"].startswith('INSERT INTO "taskmanager_task"')
+        ]
+        assert len(inserts) == 1
+
+    def test_bounded(self, created_user, slow_queries, settings):
+        """Past its size, the statements seen least recently are dropped."""
+        settings.SLOW_QUERY_LOG_SIZE = 2
+        user, _ = created_user
+
+        Task.objects.filter(user=user).count()
+        Task.objects.filter(user=user).exists()
+        list(Task.objects.filter(user=user).values("id"))
+
+        statements = [entry["statement"] for entry in slow_queries.entries()]
+        assert len(statements) == 2
+        assert not any(statement.startswith("SELECT COUNT") for statement in statements)
+
+
+class TestSlowQueriesAPI:
+    """
+    Test suite for the slow query log endpoint.
+    """
+
+    def test_staff_only(self, api_client, created_user, slow_queries):
+        """Staff users read and clear the log, other users are refused."""
+        user, _ = created_user
+        api_client.force_authenticate(user=user)
+        url = reverse("slow_queries")
+
+        assert api_client.get(url).status_code == status.HTTP_403_FORBIDDEN
+
+        user.is_staff = True
+        user.save()
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data
+        assert {"statement", "call_site", "plan", "count"} <= set(response.data[0])
+
+        assert api_client.delete(url).status_code == status.HTTP_204_NO_CONTENT
+        assert slow_query_log.entries() == []